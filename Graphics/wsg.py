@@ -1,100 +1,111 @@
+import sys
 import arcade
-from csv import reader
-from arcade.window_commands import pause
-import pandas as pd
 import numpy as np
- 
-ROW_COUNT = 51
-COLUMN_COUNT = 51
+from wsg_export import FrameExporter
+
+sys.path.append("../WolfSheepGrass")
+from wsg_trajectory import TrajectoryReader, GRASS_AGENT, WOLF_AGENT, SHEEP_AGENT
+
 WIDTH = 15
 HEIGHT = 15
- 
-SCREEN_WIDTH = WIDTH * COLUMN_COUNT
-SCREEN_HEIGHT = HEIGHT * ROW_COUNT
+
 SCREEN_TITLE = "Wolves-Sheep-Grass"
 
+SHEEP_SCALE = .08
+WOLF_SCALE = .2
+
+class AnimalPool:
+	"""Reusable sprites for one kind of animal, sharing a single cached texture."""
+
+	def __init__(self, filename, scale):
+		self.texture = arcade.load_texture(filename)
+		self.scale = scale
+		self.sprites = arcade.SpriteList()
+		self.active = 0
+
+	def show(self, x, y):
+		# Grow the pool only when a frame has more animals than any frame before it.
+		while len(self.sprites) < len(x):
+			sprite = arcade.Sprite(scale=self.scale, texture=self.texture)
+			self.sprites.append(sprite)
+		for i in range(len(x)):
+			sprite = self.sprites[i]
+			sprite.center_x = x[i] * WIDTH
+			sprite.center_y = y[i] * HEIGHT
+			sprite.visible = True
+		# Hide the sprites left over from a more crowded frame.
+		for i in range(len(x), self.active):
+			self.sprites[i].visible = False
+		self.active = len(x)
+
+	def draw(self):
+		self.sprites.draw()
+
 class MyGame(arcade.Window):
 	
-	def __init__(self, width, height, title):
-		super().__init__(width, height, title)
-		self.grid = []
-		for row in range(ROW_COUNT):
-			self.grid.append([])
-			for column in range(COLUMN_COUNT):
-				self.grid[row].append(0)
+	def __init__(self, trajectory, title, exporter=None):
+		self.trajectory = trajectory
+		self.exporter = exporter
+		self.columns = trajectory.width
+		self.rows = trajectory.height
+		super().__init__(WIDTH * self.columns, HEIGHT * self.rows, title)
 		arcade.set_background_color(arcade.color.BLACK)
+		# One sprite per patch, created once; frames only recolor the patches which changed.
 		self.grid_sprite_list = arcade.SpriteList()
-		for row in range(ROW_COUNT):
-			for column in range(COLUMN_COUNT):
-				x = column * WIDTH + WIDTH/2
-				y = row * HEIGHT + WIDTH/2
-				sprite = arcade.SpriteSolidColor(WIDTH, HEIGHT, arcade.color.WHITE)
-				sprite.center_x = x
-				sprite.center_y = y
+		for x in range(self.columns):
+			for y in range(self.rows):
+				sprite = arcade.SpriteSolidColor(WIDTH, HEIGHT, arcade.color.BROWN)
+				sprite.center_x = x * WIDTH + WIDTH/2
+				sprite.center_y = y * HEIGHT + HEIGHT/2
 				self.grid_sprite_list.append(sprite)
-		self.df = pd.read_csv("wsg.csv", header = 0)
-		self.ticks = [y.values.tolist() for x, y in self.df.groupby('Time', as_index=False)]
+		self.grass = np.zeros((self.columns, self.rows), dtype=bool)
+		self.sheep = AnimalPool("sheep.png", SHEEP_SCALE)
+		self.wolves = AnimalPool("wolf.png", WOLF_SCALE)
 		self.time = 0
-		self.inum = 0
 
 	def on_draw(self):
 		arcade.start_render()
 		self.grid_sprite_list.draw()
-		last = len(self.grid_sprite_list)
-
-		for i in range(0, last):
-			sp = self.grid_sprite_list[last - i - 1]
-			self.grid_sprite_list.remove(sp)
-		for row in range(ROW_COUNT):
-			for column in range(COLUMN_COUNT):
-				x = column * WIDTH + WIDTH/2
-				y = row * HEIGHT + WIDTH/2
-				sprite = arcade.SpriteSolidColor(WIDTH, HEIGHT, arcade.color.WHITE)
-				sprite.center_x = x
-				sprite.center_y = y
-				self.grid_sprite_list.append(sprite)
-		image = arcade.draw_commands.get_image(x=0, y=0, width=None, height=None)
-		image.save('screenshot' + str(self.inum) + '.png', 'PNG')
-		self.inum = self.inum + 1
-		if self.time > 400:
-			pause(300)
+		self.sheep.draw()
+		self.wolves.draw()
+		if self.exporter is not None and self.time < len(self.trajectory):
+			self.exporter.offer(lambda: arcade.draw_commands.get_image(x=0, y=0, width=None, height=None))
 
 	def on_update(self, delta_time: float):
-		agent = 0
-		try:
-			for row in range(ROW_COUNT):
-				for column in range(COLUMN_COUNT):
-					pos = row * COLUMN_COUNT + column
-					if self.ticks[self.time][agent][1] == 'grass' and int(self.ticks[self.time][agent][2]) == row and int(self.ticks[self.time][agent][3]) == column:
-						self.grid_sprite_list[pos].color = arcade.color.GREEN
-						agent = agent + 1
-					else:
-						self.grid_sprite_list[pos].color = arcade.color.BROWN
-
-			for i in range(agent, len(self.ticks[self.time])):		
-				if self.ticks[self.time][i][1] == 'sheep':
-					self.player_sprite = arcade.Sprite("sheep.png", .08)
-					self.player_sprite.center_x = float(self.ticks[self.time][i][2]) * WIDTH
-					self.player_sprite.center_y = float(self.ticks[self.time][i][3]) * HEIGHT
-					self.grid_sprite_list.append(self.player_sprite)
-				elif self.ticks[self.time][i][1] == 'wolf':
-					self.player_sprite = arcade.Sprite("wolf.png", .2)
-					self.player_sprite.center_x = float(self.ticks[self.time][i][2]) * WIDTH
-					self.player_sprite.center_y = float(self.ticks[self.time][i][3]) * HEIGHT
-					self.grid_sprite_list.append(self.player_sprite)
-				else:
-					print('Bad data!')
-		except IndexError:
-			pass
-			
-		
+		# Stop at the last recorded frame.
+		if self.time >= len(self.trajectory):
+			return super().on_update(delta_time)
+
+		# Read the frame straight from the memory-mapped trajectory.
+		frame = self.trajectory.frame(self.time)
+		agent, x, y = frame["agent"], frame["x"], frame["y"]
+
+		# Recolor only the patches whose grass changed since the last frame.
+		is_grass = agent == GRASS_AGENT
+		grass = np.zeros_like(self.grass)
+		grass[x[is_grass].astype(int), y[is_grass].astype(int)] = True
+		for pos in np.flatnonzero(grass != self.grass).tolist():
+			self.grid_sprite_list[pos].color = arcade.color.GREEN if grass.flat[pos] else arcade.color.BROWN
+		self.grass = grass
+
+		# Move the pooled animal sprites onto this frame's animals.
+		is_sheep = agent == SHEEP_AGENT
+		is_wolf = agent == WOLF_AGENT
+		self.sheep.show(x[is_sheep].tolist(), y[is_sheep].tolist())
+		self.wolves.show(x[is_wolf].tolist(), y[is_wolf].tolist())
+
 		self.time = self.time + 1
 			
 		return super().on_update(delta_time)
    
 def main():
-	MyGame(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+	# An optional path records the replay: "replay.gif" for an animated file, "replay.zip" for numbered PNG frames.
+	exporter = FrameExporter(sys.argv[1]) if len(sys.argv) > 1 else None
+	MyGame(TrajectoryReader("wsg_trajectory"), SCREEN_TITLE, exporter)
 	arcade.run()
+	if exporter is not None:
+		exporter.close()
+		print("Exported", exporter.accepted, "frames,", exporter.dropped, "dropped.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,83 @@
+import io
+import queue
+import threading
+import zipfile
+
+class FrameExporter:
+	"""Encodes captured replay frames on a background thread, into a numbered PNG archive or an animated GIF."""
+
+	def __init__(self, path, every=1, max_frames=1000, max_queue=8, adaptive=True, frame_duration=50, max_bytes=64 * 2 ** 20):
+		# ".gif" paths become one animated file; anything else becomes a zip archive of numbered PNG frames.
+		self.path = path
+		self.animated = path.lower().endswith(".gif")
+		# Keep every Nth frame, and at most max_frames of them, so disk usage stays bounded.
+		self.every = every
+		self.max_frames = max_frames
+		self.adaptive = adaptive
+		self.frame_duration = frame_duration
+		# An animated GIF is only written on close, so its frames are held in memory: at most max_bytes of them.
+		self.max_bytes = max_bytes
+		self.offered = 0
+		self.accepted = 0
+		self.dropped = 0
+		self.downsampled = 0
+		self.queue = queue.Queue(max_queue)
+		self.worker = threading.Thread(target=self.encode, daemon=True)
+		self.worker.start()
+
+	def offer(self, capture):
+		# capture() is only called for frames which are kept, so skipped frames are never read back from the GPU.
+		wanted = self.offered % self.every == 0 and self.accepted < self.max_frames
+		self.offered = self.offered + 1
+		if not wanted:
+			return False
+		# Never block the replay: if the encoder is behind, drop the frame and, if adaptive, keep fewer frames from now on.
+		try:
+			self.queue.put_nowait((self.accepted, capture()))
+		except queue.Full:
+			self.dropped = self.dropped + 1
+			if self.adaptive:
+				self.every = self.every * 2
+			return False
+		self.accepted = self.accepted + 1
+		return True
+
+	def encode(self):
+		frames = []
+		buffered = 0
+		stride = 1
+		archive = None if self.animated else zipfile.ZipFile(self.path, "w", zipfile.ZIP_STORED)
+		while True:
+			item = self.queue.get()
+			if item is None:
+				break
+			index, image = item
+			if self.animated:
+				# Only every stride-th frame is held, so that the frames held stay evenly spaced.
+				if index % stride != 0:
+					self.downsampled = self.downsampled + 1
+					continue
+				# Palette images are a fraction of the size of the captured RGBA frames.
+				frame = image.convert("RGB").quantize()
+				frames.append(frame)
+				buffered = buffered + frame.width * frame.height
+				# Beyond max_bytes, drop every other frame held, and hold frames half as often from now on.
+				while buffered > self.max_bytes and len(frames) > 1:
+					thinned = frames[1::2]
+					frames = frames[::2]
+					buffered = buffered - sum(frame.width * frame.height for frame in thinned)
+					self.downsampled = self.downsampled + len(thinned)
+					stride = stride * 2
+			else:
+				buffer = io.BytesIO()
+				image.save(buffer, "PNG")
+				archive.writestr("frame{:06d}.png".format(index), buffer.getvalue())
+		if self.animated and frames:
+			frames[0].save(self.path, save_all=True, append_images=frames[1:], duration=self.frame_duration, loop=0)
+		if archive is not None:
+			archive.close()
+
+	def close(self):
+		# Wait for the frames already queued, then finish the output file.
+		self.queue.put(None)
+		self.worker.join()
\ No newline at end of file
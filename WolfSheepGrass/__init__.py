@@ -0,0 +1,26 @@
+"""
+The Wolf-Sheep-Grass model. Its modules import each other relatively within the package, or by their own names when
+they are run as scripts from this directory. Nothing is imported until it is used: the model classes are loaded on
+first access, and the visualization only when it is served.
+"""
+
+import importlib                        # Import to load the modules of the package on first access.
+
+# Module defining every name exported by the package.
+EXPORTS = {"WolfSheepGrass": "wsg_model", "VectorizedWolfSheepGrass": "wsg_vectorized",
+           "DistributedWolfSheepGrass": "wsg_distributed", "MeanFieldWolfSheepGrass": "wsg_meanfield",
+           "BatchRunner": "wsg_batch", "DEFAULT_PARAMETERS": "wsg_batch", "get_engine": "wsg_batch",
+           "save_checkpoint": "wsg_checkpoint", "load_checkpoint": "wsg_checkpoint", "main": "wsg_cli",
+           "run_server": "wsg_visualization"}
+
+
+def __getattr__(name: str):
+    """
+    This method imports the module defining an exported name the first time the name is used.
+    :param name: The name looked up on the package.
+    :return: The value of the name.
+    """
+
+    if name not in EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{EXPORTS[name]}", __name__), name)
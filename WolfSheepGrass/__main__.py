@@ -0,0 +1,7 @@
+try:
+    from .wsg_cli import main  # Import the headless command line, which loads only the engine it runs.
+except ImportError:
+    from wsg_cli import main
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,73 @@
-from mesa import Agent  # Import the base Agent class.
-import numpy as np      # Import to use trigonometric functions for movement.
+import numpy as np  # Import to use trigonometric functions for movement.
 
 # Define constants for patches of grass and dirt.
 GRASS_PATCH, DIRT_PATCH = True, False
 
 
-class Animal(Agent):
-    """Base class for animals."""
+class Animal:
+    """
+    Base class for animals. Animals do not derive from mesa.Agent: their state is kept in slots rather than a
+    per-instance dictionary, and everything shared by a species lives on the species class made by make_species().
+    """
 
-    def __init__(self, model, x_pos: float, y_pos: float, food_gain: int, reproduction_rate: float):
+    # Per-animal state. Mesa's schedulers and grid only need unique_id, model, and pos.
+    __slots__ = ("unique_id", "model", "pos", "x_pos", "y_pos", "direction", "energy", "just_spawned", "cell_slot",
+                 "stream")
+
+    # Per-species constants, overridden by the species classes: the animal's type, how much energy it gains from
+    # eating, and its chance to reproduce every step.
+    label = ""
+    food_gain = 0
+    reproduction_rate = 0.0
+
+    def __init__(self, model, x_pos: float, y_pos: float):
         """
         Initializes the base Animal class.
         :param model: The WolfSheepGrass model used for the simulation.
         :param x_pos: A floating-point coordinate between 0 and the width of the world.
         :param y_pos: A floating-point coordinate between 0 and the length of the world.
-        :param food_gain: An integer value which determines how much energy the animal gains from eating.
-        :param reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
         """
 
-        # Initialize the Agent base class.
-        super().__init__(model.next_id(), model)
+        # The animal belongs to the model, and is placed on its grid later.
+        self.model, self.pos = model, None
+
+        # Set up the animal's position, direction, and energy.
+        self.spawn(x_pos, y_pos)
+
+    def spawn(self, x_pos: float, y_pos: float):
+        """
+        Sets up the state of a new animal. Called by the constructor, and to reuse the object of a dead animal.
+        :param x_pos: A floating-point coordinate between 0 and the width of the world.
+        :param y_pos: A floating-point coordinate between 0 and the length of the world.
+        """
 
-        # Provide a label for the animal's type.
-        self.label = ""
+        # Every animal gets a new unique ID, even when its object is reused.
+        self.unique_id = self.model.next_id()
 
         # The animal moves around using floating-point coordinates.
         self.x_pos, self.y_pos = x_pos, y_pos
 
-        # The animal moves according to its direction. On startup, it is a random direction between 0 and 360 degrees.
-        self.direction = self.model.random.uniform(0, 2 * np.pi)
+        # The animal draws its random numbers from its species' stream of the model.
+        self.stream = self.model.streams[self.label]
 
-        # The animal gains a specified amount of energy from eating sheep, and has a specified chance of reproduction.
-        self.food_gain, self.reproduction_rate = food_gain, reproduction_rate
+        # The animal moves according to its direction. On startup, it is a random direction between 0 and 360 degrees.
+        self.direction = self.stream.uniform(0, 2 * np.pi)
 
         # The animal's energy is set between 0 and twice its food gain.
-        self.energy = 2 * self.model.random.randrange(0, food_gain)
+        self.energy = 2 * self.stream.randrange(0, self.food_gain)
 
         # Visualization variable for determining if the animal has just spawned in.
         self.just_spawned = False
 
+        # The animal's slot in its cell of the model's species index.
+        self.cell_slot = 0
+
     def step(self):
         """This method provides the logic loop for the animal."""
 
+        # Remember the energy the animal starts with, to update the running totals of its species once.
+        energy = self.energy
+
         # Move the animal.
         self.move()
 
@@ -50,9 +76,12 @@ class Animal(Agent):
 
         # Have the animal eat sheep (if animal is a wolf) or eat grass (if animal is a sheep).
         self.eat()
+        census = self.model.census
+        census.change_energy(self.label, energy, self.energy)
 
         # Check for death from starvation.
         if self.energy <= 0:
+            census.starved[self.label] += 1
             self.model.remove(self)
 
         # Reproduce.
@@ -61,11 +90,8 @@ class Animal(Agent):
     def move(self):
         """This method provides the logic for moving an animal."""
 
-        # Turn left between 0 to 50 degrees (or 5pi/18 radians).
-        self.direction += self.model.random.uniform(0, 5 * np.pi / 18)
-
-        # Turn right between 0 to 50 degrees (or 5pi/18 radians).
-        self.direction -= self.model.random.uniform(0, 5 * np.pi / 18)
+        # Turn left between 0 to 50 degrees (or 5pi/18 radians), then turn right between 0 to 50 degrees.
+        self.direction += self.stream.turn()
 
         # Move forward by one step.
         self.x_pos += np.cos(self.direction)
@@ -77,22 +103,24 @@ class Animal(Agent):
         if self.y_pos < 0:
             self.y_pos = self.model.height + self.y_pos
 
-        # Move the animal on the grid.
-        self.model.grid.move_agent(self, self.model.integer_position(self.x_pos, self.y_pos))
+        # Move the animal on the grid and in its species' cell index.
+        int_pos = self.model.integer_position(self.x_pos, self.y_pos)
+        self.model.occupancy[self.label].move(self, self.pos, int_pos)
+        self.model.grid.move_agent(self, int_pos)
 
     def reproduce(self):
         """This method provides the logic for allowing an animal to reproduce."""
 
         # If a number between 0 and 1 is less than the animal's reproduction rate, reproduce.
-        if self.model.random.uniform(0, 1) < self.reproduction_rate:
-            # Divide parent's energy by half.
+        if self.stream.random() < self.reproduction_rate:
+            # Divide parent's energy by half. A parent which starved this step is no longer counted by the census.
+            census = self.model.census
+            if self.pos is not None:
+                census.change_energy(self.label, self.energy, self.energy / 2)
             self.energy /= 2
 
-            # Create one new animal of the parent's type.
-            if self.label == "Sheep":
-                child_agent = Sheep(self.model, self.x_pos, self.y_pos, self.food_gain, self.reproduction_rate)
-            else:
-                child_agent = Wolf(self.model, self.x_pos, self.y_pos, self.food_gain, self.reproduction_rate)
+            # Create one new animal of the parent's type, reusing the object of a dead one if there is one.
+            child_agent = self.model.new_animal(self.label, self.x_pos, self.y_pos)
 
             # Set the energy to the parent's.
             child_agent.energy = self.energy
@@ -101,7 +129,7 @@ class Animal(Agent):
             child_agent.just_spawned = True
 
             # Rotate the new animal between 0 and 360 degrees.
-            child_agent.direction += self.model.random.uniform(0, 2 * np.pi)
+            child_agent.direction += self.stream.uniform(0, 2 * np.pi)
 
             # Move the new animal forward by one step.
             child_agent.x_pos += np.cos(child_agent.direction)
@@ -119,42 +147,37 @@ class Animal(Agent):
             else:
                 self.model.wolf_schedule.add(child_agent)
 
-            # Add the animal to the grid.
-            self.model.grid.place_agent(child_agent, self.model.integer_position(child_agent.x_pos, child_agent.y_pos))
+            # Add the animal to the grid and to its species' cell index.
+            int_pos = self.model.integer_position(child_agent.x_pos, child_agent.y_pos)
+            self.model.occupancy[self.label].add(child_agent, int_pos)
+            self.model.grid.place_agent(child_agent, int_pos)
+
+            # Count the birth.
+            census.births[self.label] += 1
+            census.add(self.label, child_agent.energy)
 
 
 class Wolf(Animal):
     """Class which defines the Wolf agent."""
 
-    def __init__(self, model, x_pos: float, y_pos: float, food_gain: int, reproduction_rate: float):
-        """
-        Initializes the Wolf class.
-        :param model: The WolfSheepGrass model used for the simulation.
-        :param x_pos: A floating-point coordinate between 0 and the width of the world.
-        :param y_pos: A floating-point coordinate between 0 and the length of the world.
-        :param food_gain: An integer value which determines how much energy the wolf gains from eating.
-        :param reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
-        """
-
-        # Initialize the Animal base class.
-        super().__init__(model, x_pos, y_pos, food_gain, reproduction_rate)
+    __slots__ = ()
 
-        # Label the animal as a Wolf.
-        self.label = "Wolf"
+    # Label the animal as a Wolf.
+    label = "Wolf"
 
     def eat(self):
         """This method provides the logic for the eating behavior of wolves."""
 
-        # Get a list of all sheep on the same patch as the wolf.
-        int_pos = self.model.integer_position(self.x_pos, self.y_pos)
-        sheep_list = [agent for agent in self.model.grid.get_cell_list_contents([int_pos]) if agent.label == "Sheep"]
+        # Get the sheep on the same patch as the wolf from the sheep cell index.
+        sheep_list = self.model.occupancy["Sheep"].get_cell(self.pos)
 
         # If sheep were found, eat one of the sheep. If none are found, end action.
         if sheep_list:
             # Select one sheep at random.
-            sheep = self.model.random.choice(sheep_list)
+            sheep = self.stream.choice(sheep_list)
 
             # "Kill" the sheep.
+            self.model.census.eaten += 1
             self.model.remove(sheep)
 
             # Add energy from eating the sheep.
@@ -164,90 +187,35 @@ class Wolf(Animal):
 class Sheep(Animal):
     """Class which defines the Sheep agent."""
 
-    def __init__(self, model, x_pos: float, y_pos: float, food_gain: int, reproduction_rate: float):
-        """
-        :param model: The WolfSheepGrass model used for the simulation.
-        :param x_pos: A floating-point coordinate between 0 and the width of the world.
-        :param y_pos: A floating-point coordinate between 0 and the length of the world.
-        :param food_gain: An integer value which determines how much energy the sheep gains from eating.
-        :param reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
-        """
-
-        # Initialize the Animal base class.
-        super().__init__(model, x_pos, y_pos, food_gain, reproduction_rate)
+    __slots__ = ()
 
-        # Label the animal as a Sheep.
-        self.label = "Sheep"
+    # Label the animal as a Sheep.
+    label = "Sheep"
 
     def eat(self):
         """This method provides the logic for the eating behavior of sheep."""
 
         # Get the patch at the sheep's position.
-        int_pos = self.model.integer_position(self.x_pos, self.y_pos)
-        patch = [agent for agent in self.model.grid.get_cell_list_contents([int_pos]) if agent.label == "Patch"][0]
+        x, y = self.model.integer_position(self.x_pos, self.y_pos)
+        grass = self.model.grass
 
         # If the patch has grass, eat it. Otherwise, end action.
-        if patch.patch_color is GRASS_PATCH:
-            # The grass is gone, so set the patch to dirt.
-            patch.patch_color = DIRT_PATCH
+        if grass.patch_color[x, y]:
+            # The grass is gone, so set the patch to dirt until it grows back.
+            grass.eat(x, y)
 
             # Add energy from eating the grass.
             self.energy += self.food_gain
 
 
-class Patch(Agent):
-
-    def __init__(self, model, grass_regrowth_time: int, pos: tuple):
-        """
-        Initializes the Patch class used for representing grass and dirt.
-        :param model: The WolfSheepGrass model used in the simulation.
-        :param grass_regrowth_time: An integer value between 0 and 100 used to determine when dirt grows to grass.
-        :param pos: The xy-coordinate of the patch. Note: x and y are integers, not floating-point numbers.
-        """
-
-        # Initialize the Agent base class.
-        super().__init__(model.next_id(), model)
-
-        # The patch's location on the grid.
-        self.x, self.y = pos
+def make_species(animal_class, food_gain: int, reproduction_rate: float):
+    """
+    This method makes the species class of one model, holding the constants shared by every animal of the species.
+    :param animal_class: Either Wolf or Sheep.
+    :param food_gain: An integer value which determines how much energy the animal gains from eating.
+    :param reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
+    :return: A subclass of the animal class with the same name, which adds no per-animal state.
+    """
 
-        # Label the agent as a Patch.
-        self.label = "Patch"
-
-        # Grass regrowth time defines how many steps a patch of dirt will take before growing grass.
-        self.grass_regrowth_time = grass_regrowth_time
-
-        # There is a 50% chance upon generation that a patch is grass.
-        if self.model.random.uniform(0, 1) < 0.5:
-            self.patch_color = DIRT_PATCH
-        else:
-            self.patch_color = GRASS_PATCH
-
-        # Countdown is used to determine when grass grows back. If the patch is grass, it is set to maximum growth time.
-        if self.patch_color is GRASS_PATCH:
-            self.countdown = grass_regrowth_time
-
-        # If the patch is dirt, then it is set between 0 and strictly less than grass regrowth time.
-        else:
-            self.countdown = self.model.random.randint(0, grass_regrowth_time)
-
-    def step(self):
-        """This method provides the logic loop for each patch."""
-
-        # Grow this patch of grass for every step.
-        self.grow()
-
-    def grow(self):
-        """This method provides the logic for growing patches of dirt into patches of grass."""
-
-        # If the patch is brown,
-        if self.patch_color is DIRT_PATCH:
-            # and countdown is not positive,
-            if self.countdown <= 0:
-                # then set patch color to green and reset the countdown timer.
-                self.patch_color = GRASS_PATCH
-                self.countdown = self.grass_regrowth_time
-
-            # Otherwise, if the patch is brown, decrement its countdown timer by one.
-            else:
-                self.countdown -= 1
+    return type(animal_class.__name__, (animal_class,),
+                {"__slots__": (), "food_gain": food_gain, "reproduction_rate": reproduction_rate})
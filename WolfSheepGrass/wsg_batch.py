@@ -0,0 +1,339 @@
+import itertools                                    # Import to build every combination of the swept parameters.
+import json                                         # Import to group the runs of every parameter combination.
+import math                                         # Import to score and cut the combinations of a halving rung.
+import os                                           # Import to give every run its own output directory.
+import random                                       # Import to break ties between combinations reproducibly.
+from concurrent.futures import ProcessPoolExecutor  # Import to fan runs out across worker processes.
+from concurrent.futures import as_completed         # Import to stream results back as soon as each run finishes.
+import pandas as pd                                 # Import to aggregate every run into one results table.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_random import derive_seed, new_seed       # Import to derive the seed of every run from the sweep's seed.
+    from .wsg_stopping import DETECTORS, EarlyStopping  # Import to stop runs which have reached a trivial end state.
+except ImportError:
+    from wsg_random import derive_seed, new_seed
+    from wsg_stopping import DETECTORS, EarlyStopping
+
+# Termination reason of the runs dropped by successive halving before reaching the step budget.
+PRUNED = "pruned"
+
+# Every outcome a run can reach, among which successive halving spreads the runs still going: the termination reasons
+# of wsg_model, spelled out so that no engine is imported here, and the early stop reasons.
+OUTCOMES = ("annihilated", "sheep_inherit", "max_steps") + tuple(DETECTORS)
+
+# NetLogo defaults for every parameter of the model, matching the sliders of the live visualization.
+DEFAULT_PARAMETERS = {"width": 51, "height": 51,
+                      "grass_regrowth_rate": 30, "initial_wolves": 50, "initial_sheep": 100,
+                      "wolf_food_gain": 20, "sheep_food_gain": 4,
+                      "wolf_reproduction_rate": 0.05, "sheep_reproduction_rate": 0.04,
+                      "max_sheep": 10_000}
+
+
+def get_engine(engine: str):
+    """
+    This method returns the model class of an engine. Engines are imported here so that workers only load their own.
+    :param engine: Either "agent" for the Mesa agent model, "vectorized" for the NumPy engine, "distributed" for
+                   the NumPy engine split into tiles across processes, or "meanfield" for the deterministic mean-field
+                   approximation.
+    :return: The model class.
+    """
+
+    if engine == "agent":
+        try:
+            from .wsg_model import WolfSheepGrass
+        except ImportError:
+            from wsg_model import WolfSheepGrass
+        return WolfSheepGrass
+    elif engine == "vectorized":
+        try:
+            from .wsg_vectorized import VectorizedWolfSheepGrass
+        except ImportError:
+            from wsg_vectorized import VectorizedWolfSheepGrass
+        return VectorizedWolfSheepGrass
+    elif engine == "distributed":
+        try:
+            from .wsg_distributed import DistributedWolfSheepGrass
+        except ImportError:
+            from wsg_distributed import DistributedWolfSheepGrass
+        return DistributedWolfSheepGrass
+    elif engine == "meanfield":
+        try:
+            from .wsg_meanfield import MeanFieldWolfSheepGrass
+        except ImportError:
+            from wsg_meanfield import MeanFieldWolfSheepGrass
+        return MeanFieldWolfSheepGrass
+    raise ValueError(f"Unknown engine: {engine}")
+
+
+def parameter_grid(sweep: dict, base_parameters: dict = None) -> list:
+    """
+    This method expands a sweep into the full list of parameter combinations.
+    :param sweep: Maps parameter names to the list of values to try.
+    :param base_parameters: The values of the parameters which are not swept; defaults to DEFAULT_PARAMETERS.
+    :return: A list of complete parameter dictionaries, one per combination.
+    """
+
+    base_parameters = dict(DEFAULT_PARAMETERS if base_parameters is None else base_parameters)
+    names = list(sweep)
+    return [dict(base_parameters, **dict(zip(names, values))) for values in itertools.product(*sweep.values())]
+
+
+def extinction_margin(result: dict) -> float:
+    """
+    This method measures how close a run came to an end state, from its population series.
+    :param result: The dictionary returned by run_single.
+    :return: The smallest population reached by either species, as a fraction of its initial population.
+    """
+
+    margins = []
+    for name, initial in (("Sheep Count", "initial_sheep"), ("Wolf Count", "initial_wolves")):
+        values = result["series"].get(name)
+        if values:
+            margins.append(min(values) / max(result["parameters"][initial], 1))
+    return min(margins, default=0.0)
+
+
+def run_single(run_id: int, engine: str, parameters: dict, seed: int, max_steps: int, output_dir: str,
+               stopping: dict = None, checkpoint: bytes = None, keep_checkpoint: bool = False) -> dict:
+    """
+    This method runs one simulation headless, writing its output to its own directory.
+    :param run_id: The number of the run within the sweep.
+    :param engine: Either "agent" or "vectorized".
+    :param parameters: The constructor parameters of the model.
+    :param seed: The seed of the model's random number generator.
+    :param max_steps: The time step at which the run is stopped.
+    :param output_dir: The directory for the run's outputs.
+    :param stopping: The arguments of an EarlyStopping condition which stops the run once it reaches a trivial end
+                     state; if None, the run is never stopped early.
+    :param checkpoint: A checkpoint of the run to continue from, instead of starting it anew; the continued run writes
+                       to output_dir.
+    :param keep_checkpoint: If True, a run which reaches max_steps is checkpointed, so that it can be continued.
+    :return: A dictionary with the run's identifiers, termination reason, number of steps, and population time series,
+             and its checkpoint if one was kept.
+    """
+
+    # The checkpoint module imports this one, so it is only imported when needed.
+    try:
+        from .wsg_checkpoint import load_checkpoint, save_checkpoint
+        from .wsg_model import CONDITION_MET, MAX_STEPS
+    except ImportError:
+        from wsg_checkpoint import load_checkpoint, save_checkpoint
+        from wsg_model import CONDITION_MET, MAX_STEPS
+
+    # Build the model with its own output directory, or continue it from the checkpoint.
+    if checkpoint is None:
+        model = get_engine(engine)(**parameters, output_dir=output_dir, seed=seed)
+    else:
+        model = load_checkpoint(checkpoint, output_dir)
+
+    # Step the model until the run ends, an end state is detected, or the step budget is used up.
+    stopper = None if stopping is None else EarlyStopping(**stopping)
+    termination, _ = model.run_until(stopper or (lambda model: False), max(max_steps - model.time, 0))
+    if termination == CONDITION_MET:
+        termination = stopper.reason
+    saved = save_checkpoint(model) if keep_checkpoint and termination == MAX_STEPS else None
+    model.close()
+
+    # Return the series as lists, which a bounded DataCollector reads back from its spill files.
+    series = {name: list(values) for name, values in model.dc.model_vars.items()}
+    return {"run": run_id, "seed": seed, "engine": engine, "parameters": parameters, "termination": termination,
+            "steps": model.time, "series": series, "checkpoint": saved}
+
+
+class BatchRunner:
+    """Runs a parameter sweep over many seeds headless, spread across a pool of worker processes."""
+
+    def __init__(self, sweep: dict, seeds, max_steps: int = 500, engine: str = "agent",
+                 output_root: str = "../Graphics/batch", processes: int = None, base_parameters: dict = None,
+                 root_seed: int = None, stopping: dict = None):
+        """
+        Initializes the BatchRunner class.
+        :param sweep: Maps parameter names to the list of values to try, e.g. {"initial_wolves": [25, 50, 100]}.
+        :param seeds: Either the list of seeds to run every parameter combination with, or the number of replicates of
+                      every combination, in which case run k is seeded with the k-th substream of the root seed.
+        :param max_steps: The number of steps after which a run is stopped.
+        :param engine: Either "agent" for the Mesa agent model or "vectorized" for the NumPy engine.
+        :param output_root: The directory under which every run gets its own output directory.
+        :param processes: The number of worker processes; defaults to the number of CPUs. If 0, runs are executed one
+                          after another in this process.
+        :param base_parameters: The values of the parameters which are not swept; defaults to DEFAULT_PARAMETERS.
+        :param root_seed: The seed of the whole sweep when seeds is a number of replicates; if None, a fresh seed is
+                          drawn, which can be read back from root_seed to reproduce the sweep.
+        :param stopping: The arguments of the EarlyStopping condition which stops runs once they reach a trivial end
+                         state, e.g. {"window": 300}; an empty dictionary uses the defaults. If None, runs are never
+                         stopped early.
+        """
+
+        # Every combination of parameters is run once per seed, or once per replicate with a seed derived from the
+        # run's number, so that run k gets the same seed however and wherever it is executed.
+        self.root_seed = new_seed() if root_seed is None else root_seed
+        if isinstance(seeds, int):
+            runs = itertools.product(parameter_grid(sweep, base_parameters), range(seeds))
+            self.runs = [(parameters, derive_seed(self.root_seed, run_id))
+                         for run_id, (parameters, _) in enumerate(runs)]
+        else:
+            self.runs = list(itertools.product(parameter_grid(sweep, base_parameters), seeds))
+        self.max_steps, self.engine = max_steps, engine
+        self.output_root, self.processes = output_root, processes
+        self.stopping = stopping
+
+    def run_one(self, run_id: int, output_dir: str = None) -> dict:
+        """
+        This method executes a single run of the sweep in this process, e.g. to re-run it alone for debugging.
+        :param run_id: The number of the run within the sweep.
+        :param output_dir: The directory for the run's output; defaults to the run's directory under the output root.
+        :return: The dictionary returned by run_single.
+        """
+
+        parameters, seed = self.runs[run_id]
+        if output_dir is None:
+            output_dir = os.path.join(self.output_root, f"run_{run_id:05d}")
+        return run_single(run_id, self.engine, parameters, seed, self.max_steps, output_dir, self.stopping)
+
+    def iter_runs(self, run_ids: list, max_steps: int, checkpoints: dict = None, output: bool = True):
+        """
+        This method executes some of the runs in the worker pool and yields their results as they finish.
+        :param run_ids: The numbers of the runs to execute.
+        :param max_steps: The time step at which the runs are stopped.
+        :param checkpoints: Maps the numbers of runs to continue to their checkpoints; if None, every run starts anew.
+        :param output: If True, every run writes its outputs to its directory under the output root; if False, only
+                       the checkpoints of runs which reach max_steps are kept, so that they can be continued.
+        :return: An iterator over the dictionaries returned by run_single, in completion order.
+        """
+
+        checkpoints = checkpoints or {}
+        tasks = [(run_id, self.engine, *self.runs[run_id], max_steps,
+                  os.path.join(self.output_root, f"run_{run_id:05d}") if output else None, self.stopping,
+                  checkpoints.get(run_id), not output)
+                 for run_id in run_ids]
+
+        # Without worker processes, execute the runs in order.
+        if self.processes == 0:
+            for task in tasks:
+                yield run_single(*task)
+            return
+
+        with ProcessPoolExecutor(self.processes) as pool:
+            futures = [pool.submit(run_single, *task) for task in tasks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def iter_results(self):
+        """
+        This method runs every simulation in the worker pool and yields their results as they finish.
+        :return: An iterator over the dictionaries returned by run_single, in completion order.
+        """
+
+        return self.iter_runs(range(len(self.runs)), self.max_steps)
+
+    def iter_halving(self, min_steps: int = 50, eta: int = 3):
+        """
+        This method runs the sweep with successive halving. Every run first gets min_steps steps; then only the
+        1 / eta of the parameter combinations whose outcome is the most uncertain continue, from checkpoints, for eta
+        times as many steps, and so on up to max_steps. A combination is uncertain when its replicates disagree: its
+        score is the entropy of their outcomes, where a run still going is counted as equally likely to reach any
+        outcome, so that compute goes to the runs still in play near the boundaries between end states. Ties are broken
+        by how close the populations came to dying out, then at random from the root seed. Runs write no outputs
+        besides their checkpoints, which are kept in memory, so the engine must be one which can be checkpointed.
+        :param min_steps: The step budget of the first rung.
+        :param eta: The factor by which the number of combinations shrinks, and the step budget grows, every rung.
+        :return: An iterator over the final dictionaries returned by run_single; runs dropped before max_steps have
+                 the termination reason PRUNED.
+        """
+
+        # Group the runs by parameter combination.
+        combinations = {}
+        for run_id, (parameters, _) in enumerate(self.runs):
+            combinations.setdefault(json.dumps(parameters, sort_keys=True), []).append(run_id)
+
+        latest, checkpoints = {}, {}
+        open_runs, budget = list(range(len(self.runs))), min_steps
+        rng = random.Random(self.root_seed)
+        while open_runs:
+            # Advance every open run to the budget of the rung. Runs which ended or were stopped early are final.
+            budget = min(budget, self.max_steps)
+            for result in self.iter_runs(open_runs, budget, checkpoints, output=False):
+                checkpoints[result["run"]] = result.pop("checkpoint")
+                latest[result["run"]] = result
+                if checkpoints[result["run"]] is None or budget >= self.max_steps:
+                    checkpoints.pop(result["run"])
+                    yield dict(result, checkpoint=None)
+            if budget >= self.max_steps:
+                return
+
+            # Score every combination with runs still open by the entropy of the outcomes of its replicates, counting
+            # a run still open as equally likely to reach any outcome, so that undecided combinations come first.
+            # Among equally uncertain combinations, those whose populations came closest to dying out come first, and
+            # remaining ties are broken at random.
+            scores = []
+            for run_ids in combinations.values():
+                still_open = [run_id for run_id in run_ids if run_id in checkpoints]
+                if not still_open:
+                    continue
+                outcomes = dict.fromkeys(OUTCOMES, len(still_open) / len(OUTCOMES))
+                for run_id in run_ids:
+                    if run_id not in checkpoints:
+                        termination = latest[run_id]["termination"]
+                        outcomes[termination] = outcomes.get(termination, 0) + 1
+                entropy = -sum(count / len(run_ids) * math.log(count / len(run_ids))
+                               for count in outcomes.values() if count)
+                margin = min(extinction_margin(latest[run_id]) for run_id in still_open)
+                scores.append((round(entropy, 9), -margin, rng.random(), still_open))
+
+            # Keep the most uncertain combinations, and drop the open runs of every other one.
+            scores.sort(key=lambda score: score[:3], reverse=True)
+            kept = math.ceil(len(scores) / eta)
+            for *_, run_ids in scores[kept:]:
+                for run_id in run_ids:
+                    checkpoints.pop(run_id)
+                    yield dict(latest[run_id], termination=PRUNED, checkpoint=None)
+            open_runs = [run_id for *_, run_ids in scores[:kept] for run_id in run_ids]
+            budget *= eta
+
+    def run(self) -> pd.DataFrame:
+        """
+        This method runs the whole sweep and aggregates every population time series into one table.
+        :return: A table with one row per run and step, holding the run's parameters, seed, and populations.
+        """
+
+        return self.tabulate(self.iter_results())
+
+    def run_halving(self, min_steps: int = 50, eta: int = 3) -> pd.DataFrame:
+        """
+        This method runs the sweep with successive halving, as iter_halving() does, and aggregates the results.
+        :param min_steps: The step budget of the first rung.
+        :param eta: The factor by which the number of combinations shrinks, and the step budget grows, every rung.
+        :return: A table with one row per run and step, holding the run's parameters, seed, and populations.
+        """
+
+        return self.tabulate(self.iter_halving(min_steps, eta))
+
+    def tabulate(self, results) -> pd.DataFrame:
+        """
+        This method aggregates the population time series of runs into one table, and writes it to results.csv.
+        :param results: An iterable of dictionaries returned by run_single.
+        :return: A table with one row per run and step, holding the run's parameters, seed, and populations.
+        """
+
+        # Collect each run's time series as it arrives.
+        tables = []
+        for result in results:
+            series = pd.DataFrame(result["series"])
+            run_info = dict(run=result["run"], **result["parameters"], seed=result["seed"],
+                            termination=result["termination"])
+            table = pd.DataFrame(run_info, index=series.index)
+            table["Step"] = series.index
+            tables.append(pd.concat([table, series], axis=1))
+
+        # Order the table by run, then write it next to the runs' own output.
+        results = pd.concat(tables, ignore_index=True).sort_values(["run", "Step"], ignore_index=True)
+        os.makedirs(self.output_root, exist_ok=True)
+        results.to_csv(os.path.join(self.output_root, "results.csv"), index=False)
+        return results
+
+
+if __name__ == "__main__":
+    # Sweep the initial populations around the NetLogo defaults over a handful of seeds.
+    runner = BatchRunner({"initial_wolves": [25, 50, 100], "initial_sheep": [50, 100, 200]}, seeds=5, root_seed=595)
+    print(runner.run().groupby("run").tail(1).to_string(index=False))
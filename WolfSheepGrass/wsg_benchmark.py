@@ -0,0 +1,191 @@
+import argparse                         # Import to run the benchmarks from the command line.
+import gc                               # Import to count garbage collections, a proxy for allocation churn.
+import json                             # Import to store the results as a machine-readable baseline.
+import platform                         # Import to record the machine the baseline was measured on.
+import sys                              # Import to count allocated memory blocks and record the Python version.
+import tempfile                         # Import to give runs with output somewhere to write it.
+import time                             # Import to time the steps.
+import tracemalloc                      # Import to measure the peak memory of the steps.
+import numpy as np                      # Import to record the NumPy version.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_batch import DEFAULT_PARAMETERS, get_engine  # Import the NetLogo defaults and the model classes.
+except ImportError:
+    from wsg_batch import DEFAULT_PARAMETERS, get_engine
+
+# World sizes swept by default, from the NetLogo default up to 1000x1000.
+SIZES = (51, 100, 250, 500, 1000)
+
+# Initial populations swept by default, as multiples of the NetLogo default density (100 sheep and 50 wolves on 51x51).
+DENSITIES = (1, 4)
+
+# Results slower than the baseline by more than this fraction count as regressions.
+TOLERANCE = 0.1
+
+
+def case_parameters(size: int, density: float) -> dict:
+    """
+    This method builds the parameters of one benchmark case, scaling the NetLogo populations with the world's area.
+    :param size: Width and height of the world.
+    :param density: Initial populations as a multiple of the NetLogo default density.
+    :return: The constructor parameters of the model.
+    """
+
+    scale = density * size * size / (DEFAULT_PARAMETERS["width"] * DEFAULT_PARAMETERS["height"])
+    return dict(DEFAULT_PARAMETERS, width=size, height=size,
+                initial_sheep=round(DEFAULT_PARAMETERS["initial_sheep"] * scale),
+                initial_wolves=round(DEFAULT_PARAMETERS["initial_wolves"] * scale),
+                max_sheep=10 ** 9)
+
+
+def measure(engine: str, parameters: dict, output: bool, ticks: int = 50, warmup: int = 5,
+            memory_ticks: int = 10, seed: int = 0) -> dict:
+    """
+    This method benchmarks the step of one model configuration.
+    :param engine: Either "agent", "vectorized", or "distributed".
+    :param parameters: The constructor parameters of the model.
+    :param output: Whether the model writes its trajectory and plot.csv.
+    :param ticks: The number of timed steps.
+    :param warmup: The number of steps taken before timing starts, so that the populations settle a little.
+    :param memory_ticks: The number of steps taken under tracemalloc, which slows them down and so is timed separately.
+    :param seed: The seed of the model, so that every measurement of a case runs the same simulation.
+    :return: A dictionary describing the case and its measurements.
+    """
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        model = get_engine(engine)(**parameters, output_dir=output_dir if output else None, seed=seed)
+        model.run(warmup)
+
+        # Time the steps, counting every animal stepped as one agent-tick.
+        gc.collect()
+        collections, blocks = sum(stats["collections"] for stats in gc.get_stats()), sys.getallocatedblocks()
+        steps = agent_ticks = 0
+        elapsed = 0.0
+        while steps < ticks and model.running:
+            agent_ticks += model.get_sheep_count() + model.get_wolf_count()
+            start = time.perf_counter()
+            model.step()
+            elapsed += time.perf_counter() - start
+            steps += 1
+        collections = sum(stats["collections"] for stats in gc.get_stats()) - collections
+        blocks = sys.getallocatedblocks() - blocks
+
+        # Measure the peak memory allocated while stepping.
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline_memory = tracemalloc.get_traced_memory()[0]
+        model.run(memory_ticks)
+        peak_memory = tracemalloc.get_traced_memory()[1] - baseline_memory
+        tracemalloc.stop()
+        model.close()
+
+    return {"engine": engine, "size": parameters["width"], "initial_sheep": parameters["initial_sheep"],
+            "initial_wolves": parameters["initial_wolves"], "output": output, "steps": steps,
+            "ticks_per_second": steps / elapsed if elapsed else None,
+            "seconds_per_agent_tick": elapsed / agent_ticks if agent_ticks else None,
+            "mean_agents": agent_ticks / steps if steps else 0,
+            "peak_memory_bytes": peak_memory, "gc_collections": collections, "allocated_blocks": blocks}
+
+
+def run_benchmarks(engines=("agent", "vectorized"), sizes=SIZES, densities=DENSITIES, outputs=(False, True),
+                   **measure_args) -> dict:
+    """
+    This method sweeps the benchmark over engines, world sizes, initial populations, and output on and off.
+    :param engines: The engines to benchmark.
+    :param sizes: The world sizes to benchmark.
+    :param densities: The initial populations, as multiples of the NetLogo default density.
+    :param outputs: Whether to benchmark with output off, on, or both.
+    :param measure_args: Further arguments of measure(), e.g. ticks.
+    :return: A dictionary with a description of the machine and the list of results.
+    """
+
+    results = []
+    for engine in engines:
+        for size in sizes:
+            for density in densities:
+                for output in outputs:
+                    result = measure(engine, case_parameters(size, density), output, **measure_args)
+                    results.append(result)
+                    print(format_result(result), flush=True)
+
+    return {"meta": {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                     "numpy": np.__version__, "platform": platform.platform(), "processor": platform.processor()},
+            "results": results}
+
+
+def case_key(result: dict) -> tuple:
+    """
+    This method returns what identifies the case of a result, to match it with the same case in a baseline.
+    :param result: A result returned by measure().
+    :return: The engine, world size, initial populations, and output flag.
+    """
+
+    return result["engine"], result["size"], result["initial_sheep"], result["initial_wolves"], result["output"]
+
+
+def compare(baseline: dict, current: dict, tolerance: float = TOLERANCE) -> list:
+    """
+    This method compares the throughput of every case measured in both of two benchmark runs.
+    :param baseline: The benchmark run to compare against, as returned by run_benchmarks().
+    :param current: The new benchmark run.
+    :param tolerance: The fraction by which a case may be slower before it counts as a regression.
+    :return: One dictionary per common case, with the ticks per second of both runs, their ratio, and whether the
+             case regressed.
+    """
+
+    baseline_results = {case_key(result): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = baseline_results.get(case_key(result))
+        if old is None or not old["ticks_per_second"] or not result["ticks_per_second"]:
+            continue
+        ratio = result["ticks_per_second"] / old["ticks_per_second"]
+        rows.append({"case": case_key(result), "baseline": old["ticks_per_second"],
+                     "current": result["ticks_per_second"], "ratio": ratio, "regression": ratio < 1 - tolerance,
+                     "memory_ratio": result["peak_memory_bytes"] / max(old["peak_memory_bytes"], 1)})
+    return rows
+
+
+def format_result(result: dict) -> str:
+    """
+    This method formats one result as a line of the benchmark report.
+    :param result: A result returned by measure().
+    :return: The line.
+    """
+
+    per_agent = result["seconds_per_agent_tick"]
+    return (f"{result['engine']:>11} {result['size']:>5}^2 sheep={result['initial_sheep']:<7} "
+            f"wolves={result['initial_wolves']:<7} output={'on' if result['output'] else 'off':<3} "
+            f"{result['ticks_per_second'] or 0:9.2f} ticks/s "
+            f"{(per_agent or 0) * 1e6:8.3f} us/agent {result['peak_memory_bytes'] / 2 ** 20:8.2f} MiB peak "
+            f"{result['gc_collections']:5} gc {result['allocated_blocks']:+8} blocks")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the step of the Wolf-Sheep-Grass model headless.")
+    parser.add_argument("--engines", nargs="+", default=["agent", "vectorized"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    parser.add_argument("--densities", nargs="+", type=float, default=list(DENSITIES))
+    parser.add_argument("--output", choices=["off", "on", "both"], default="both")
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument("--save", help="Write the results to this JSON file, e.g. to record a baseline.")
+    parser.add_argument("--compare", help="Compare the results against a baseline JSON file.")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    outputs = {"off": (False,), "on": (True,), "both": (False, True)}[args.output]
+    report = run_benchmarks(args.engines, args.sizes, args.densities, outputs, ticks=args.ticks)
+    if args.save:
+        with open(args.save, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    # Compare with the baseline, failing if any case regressed.
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            rows = compare(json.load(baseline_file), report, args.tolerance)
+        for row in rows:
+            print(f"{str(row['case']):<50} {row['baseline']:9.2f} -> {row['current']:9.2f} ticks/s "
+                  f"({row['ratio']:.2f}x, memory {row['memory_ratio']:.2f}x)"
+                  f"{'  REGRESSION' if row['regression'] else ''}")
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
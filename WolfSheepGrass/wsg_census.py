@@ -0,0 +1,169 @@
+import numpy as np  # Import to total the energy of a whole species at once.
+
+# Labels of the species counted.
+LABELS = ("Sheep", "Wolf")
+
+# Names of the DataCollector reporters of the running counts, per species where the count is.
+BIRTH_REPORTERS = {"Sheep": "Total Sheep Births", "Wolf": "Total Wolf Births"}
+STARVED_REPORTERS = {"Sheep": "Total Sheep Starved", "Wolf": "Total Wolves Starved"}
+EATEN_REPORTER = "Total Sheep Eaten"
+
+
+class Census:
+    """
+    Running counts of the births, starvations, and predation of a run, and running totals of the population and energy
+    of each species. The totals are updated where animals are born, die, eat, and reproduce, so that reading the mean
+    and variance of the energy of a species never scans its animals.
+    """
+
+    def __init__(self):
+        """Initializes the Census class with every count at zero."""
+
+        self.reset()
+
+    def reset(self):
+        """This method sets every count and total back to zero, e.g. for a new run."""
+
+        # Animals born, and animals which starved, per species; sheep eaten by wolves.
+        self.births, self.starved, self.eaten = dict.fromkeys(LABELS, 0), dict.fromkeys(LABELS, 0), 0
+
+        # The number of animals of each species, and the sum of their energy and of its square.
+        self.population = dict.fromkeys(LABELS, 0)
+        self.energy_sum, self.energy_squares = dict.fromkeys(LABELS, 0.0), dict.fromkeys(LABELS, 0.0)
+
+    def add(self, label: str, energy: float):
+        """
+        This method counts an animal which joined the world.
+        :param label: The species of the animal, either "Sheep" or "Wolf".
+        :param energy: The energy of the animal.
+        :return:
+        """
+
+        self.population[label] += 1
+        self.energy_sum[label] += energy
+        self.energy_squares[label] += energy * energy
+
+    def remove(self, label: str, energy: float):
+        """
+        This method stops counting an animal which left the world.
+        :param label: The species of the animal, either "Sheep" or "Wolf".
+        :param energy: The energy of the animal when it left.
+        :return:
+        """
+
+        self.population[label] -= 1
+        self.energy_sum[label] -= energy
+        self.energy_squares[label] -= energy * energy
+
+    def change_energy(self, label: str, old: float, new: float):
+        """
+        This method accounts for a change of the energy of an animal in the world.
+        :param label: The species of the animal, either "Sheep" or "Wolf".
+        :param old: The energy of the animal before the change.
+        :param new: The energy of the animal after the change.
+        :return:
+        """
+
+        self.energy_sum[label] += new - old
+        self.energy_squares[label] += new * new - old * old
+
+    def set_energy(self, label: str, energy: np.ndarray):
+        """
+        This method recounts a whole species from the energy of each of its animals, e.g. after a vectorized update or
+        a restore.
+        :param label: The species, either "Sheep" or "Wolf".
+        :param energy: The energy of every animal of the species.
+        :return:
+        """
+
+        self.population[label] = len(energy)
+        self.energy_sum[label] = float(np.sum(energy))
+        self.energy_squares[label] = float(np.dot(energy, energy))
+
+    def set_distribution(self, label: str, energy: np.ndarray, count: np.ndarray):
+        """
+        This method recounts a whole species from the number of animals at each energy level, e.g. for the expected
+        populations of the mean-field model.
+        :param label: The species, either "Sheep" or "Wolf".
+        :param energy: The energy of each level.
+        :param count: The number of animals at each level.
+        :return:
+        """
+
+        self.population[label] = float(np.sum(count))
+        self.energy_sum[label] = float(np.dot(count, energy))
+        self.energy_squares[label] = float(np.dot(count, energy * energy))
+
+    def add_census(self, other):
+        """
+        This method adds the counts and totals of another census to this one, e.g. to sum the censuses of the tiles
+        of a distributed run.
+        :param other: The Census to add.
+        :return:
+        """
+
+        for label in LABELS:
+            self.births[label] += other.births[label]
+            self.starved[label] += other.starved[label]
+            self.population[label] += other.population[label]
+            self.energy_sum[label] += other.energy_sum[label]
+            self.energy_squares[label] += other.energy_squares[label]
+        self.eaten += other.eaten
+
+    def mean_energy(self, label: str) -> float:
+        """
+        This method returns the mean energy of a species.
+        :param label: The species, either "Sheep" or "Wolf".
+        :return: The mean energy, or 0 if the species has died out.
+        """
+
+        population = self.population[label]
+        return self.energy_sum[label] / population if population else 0.0
+
+    def energy_variance(self, label: str) -> float:
+        """
+        This method returns the variance of the energy of a species.
+        :param label: The species, either "Sheep" or "Wolf".
+        :return: The population variance of the energy, or 0 if the species has died out.
+        """
+
+        population = self.population[label]
+        if not population:
+            return 0.0
+        mean = self.energy_sum[label] / population
+        return max(self.energy_squares[label] / population - mean * mean, 0.0)
+
+    def get_counts(self) -> dict:
+        """
+        This method returns the running counts as plain data, e.g. to store them in a checkpoint.
+        :return: A JSON-serializable dictionary.
+        """
+
+        return {"births": dict(self.births), "starved": dict(self.starved), "eaten": self.eaten}
+
+    def set_counts(self, counts: dict):
+        """
+        This method restores the running counts.
+        :param counts: The dictionary returned by get_counts().
+        :return:
+        """
+
+        self.births, self.starved, self.eaten = dict(counts["births"]), dict(counts["starved"]), counts["eaten"]
+
+
+def census_reporters() -> dict:
+    """
+    This method returns the DataCollector model reporters of the census of a model, which every engine registers: the
+    births, starvations, and predation so far, and the mean and variance of the energy of each species.
+    :return: A dictionary mapping each reporter name to a function of the model.
+    """
+
+    reporters = {}
+    for label in LABELS:
+        reporters[BIRTH_REPORTERS[label]] = lambda model, label=label: model.census.births[label]
+        reporters[STARVED_REPORTERS[label]] = lambda model, label=label: model.census.starved[label]
+    reporters[EATEN_REPORTER] = lambda model: model.census.eaten
+    for label in LABELS:
+        reporters[f"{label} Mean Energy"] = lambda model, label=label: model.census.mean_energy(label)
+        reporters[f"{label} Energy Variance"] = lambda model, label=label: model.census.energy_variance(label)
+    return reporters
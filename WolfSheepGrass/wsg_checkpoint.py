@@ -0,0 +1,207 @@
+import io                           # Import to hold checkpoints in memory as bytes.
+import json                         # Import to store the scalar state and parameters alongside the arrays.
+import os                           # Import to give every forked branch its own output directory.
+import numpy as np                  # Import to store the state of the model as typed arrays.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_batch import get_engine               # Import to rebuild the model class a checkpoint was taken from.
+except ImportError:
+    from wsg_batch import get_engine
+
+# Engine names of the model classes which can be checkpointed.
+ENGINES = {"WolfSheepGrass": "agent", "VectorizedWolfSheepGrass": "vectorized"}
+
+# Per-animal columns stored for each species of the agent model, and their types.
+AGENT_COLUMNS = {"x_pos": float, "y_pos": float, "direction": float, "energy": float,
+                 "unique_id": np.int64, "cell_slot": np.int64, "just_spawned": bool}
+
+
+def save_checkpoint(model, file=None):
+    """
+    This method takes a snapshot of the full state of a model as a compact binary NumPy archive.
+    :param model: The WolfSheepGrass or VectorizedWolfSheepGrass model to snapshot.
+    :param file: A path or binary file object to write the checkpoint to; if None, the checkpoint is returned as bytes.
+    :return: The checkpoint as bytes if no file was given.
+    """
+
+    # Scalar state, the parameters, and the non-array parts of the random number generator states are stored as JSON.
+    version, mt_state, gauss_next = model.random.getstate()
+    meta = {"engine": ENGINES[type(model).__name__], "parameters": model.parameters, "time": model.time,
+            "running": model.running, "termination": model.termination, "seed": model._seed, "random_version": version,
+            "gauss_next": gauss_next, "reporters": list(model.dc.model_vars), "census": model.census.get_counts()}
+    arrays = {"random_state": np.array(mt_state, np.uint32),
+              "patch_color": model.grass.patch_color, "countdown": model.grass.countdown}
+
+    # Store the DataCollector history, one array per reporter.
+    for index, values in enumerate(model.dc.model_vars.values()):
+        arrays[f"reporter_{index}"] = np.array(values, float)
+
+    # Store every animal's state, per species.
+    if meta["engine"] == "agent":
+        meta["current_id"] = model.current_id
+        meta["profiler"] = model.profiler.get_counters() if model.profiler is not None else None
+        meta["streams"] = {label: stream.getstate() for label, stream in model.streams.items()}
+        for species, schedule in (("sheep", model.sheep_schedule), ("wolves", model.wolf_schedule)):
+            animals = schedule.agents
+            for name, dtype in AGENT_COLUMNS.items():
+                arrays[f"{species}_{name}"] = np.fromiter((getattr(animal, name) for animal in animals), dtype,
+                                                          len(animals))
+    else:
+        meta["rng_states"] = {}
+        for species, animals in (("sheep", model.sheep), ("wolves", model.wolves)):
+            meta["rng_states"][species] = animals.rng.bit_generator.state
+            for name in ("x_pos", "y_pos", "direction", "energy"):
+                arrays[f"{species}_{name}"] = getattr(animals, name)[:animals.count]
+
+    # Write the archive, either to the given file or to memory.
+    arrays["meta"] = np.array(json.dumps(meta))
+    if file is not None:
+        np.savez(file, **arrays)
+        return None
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def load_checkpoint(checkpoint, output_dir: str = None):
+    """
+    This method builds a new model from a checkpoint.
+    :param checkpoint: A path, binary file object, or bytes returned by save_checkpoint(), or an already read archive.
+    :param output_dir: The directory for the new model's output; if None, nothing is written. It should not be the
+                       output directory of the snapshot, whose files would be truncated.
+    :return: The restored model, which continues exactly where the snapshot was taken.
+    """
+
+    # Read the archive, unless it has been read already, and rebuild a model of the same engine.
+    archive = checkpoint if isinstance(checkpoint, dict) else read_checkpoint(checkpoint)
+    meta = json.loads(str(archive["meta"]))
+    parameters = dict(meta["parameters"], output_dir=output_dir)
+
+    # Start from an empty world, since every animal is replaced by the snapshot anyway.
+    model = get_engine(meta["engine"])(**dict(parameters, initial_wolves=0, initial_sheep=0))
+    restore_checkpoint(model, archive, output_dir)
+    return model
+
+
+def restore_checkpoint(model, checkpoint, output_dir: str = None):
+    """
+    This method overwrites the state of an existing model with a checkpoint, reusing the model's storage.
+    :param model: A model of the same engine as the snapshot.
+    :param checkpoint: A path, binary file object, or bytes returned by save_checkpoint(), or an already read archive.
+    :param output_dir: The directory for the model's output; if None, nothing is written. It should not be the
+                       output directory of the snapshot, whose files would be truncated.
+    :return:
+    """
+
+    # Read the archive, unless it has been read already.
+    archive = checkpoint if isinstance(checkpoint, dict) else read_checkpoint(checkpoint)
+    meta = json.loads(str(archive["meta"]))
+    parameters = dict(meta["parameters"], output_dir=output_dir)
+
+    # Reset the model to an empty world of the right size, then record the snapshot's parameters.
+    model.reset(dict(parameters, initial_wolves=0, initial_sheep=0), meta["seed"])
+    model.parameters = parameters
+    model.time, model.running, model.termination = meta["time"], meta["running"], meta["termination"]
+
+    # Restore the grass.
+    model.grass.patch_color[...] = archive["patch_color"]
+    model.grass.set_countdown(archive["countdown"])
+
+    # Restore the animals.
+    if meta["engine"] == "agent":
+        restore_agents(model, archive)
+        model.current_id = meta["current_id"]
+        for label, state in meta["streams"].items():
+            model.streams[label].setstate(state)
+    else:
+        for species, animals in (("sheep", model.sheep), ("wolves", model.wolves)):
+            animals.append(*(archive[f"{species}_{name}"] for name in ("x_pos", "y_pos", "direction", "energy")))
+            animals.rng.bit_generator.state = meta["rng_states"][species]
+
+    # Restore the running counts, and total the energy of the restored animals. Older checkpoints have no counts.
+    if "census" in meta:
+        model.census.set_counts(meta["census"])
+    for label, energy in (("Sheep", archive["sheep_energy"]), ("Wolf", archive["wolves_energy"])):
+        model.census.set_energy(label, energy)
+
+    # Restore the counts of the profiler, or start them from the restored census if the snapshot was not profiled.
+    if getattr(model, "profiler", None) is not None:
+        model.profiler.set_counters(meta.get("profiler"))
+
+    # Restore the DataCollector history, through the series of the new collector so that a bounded one spills it.
+    for index, name in enumerate(meta["reporters"]):
+        model.dc.model_vars.setdefault(name, []).extend(archive[f"reporter_{index}"].tolist())
+
+    # Restore the random number generator last, since building the animals draws from it.
+    model.random.setstate((meta["random_version"], tuple(archive["random_state"].tolist()), meta["gauss_next"]))
+
+
+def restore_agents(model, archive: dict):
+    """
+    This method rebuilds the animals of the agent model from a checkpoint, in their original scheduling order.
+    :param model: The WolfSheepGrass model to restore the animals of.
+    :param archive: The checkpoint archive.
+    :return:
+    """
+
+    for species, label, schedule in (("sheep", "Sheep", model.sheep_schedule), ("wolves", "Wolf", model.wolf_schedule)):
+        columns = {name: archive[f"{species}_{name}"].tolist() for name in AGENT_COLUMNS}
+        animals = []
+        for index in range(len(columns["x_pos"])):
+            # Build the animal, then overwrite the state it drew at random.
+            animal = model.new_animal(label, columns["x_pos"][index], columns["y_pos"][index])
+            for name in ("direction", "energy", "unique_id", "just_spawned"):
+                setattr(animal, name, columns[name][index])
+
+            # The scheduler is rebuilt in the original order, so that it shuffles the same way.
+            schedule.add(animal)
+            model.grid.place_agent(animal, model.integer_position(animal.x_pos, animal.y_pos))
+            animals.append(animal)
+
+        # Every cell's list in the species index is rebuilt in its original order, so that prey is chosen the same way.
+        for index in sorted(range(len(animals)), key=columns["cell_slot"].__getitem__):
+            model.occupancy[animals[index].label].add(animals[index], animals[index].pos)
+
+
+def read_checkpoint(checkpoint) -> dict:
+    """
+    This method reads every array of a checkpoint into memory.
+    :param checkpoint: A path, binary file object, or bytes returned by save_checkpoint().
+    :return: A dictionary mapping each array name to its array.
+    """
+
+    if isinstance(checkpoint, bytes):
+        checkpoint = io.BytesIO(checkpoint)
+    with np.load(checkpoint, allow_pickle=False) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def fork(checkpoint, seeds: list, output_root: str) -> list:
+    """
+    This method restores one checkpoint into many models which then diverge, e.g. to share a burn-in across an ensemble.
+    :param checkpoint: A path, binary file object, or bytes returned by save_checkpoint(), or an already read archive.
+    :param seeds: One seed per branch; each branch reseeds its random number generators with it after the restore.
+    :param output_root: The directory under which every branch gets its own output directory.
+    :return: The list of branch models, one per seed.
+    """
+
+    # The checkpoint is read once and shared by every branch.
+    archive = checkpoint if isinstance(checkpoint, dict) else read_checkpoint(checkpoint)
+    branches = []
+    for index, seed in enumerate(seeds):
+        model = load_checkpoint(archive, os.path.join(output_root, f"branch_{index:05d}"))
+        reseed(model, seed)
+        branches.append(model)
+    return branches
+
+
+def reseed(model, seed: int):
+    """
+    This method reseeds the random number generators of a model without touching the rest of its state.
+    :param model: The WolfSheepGrass or VectorizedWolfSheepGrass model to reseed.
+    :param seed: The new seed.
+    :return:
+    """
+
+    model.reset_randomizer(seed)
@@ -0,0 +1,126 @@
+import argparse                                     # Import to parse the command line.
+import inspect                                      # Import to check the options against the engine's constructor.
+import json                                         # Import to print the result of a run as machine-readable text.
+import time                                         # Import to time the run.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_batch import DEFAULT_PARAMETERS, get_engine  # Import the NetLogo defaults and the model classes.
+    from .wsg_output import SINKS, world_sinks             # Import to check the output sinks asked for.
+    from .wsg_stopping import DETECTORS, EarlyStopping     # Import to stop runs which have reached a trivial end state.
+except ImportError:
+    from wsg_batch import DEFAULT_PARAMETERS, get_engine
+    from wsg_output import SINKS, world_sinks
+    from wsg_stopping import DETECTORS, EarlyStopping
+
+# Engines which can be run from the command line.
+ENGINES = ("agent", "vectorized", "distributed", "meanfield")
+
+# Engines which have no animal positions, and so cannot write the sinks which need them.
+POSITIONLESS_ENGINES = ("meanfield",)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    This method builds the parser of the command line, with one option per model parameter.
+    :return: The parser.
+    """
+
+    parser = argparse.ArgumentParser(prog="python -m WolfSheepGrass",
+                                     description="Run the Wolf-Sheep-Grass model headless, or serve the live "
+                                                 "visualization with --serve.")
+    parser.add_argument("--engine", choices=ENGINES, default="agent")
+    parser.add_argument("--steps", type=int, default=500, help="The maximum number of steps of the run.")
+    parser.add_argument("--seed", type=int, help="The seed of the run; if left out, a fresh seed is drawn.")
+    parser.add_argument("--output-dir", help="The directory to write the outputs of the run to; if left out, "
+                                             "nothing is written.")
+    parser.add_argument("--outputs", nargs="+", choices=list(SINKS),
+                        help="The output sinks of the run, e.g. plot density energy; if left out, the engine's default "
+                             "sinks.")
+    parser.add_argument("--collector-window", type=int, help="Hold only this many recent ticks of the population "
+                                                             "series in memory, spilling older ones to disk.")
+    parser.add_argument("--stop", nargs="+", choices=list(DETECTORS), default=[],
+                        help="End the run early when one of these end states is detected.")
+    parser.add_argument("--serve", action="store_true", help="Serve the live visualization instead of running.")
+
+    # Every model parameter can be set, defaulting to NetLogo's value.
+    for name, default in DEFAULT_PARAMETERS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    return parser
+
+
+def check_options(parser: argparse.ArgumentParser, args: argparse.Namespace, options: dict):
+    """
+    This method checks the options of a run against the engine chosen, failing through the parser, so that a bad
+    command line ends with a usage message rather than a traceback from the model.
+    :param parser: The parser of the command line.
+    :param args: The parsed command line.
+    :param options: The options passed to the engine besides the model parameters.
+    :return:
+    """
+
+    if args.serve and args.engine != "agent":
+        parser.error(f"--serve shows the agent engine only, not the {args.engine} engine")
+    if args.steps < 0:
+        parser.error("--steps must not be negative")
+    if args.collector_window is not None and args.collector_window < 1:
+        parser.error("--collector-window must be at least 1")
+
+    # Every option must be accepted by the engine's constructor.
+    accepted = inspect.signature(get_engine(args.engine)).parameters
+    for name in options:
+        if name not in accepted:
+            parser.error(f"--{name.replace('_', '-')} is not supported by the {args.engine} engine")
+
+    # An engine without positions cannot write the sinks which need them.
+    unsupported = world_sinks(options.get("outputs", ()))
+    if args.engine in POSITIONLESS_ENGINES and unsupported:
+        parser.error(f"the {args.engine} engine has no animal positions to write {', '.join(unsupported)}; "
+                     f"use --outputs plot")
+
+
+def main(argv: list = None) -> dict:
+    """
+    This method runs the model as described by the command line and prints the result as JSON. Only the engine run is
+    imported; the visualization is imported only to serve it.
+    :param argv: The arguments, without the program name; if None, those of the process.
+    :return: The result of the run, or None if the visualization was served.
+    """
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    parameters = {name: getattr(args, name) for name in DEFAULT_PARAMETERS}
+
+    # Only pass the options which were given, so that every engine keeps its own defaults.
+    options = {"output_dir": args.output_dir, "seed": args.seed}
+    if args.outputs is not None:
+        options["outputs"] = tuple(args.outputs)
+    if args.collector_window is not None:
+        options["collector_window"] = args.collector_window
+    check_options(parser, args, options)
+
+    # Serve the visualization, which imports the Mesa server stack.
+    if args.serve:
+        try:
+            from .wsg_visualization import run_server
+        except ImportError:
+            from wsg_visualization import run_server
+        run_server(parameters["width"], parameters["height"], seed=args.seed)
+        return None
+
+    # Run the model until it ends, an end state is detected, or the step budget is used up.
+    start = time.perf_counter()
+    model = get_engine(args.engine)(**parameters, **options)
+    stopper = EarlyStopping(args.stop) if args.stop else None
+    termination, state = model.run_until(stopper or (lambda model: False), args.steps)
+    model.close()
+
+    result = {"engine": args.engine, "seed": model._seed,
+              "termination": stopper.reason if stopper is not None and stopper.reason else termination,
+              "state": state, "seconds": round(time.perf_counter() - start, 3)}
+    print(json.dumps(result))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import json                                     # Import to describe the spilled series next to them.
+import operator                                 # Import to accept any integer type as an index.
+import os                                       # Import to create the spill directory and build the file paths.
+import tempfile                                 # Import to spill somewhere when no directory is given.
+import numpy as np                              # Import to hold the recent values and read back the spilled ones.
+import pandas as pd                             # Import to return the history as a table, as DataCollector does.
+from mesa.datacollection import DataCollector   # Import the datacollector the bounded one stands in for.
+
+# Type of the values of every series, in memory and on disk.
+VALUE_DTYPE = np.dtype("<f8")
+
+
+class SeriesBuffer:
+    """
+    List-like series of one model reporter which keeps only its most recent values in memory. Whenever twice the
+    window has been collected, everything older than the window is appended to a binary file as one block, so memory
+    stays bounded however long the run. Indexing and slicing cover the whole history, reading old ticks back from disk,
+    so that code written for the lists of a DataCollector, such as model_vars[name][-1], keeps working.
+    """
+
+    def __init__(self, path: str, window: int, summary_size: int = None):
+        """
+        Initializes the SeriesBuffer class and truncates the file of the series.
+        :param path: The binary file the old values are spilled to.
+        :param window: The number of recent values which are always held in memory.
+        :param summary_size: The number of points of the downsampled summary; if None, no summary is kept.
+        """
+
+        self.path, self.window = path, window
+        open(path, "wb").close()
+
+        # The first "held" entries of the buffer are the values after the "spilled" ones on disk.
+        self.values = np.empty(2 * max(window, 1), VALUE_DTYPE)
+        self.held = self.spilled = 0
+
+        # The summary holds the mean of every bucket of "bucket" ticks. When it is full, neighbouring buckets are
+        # merged and the buckets become twice as long, so it covers the whole run in at most summary_size points.
+        self.summary_size = summary_size
+        self.summary, self.bucket = [], 1
+        self.bucket_sum, self.bucket_count = 0.0, 0
+
+    def append(self, value: float):
+        """
+        This method adds the value of the next tick, spilling the old values first if the buffer is full.
+        :param value: The value reported.
+        :return:
+        """
+
+        if self.held == len(self.values):
+            self.spill(self.held - self.window)
+        self.values[self.held] = value
+        self.held += 1
+
+        # Add the value to the current bucket of the summary.
+        if self.summary_size is not None:
+            self.bucket_sum += value
+            self.bucket_count += 1
+            if self.bucket_count == self.bucket:
+                self.summary.append(self.bucket_sum / self.bucket)
+                self.bucket_sum, self.bucket_count = 0.0, 0
+                if len(self.summary) >= self.summary_size:
+                    pairs = len(self.summary) // 2 * 2
+                    self.summary = [(a + b) / 2 for a, b in zip(self.summary[:pairs:2], self.summary[1:pairs:2])]
+                    self.bucket *= 2
+
+    def extend(self, values):
+        """
+        This method adds the values of several ticks, e.g. when restoring a checkpoint.
+        :param values: The values, in tick order.
+        :return:
+        """
+
+        for value in values:
+            self.append(value)
+
+    def spill(self, count: int):
+        """
+        This method appends the oldest values held in memory to the file as one block.
+        :param count: The number of values to spill.
+        :return:
+        """
+
+        with open(self.path, "ab") as series_file:
+            series_file.write(self.values[:count].tobytes())
+        self.values[:self.held - count] = self.values[count:self.held]
+        self.held -= count
+        self.spilled += count
+
+    def query(self, start: int, stop: int) -> np.ndarray:
+        """
+        This method returns the values of a range of ticks, reading the spilled part back from disk.
+        :param start: The first tick.
+        :param stop: One more than the last tick.
+        :return: A new array of the values.
+        """
+
+        start, stop = max(start, 0), min(stop, len(self))
+        if start >= stop:
+            return np.empty(0, VALUE_DTYPE)
+        parts = []
+        if start < self.spilled:
+            count = min(stop, self.spilled) - start
+            parts.append(np.fromfile(self.path, VALUE_DTYPE, count, offset=start * VALUE_DTYPE.itemsize))
+        if stop > self.spilled:
+            parts.append(self.values[max(start - self.spilled, 0):stop - self.spilled].copy())
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def get_summary(self) -> tuple:
+        """
+        This method returns the downsampled summary of the series, e.g. to chart a long run.
+        :return: The first tick of every bucket and the mean value over it, as arrays.
+        """
+
+        return np.arange(len(self.summary)) * self.bucket, np.array(self.summary)
+
+    def __len__(self) -> int:
+        """
+        This method returns the number of ticks collected, on disk and in memory.
+        :return: The length of the whole series.
+        """
+
+        return self.spilled + self.held
+
+    def __getitem__(self, index):
+        """
+        This method returns the value of one tick or the values of a slice of ticks, as a list would.
+        :param index: An integer, negative to count from the end, or a slice.
+        :return: A float, or an array for a slice.
+        """
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step < 0:
+                return self.query(stop + 1, start + 1)[::step]
+            return self.query(start, stop)[::step]
+
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("series index out of range")
+        if index >= self.spilled:
+            return float(self.values[index - self.spilled])
+        return float(self.query(index, index + 1)[0])
+
+    def __iter__(self):
+        """
+        This method iterates over the values of every tick.
+        :return: An iterator over floats.
+        """
+
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        """
+        This method returns the whole series as an array, so that NumPy and pandas accept it as they accept a list.
+        :return: A new array of the values.
+        """
+
+        values = self.query(0, len(self))
+        return values if dtype is None else values.astype(dtype)
+
+    def tolist(self) -> list:
+        """
+        This method returns the whole series as a list.
+        :return: A list of floats.
+        """
+
+        return self.query(0, len(self)).tolist()
+
+
+class BoundedDataCollector(DataCollector):
+    """
+    DataCollector whose memory does not grow with the length of the run. Every model reporter's series is a
+    SeriesBuffer holding a window of recent ticks, with older ticks spilled to a binary file per reporter. Only model
+    reporters which are functions of the model or bound methods are supported; they are registered through the public
+    model_reporters and model_vars of DataCollector, which collect() reads.
+    """
+
+    def __init__(self, model_reporters: dict, spill_dir: str = None, window: int = 10_000, summary_size: int = 1000):
+        """
+        Initializes the BoundedDataCollector class.
+        :param model_reporters: Maps reporter names to functions of the model or to bound methods.
+        :param spill_dir: The directory the old ticks are spilled to, one file per reporter, described by meta.json;
+                          if None, a temporary directory is used, which is removed with the collector.
+        :param window: The number of recent ticks always held in memory; at most twice as many are.
+        :param summary_size: The number of points of the downsampled summary of every series; if None, none is kept.
+        """
+
+        # Spill to the given directory, or to a temporary one.
+        self.temporary = tempfile.TemporaryDirectory(prefix="wsg_collector_") if spill_dir is None else None
+        self.spill_dir = self.temporary.name if spill_dir is None else spill_dir
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.window, self.summary_size = window, summary_size
+        self.files = {}
+
+        # Register the reporters, each with its own series in place of a list.
+        super().__init__()
+        for name, reporter in model_reporters.items():
+            self.files[name] = f"series_{len(self.files)}.bin"
+            self.model_reporters[name] = reporter
+            self.model_vars[name] = SeriesBuffer(os.path.join(self.spill_dir, self.files[name]), window, summary_size)
+
+        # Describe the files so that the spilled series can be read without the collector.
+        with open(os.path.join(self.spill_dir, "meta.json"), "w") as meta_file:
+            json.dump({"version": 1, "dtype": VALUE_DTYPE.str, "files": self.files}, meta_file)
+
+    def query(self, name: str, start: int, stop: int) -> np.ndarray:
+        """
+        This method returns the values of one reporter over a range of ticks.
+        :param name: The name of the reporter.
+        :param start: The first tick.
+        :param stop: One more than the last tick.
+        :return: A new array of the values.
+        """
+
+        return self.model_vars[name].query(start, stop)
+
+    def get_summary(self, name: str) -> tuple:
+        """
+        This method returns the downsampled summary of one reporter.
+        :param name: The name of the reporter.
+        :return: The first tick of every bucket and the mean value over it, as arrays.
+        """
+
+        return self.model_vars[name].get_summary()
+
+    def get_model_vars_dataframe(self) -> pd.DataFrame:
+        """
+        This method returns the whole history of every reporter, reading the spilled ticks back from disk.
+        :return: A table with one column per reporter and one row per tick.
+        """
+
+        return pd.DataFrame({name: np.asarray(series) for name, series in self.model_vars.items()})
+
+    def close(self):
+        """This method spills every value still held in memory, so that the files hold the whole history."""
+
+        for series in self.model_vars.values():
+            series.spill(series.held)
+
+
+def read_spilled(spill_dir: str) -> dict:
+    """
+    This method reads the series spilled by a closed BoundedDataCollector, e.g. after the run.
+    :param spill_dir: The spill directory of the collector.
+    :return: A dictionary mapping every reporter name to a memory-mapped array of its values.
+    """
+
+    with open(os.path.join(spill_dir, "meta.json")) as meta_file:
+        meta = json.load(meta_file)
+    series = {}
+    for name, file_name in meta["files"].items():
+        path = os.path.join(spill_dir, file_name)
+        dtype = np.dtype(meta["dtype"])
+        series[name] = np.memmap(path, dtype, "r") if os.path.getsize(path) else np.empty(0, dtype)
+    return series
+
+
+def make_collector(model_reporters: dict, window: int = None, output_dir: str = None):
+    """
+    This method builds the DataCollector of a run.
+    :param model_reporters: Maps reporter names to reporters.
+    :param window: The number of recent ticks held in memory by a BoundedDataCollector; if None, a plain DataCollector
+                   keeps every tick in memory.
+    :param output_dir: The output directory of the run, under which a bounded collector spills; if None, it spills to
+                       a temporary directory.
+    :return: The collector.
+    """
+
+    if window is None:
+        return DataCollector(model_reporters=model_reporters, agent_reporters={})
+    spill_dir = None if output_dir is None else os.path.join(output_dir, "collector")
+    return BoundedDataCollector(model_reporters, spill_dir, window)
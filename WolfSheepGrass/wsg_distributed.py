@@ -0,0 +1,541 @@
+import multiprocessing                          # Import to run every tile of the world in its own worker process.
+import numpy as np                              # Import to store and update whole species as arrays.
+from mesa import Model                          # Import the Model base class.
+import random                                   # Import to give each model its own random number generator.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_collector import make_collector         # Import to build the DataCollector of a run.
+    from .wsg_grass import GrassField                 # Import the array-backed grass and dirt patches.
+    from .wsg_output import Outputs                   # Import the output sinks of a run.
+    from .wsg_census import Census, census_reporters  # Import the running counts of births, deaths, and energy.
+    from .wsg_model import RunLoop, RUNNING, ANNIHILATED, SHEEP_INHERIT  # Import the run loop of WolfSheepGrass.
+    from .wsg_random import *                         # Import the seeding of the model's substreams.
+    from .wsg_vectorized import AnimalArrays, VectorizedWolfSheepGrass  # Import the species updates run per tile.
+except ImportError:
+    from wsg_collector import make_collector
+    from wsg_grass import GrassField
+    from wsg_output import Outputs
+    from wsg_census import Census, census_reporters
+    from wsg_model import RunLoop, RUNNING, ANNIHILATED, SHEEP_INHERIT
+    from wsg_random import *
+    from wsg_vectorized import AnimalArrays, VectorizedWolfSheepGrass
+
+# Spawn key of the substreams of the tiles, below which every tile has its own grass and species streams.
+TILE_STREAM = 4
+
+
+def tile_edges(size: int, tiles: int) -> np.ndarray:
+    """
+    This method splits one dimension of the world into nearly equal strips of whole cells.
+    :param size: The width or height of the world.
+    :param tiles: The number of strips.
+    :return: The tiles + 1 integer edges of the strips, starting at 0 and ending at size.
+    """
+
+    return np.arange(tiles + 1) * size // tiles
+
+
+def tile_of(x_pos: np.ndarray, y_pos: np.ndarray, x_edges: np.ndarray, y_edges: np.ndarray) -> np.ndarray:
+    """
+    This method finds the tile which owns each position.
+    :param x_pos: The floating-point x-coordinates, already wrapped into the world.
+    :param y_pos: The floating-point y-coordinates, already wrapped into the world.
+    :param x_edges: The edges of the tiles along x, as returned by tile_edges().
+    :param y_edges: The edges of the tiles along y, as returned by tile_edges().
+    :return: The number of the tile of every position, counting along y first.
+    """
+
+    # Rounding can leave a wrapped coordinate exactly on the far edge of the world, which belongs to the first tile.
+    column = np.searchsorted(x_edges, x_pos.astype(np.int64) % x_edges[-1], side="right") - 1
+    row = np.searchsorted(y_edges, y_pos.astype(np.int64) % y_edges[-1], side="right") - 1
+    return column * (len(y_edges) - 1) + row
+
+
+class Tile(VectorizedWolfSheepGrass):
+    """One rectangular tile of the torus, holding its grass and the animals standing on it."""
+
+    def __init__(self, tile_id: int, x_edges: np.ndarray, y_edges: np.ndarray, width: int, height: int,
+                 parameters: dict, seed: int):
+        """
+        Initializes the Tile class. The species updates of VectorizedWolfSheepGrass are reused as they are.
+        :param tile_id: The number of the tile, counting along y first.
+        :param x_edges: The edges of the tiles along x, as returned by tile_edges().
+        :param y_edges: The edges of the tiles along y, as returned by tile_edges().
+        :param width: Width of the whole grid-world (i.e. horizontal length), used to wrap positions around.
+        :param height: Height of the whole grid-world (i.e. vertical length), used to wrap positions around.
+        :param parameters: The constructor parameters of the model.
+        :param seed: The seed of the run; the tile's streams are substreams of it.
+        """
+
+        # Width and height are those of the whole world, so that moving animals wrap around the torus.
+        self.width, self.height = width, height
+
+        # The tile covers the cells [x0, x1) x [y0, y1).
+        self.tile_id, self.x_edges, self.y_edges = tile_id, x_edges, y_edges
+        column, row = divmod(tile_id, len(y_edges) - 1)
+        self.x0, self.x1 = int(x_edges[column]), int(x_edges[column + 1])
+        self.y0, self.y1 = int(y_edges[row]), int(y_edges[row + 1])
+
+        # Each species of the tile draws its random numbers from its own substream.
+        self.sheep = AnimalArrays("Sheep", parameters["sheep_food_gain"], parameters["sheep_reproduction_rate"])
+        self.wolves = AnimalArrays("Wolf", parameters["wolf_food_gain"], parameters["wolf_reproduction_rate"])
+        self.sheep.rng = np.random.default_rng(substream(seed, TILE_STREAM, tile_id, SPECIES_STREAMS["Sheep"]))
+        self.wolves.rng = np.random.default_rng(substream(seed, TILE_STREAM, tile_id, SPECIES_STREAMS["Wolf"]))
+        self.species = {"Sheep": self.sheep, "Wolf": self.wolves}
+        self.eat = {"Sheep": self.sheep_eat, "Wolf": self.wolf_eat}
+
+        # Births, deaths, and predation within the tile are counted as they happen.
+        self.census = Census()
+
+        # The tile's grass is indexed as [x - x0, y - y0].
+        grass_rng = np.random.default_rng(substream(seed, TILE_STREAM, tile_id, GRASS_STREAM))
+        self.grass = GrassField(self.x1 - self.x0, self.y1 - self.y0, parameters["grass_regrowth_rate"], grass_rng)
+
+    def cell_index(self, animals: AnimalArrays) -> np.ndarray:
+        """
+        This method returns the flattened integer cell index of every animal of a species within the tile.
+        :param animals: The arrays of the species.
+        :return: An integer array indexing into the flattened grass arrays of the tile.
+        """
+
+        n = animals.count
+        x = animals.x_pos[:n].astype(np.int64) % self.width - self.x0
+        y = animals.y_pos[:n].astype(np.int64) % self.height - self.y0
+        return x * (self.y1 - self.y0) + y
+
+    def receive(self, arrivals: dict):
+        """
+        This method adds the animals which migrated into the tile.
+        :param arrivals: Maps species labels to a (4, n) array of x-coordinates, y-coordinates, directions, and energy.
+        :return:
+        """
+
+        for label, rows in arrivals.items():
+            self.species[label].append(*rows)
+
+    def emigrate(self, animals: AnimalArrays) -> dict:
+        """
+        This method takes every animal which has left the tile out of it, grouped by the tile it has entered.
+        :param animals: The arrays of the species.
+        :return: Maps tile numbers to a (4, n) array of x-coordinates, y-coordinates, directions, and energy.
+        """
+
+        # Find the animals standing outside the tile; usually only a few near its edges.
+        n = animals.count
+        x = animals.x_pos[:n].astype(np.int64) % self.width
+        y = animals.y_pos[:n].astype(np.int64) % self.height
+        leaving = np.flatnonzero((x < self.x0) | (x >= self.x1) | (y < self.y0) | (y >= self.y1))
+        if len(leaving) == 0:
+            return {}
+
+        # Pack them up by destination, then drop them from the tile.
+        rows = np.stack([animals.x_pos[leaving], animals.y_pos[leaving],
+                         animals.direction[leaving], animals.energy[leaving]])
+        destination = tile_of(rows[0], rows[1], self.x_edges, self.y_edges)
+        animals.alive[leaving] = False
+        animals.compact()
+        return {int(tile): rows[:, destination == tile] for tile in np.unique(destination)}
+
+    def move_species(self, arrivals: dict, label: str) -> dict:
+        """
+        This method runs the first half of Animal.step for a species: move, then deplete energy by 1 unit.
+        :param arrivals: The animals which migrated into the tile since the last phase, as taken by receive().
+        :param label: The species to move, either "Sheep" or "Wolf".
+        :return: The animals which left the tile, as returned by emigrate().
+        """
+
+        self.receive(arrivals)
+        animals = self.species[label]
+        if animals.count:
+            self.move(animals)
+            animals.energy[:animals.count] -= 1
+        return self.emigrate(animals)
+
+    def feed_species(self, arrivals: dict, label: str) -> dict:
+        """
+        This method runs the second half of Animal.step for a species: eat, starve, then reproduce.
+        :param arrivals: The animals of the species which moved into the tile, as taken by receive().
+        :param label: The species to feed, either "Sheep" or "Wolf".
+        :return: The newborns which were placed outside the tile, as returned by emigrate().
+        """
+
+        self.receive(arrivals)
+        animals = self.species[label]
+        if animals.count == 0:
+            return {}
+
+        # Eat, then check for death from starvation. As in Animal.step, an animal which starved still reproduces.
+        self.eat[label](animals)
+        animals.alive[:animals.count] &= animals.energy[:animals.count] > 0
+        self.census.starved[label] += animals.count - int(np.count_nonzero(animals.alive[:animals.count]))
+        self.reproduce(animals)
+        animals.compact()
+        return self.emigrate(animals)
+
+    def grow_grass(self, arrivals: dict) -> tuple:
+        """
+        This method grows the grass of the tile at the end of a step.
+        :param arrivals: The animals which migrated into the tile since the last phase, as taken by receive().
+        :return: The sheep, wolf, and grass counts of the tile, and its census.
+        """
+
+        self.receive(arrivals)
+        self.grass.grow()
+        return self.get_counts({})
+
+    def get_counts(self, arrivals: dict) -> tuple:
+        """
+        This method returns the populations of the tile, and its census with the energy of its animals totalled.
+        :param arrivals: The animals which migrated into the tile since the last phase, as taken by receive().
+        :return: The sheep, wolf, and grass counts of the tile, and its census.
+        """
+
+        self.receive(arrivals)
+        self.count_energy()
+        return self.sheep.count, self.wolves.count, self.grass.get_grass_count(), self.census
+
+    def snapshot(self) -> tuple:
+        """
+        This method returns the state of the tile needed by the output sinks.
+        :return: The tile's corner, its grass array, and the positions and energy of its wolves and sheep.
+        """
+
+        return (self.x0, self.y0, self.grass.patch_color.copy(),
+                tuple(column.copy() for column in self.get_positions_and_energy(self.wolves)),
+                tuple(column.copy() for column in self.get_positions_and_energy(self.sheep)))
+
+
+def tile_worker(connection, *tile_args):
+    """
+    This method runs one tile in a worker process, executing the commands sent by the model until it is closed.
+    :param connection: The worker's end of the pipe to the model.
+    :param tile_args: The arguments of the Tile constructor.
+    :return:
+    """
+
+    tile = Tile(*tile_args)
+    while True:
+        command, args = connection.recv()
+        if command == "close":
+            break
+        connection.send(getattr(tile, command)(*args))
+    connection.close()
+
+
+class TileProcess:
+    """Handle of a tile running in a worker process."""
+
+    def __init__(self, *tile_args):
+        """
+        Initializes the TileProcess class and starts the worker.
+        :param tile_args: The arguments of the Tile constructor.
+        """
+
+        self.connection, worker_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=tile_worker, args=(worker_connection,) + tile_args, daemon=True)
+        self.process.start()
+
+    def send(self, command: str, *args):
+        """
+        This method asks the tile to run one of its methods, without waiting for the result.
+        :param command: The name of the Tile method.
+        :param args: The arguments of the method.
+        :return:
+        """
+
+        self.connection.send((command, args))
+
+    def recv(self):
+        """
+        This method waits for the result of the last command.
+        :return: The value returned by the Tile method.
+        """
+
+        return self.connection.recv()
+
+    def close(self):
+        """This method stops the worker process."""
+
+        self.connection.send(("close", ()))
+        self.process.join()
+        self.connection.close()
+
+
+class LocalTile:
+    """Handle of a tile running in this process, with the same interface as TileProcess, for debugging."""
+
+    def __init__(self, *tile_args):
+        """
+        Initializes the LocalTile class.
+        :param tile_args: The arguments of the Tile constructor.
+        """
+
+        self.tile, self.result = Tile(*tile_args), None
+
+    def send(self, command: str, *args):
+        """
+        This method runs one of the tile's methods.
+        :param command: The name of the Tile method.
+        :param args: The arguments of the method.
+        :return:
+        """
+
+        self.result = getattr(self.tile, command)(*args)
+
+    def recv(self):
+        """
+        This method returns the result of the last command.
+        :return: The value returned by the Tile method.
+        """
+
+        return self.result
+
+    def close(self):
+        """This method does nothing, since there is no worker to stop."""
+
+
+class DistributedWolfSheepGrass(RunLoop, Model):
+    """Alternative to VectorizedWolfSheepGrass which splits the torus into tiles, each run by its own process."""
+
+    def __init__(self, width: int, height: int,
+                 grass_regrowth_rate: int, initial_wolves: int, initial_sheep: int,
+                 wolf_food_gain: int, sheep_food_gain: int,
+                 wolf_reproduction_rate: float, sheep_reproduction_rate: float,
+                 max_sheep: int, tiles: tuple = (2, 2), processes: bool = True, output_dir: str = "../Graphics",
+                 outputs: tuple = ("plot",), collector_window: int = None, seed: int = None) -> None:
+        """
+        Initializes the DistributedWolfSheepGrass model. The parameters are the same as for WolfSheepGrass, plus:
+        :param tiles: The number of tiles along x and along y.
+        :param processes: If True, every tile runs in its own worker process; if False, all tiles run in this process.
+        :param output_dir: The directory to write the outputs of the run to; if None, nothing is written.
+        :param outputs: The output sinks of the run, as for WolfSheepGrass. Only plot.csv is written by default, as
+                        every other sink gathers the whole world from the tiles on the ticks it writes.
+        :param collector_window: If given, the DataCollector holds only this many recent ticks in memory and spills
+                                 older ones to output_dir/collector, for very long runs; if None, it holds every tick.
+        :param seed: The seed of the run, from which every random number stream is derived; if None, a fresh seed is
+                     drawn, which can be read back from model._seed to reproduce the run.
+        """
+
+        # Initialize the Model base class.
+        super().__init__()
+
+        # The tiles and output are set up by reset().
+        self.handles, self.outputs = [], None
+
+        # Set up the world for the first run.
+        self.parameters = {}
+        self.reset(dict(width=width, height=height, grass_regrowth_rate=grass_regrowth_rate,
+                        initial_wolves=initial_wolves, initial_sheep=initial_sheep,
+                        wolf_food_gain=wolf_food_gain, sheep_food_gain=sheep_food_gain,
+                        wolf_reproduction_rate=wolf_reproduction_rate, sheep_reproduction_rate=sheep_reproduction_rate,
+                        max_sheep=max_sheep, tiles=tuple(tiles), processes=processes,
+                        output_dir=output_dir, outputs=outputs, collector_window=collector_window), seed)
+
+    def reset(self, parameters: dict = None, seed: int = None):
+        """
+        This method sets the model up for a new run, starting a new set of tiles.
+        :param parameters: Constructor parameters to change for the new run; parameters left out keep their values.
+        :param seed: The seed of the run, from which every random number stream is derived; if None, a fresh seed is
+                     drawn.
+        :return:
+        """
+
+        # Merge the new parameters into those of the previous run.
+        self.parameters = dict(self.parameters, **(parameters or {}))
+        settings = self.parameters
+
+        # Seed the model's random number streams, remembering the seed so that the run can be reproduced.
+        self._seed = new_seed() if seed is None else seed
+        self.random = random.Random(derive_seed(self._seed, MODEL_STREAM))
+
+        # Keep track of the current time step, and of why the run ended.
+        self.time = 0
+        self.running, self.termination = True, RUNNING
+
+        # Width and height define the x- and y-dimensions of the world, respectively.
+        self.width, self.height = settings["width"], settings["height"]
+
+        # Don't let the number of sheep grow too large.
+        self.max_sheep = settings["max_sheep"]
+
+        # Split the torus into tiles, and start one worker per tile.
+        self.close_tiles()
+        self.x_edges = tile_edges(self.width, settings["tiles"][0])
+        self.y_edges = tile_edges(self.height, settings["tiles"][1])
+        handle_class = TileProcess if settings["processes"] else LocalTile
+        self.handles = [handle_class(tile_id, self.x_edges, self.y_edges, self.width, self.height, settings,
+                                     self._seed)
+                        for tile_id in range(settings["tiles"][0] * settings["tiles"][1])]
+
+        # Births, deaths, predation, and the energy of each species are summed over the censuses of the tiles.
+        self.census = Census()
+
+        # Add initial sheep, then the initial wolves, each placed on the tile it stands on.
+        arrivals = [{} for _ in self.handles]
+        for label, count, food_gain in (("Sheep", settings["initial_sheep"], settings["sheep_food_gain"]),
+                                        ("Wolf", settings["initial_wolves"], settings["wolf_food_gain"])):
+            # Position is random in the world, direction is random, and energy is between 0 and twice the food gain.
+            rng = np.random.default_rng(substream(self._seed, SPECIES_STREAMS[label]))
+            rows = np.stack([rng.uniform(0, self.width, count), rng.uniform(0, self.height, count),
+                             rng.uniform(0, 2 * np.pi, count),
+                             2 * rng.integers(0, max(food_gain, 1), count).astype(float)])
+            destination = tile_of(rows[0], rows[1], self.x_edges, self.y_edges)
+            for tile in np.unique(destination):
+                arrivals[tile][label] = rows[:, destination == tile]
+        self.update_counts(self.broadcast("get_counts", arrivals))
+
+        # Clear output files for new test run, opening the output sinks of the new run once the tiles are up.
+        if self.outputs is not None:
+            self.outputs.close()
+        self.output_dir = settings["output_dir"]
+        self.outputs = Outputs(self, self.output_dir, settings["outputs"])
+
+        # Define DataCollector instance, which tracks the population of wolves and sheep as well as the number of grass,
+        # and the running counts and energy of the census.
+        self.dc = make_collector({"Sheep Count": self.get_sheep_count,
+                                  "Wolf Count": self.get_wolf_count,
+                                  "Grass / 5 Count": self.get_grass_count,
+                                  **census_reporters()},
+                                 settings.get("collector_window"), self.output_dir)
+
+    def step(self):
+        """This method provides the logic loop for each step of the model."""
+
+        # Collect sheep, wolf, and grass populations, summed over every tile.
+        self.dc.collect(self)
+
+        # Output the current tick to every output sink due on it; sinks which need the world gather it from every tile.
+        self.outputs.write(self)
+
+        # Increment the time step.
+        self.time += 1
+
+        # First, move the sheep, then the wolves. Animals which cross into another tile while moving migrate before
+        # eating; newborns placed on another tile migrate before the next species moves.
+        arrivals = [{} for _ in self.handles]
+        for label in ("Sheep", "Wolf"):
+            arrivals = self.route(label, self.broadcast("move_species", arrivals, label))
+            arrivals = self.route(label, self.broadcast("feed_species", arrivals, label))
+
+        # Finally, grow the grass. (Note: sheep have a chance to be standing on grass)
+        self.update_counts(self.broadcast("grow_grass", arrivals))
+
+        # Get wolf and sheep counts.
+        wolf_count, sheep_count = self.get_wolf_count(), self.get_sheep_count()
+
+        # Are the wolves and sheep annihilated?
+        are_annihilated = wolf_count <= 0 and sheep_count <= 0
+
+        # Do the sheep rule the world?
+        sheep_inherit = wolf_count <= 0 and sheep_count > self.max_sheep
+
+        if are_annihilated:
+            self.stop(ANNIHILATED)
+        elif sheep_inherit:
+            self.stop(SHEEP_INHERIT)
+
+    def broadcast(self, command: str, arrivals: list, *args) -> list:
+        """
+        This method runs one phase on every tile at once, then waits for all of them.
+        :param command: The name of the Tile method to run.
+        :param arrivals: The animals migrating into each tile, one dictionary per tile.
+        :param args: Further arguments of the method, the same for every tile.
+        :return: The results of the tiles, in tile order.
+        """
+
+        for handle, tile_arrivals in zip(self.handles, arrivals):
+            handle.send(command, tile_arrivals, *args)
+        return [handle.recv() for handle in self.handles]
+
+    def route(self, label: str, emigrants: list) -> list:
+        """
+        This method gathers the animals which left each tile into the arrivals of the tiles they entered.
+        :param label: The species of the animals, either "Sheep" or "Wolf".
+        :param emigrants: The animals which left each tile, as returned by Tile.emigrate(), one per tile.
+        :return: The animals migrating into each tile, one dictionary per tile.
+        """
+
+        parts = [[] for _ in self.handles]
+        for tile_emigrants in emigrants:
+            for tile, rows in tile_emigrants.items():
+                parts[tile].append(rows)
+        return [{label: np.concatenate(tile_parts, axis=1)} if tile_parts else {} for tile_parts in parts]
+
+    def update_counts(self, counts: list):
+        """
+        This method sums the populations and censuses reported by every tile.
+        :param counts: The sheep, wolf, and grass counts of each tile, and its census.
+        :return:
+        """
+
+        totals = np.sum([tile_counts[:3] for tile_counts in counts], axis=0)
+        self.sheep_count, self.wolf_count, self.grass_count = (int(total) for total in totals)
+
+        # The counts of every tile run from its start, so the model's census is summed afresh.
+        self.census.reset()
+        for *_, tile_census in counts:
+            self.census.add_census(tile_census)
+
+    def get_world(self) -> tuple:
+        """
+        This method gathers the whole world from the tiles, for the output sinks.
+        :return: The grass array, and the x-coordinates, y-coordinates, and energy of the wolves and of the sheep.
+        """
+
+        for handle in self.handles:
+            handle.send("snapshot")
+        snapshots = [handle.recv() for handle in self.handles]
+
+        # Assemble the grass of the whole world, then concatenate the animals of every tile.
+        patch_color = np.empty((self.width, self.height), dtype=bool)
+        for x0, y0, tile_patch_color, _, _ in snapshots:
+            patch_color[x0:x0 + tile_patch_color.shape[0], y0:y0 + tile_patch_color.shape[1]] = tile_patch_color
+        wolves = tuple(np.concatenate([snapshot[3][column] for snapshot in snapshots]) for column in range(3))
+        sheep = tuple(np.concatenate([snapshot[4][column] for snapshot in snapshots]) for column in range(3))
+        return patch_color, wolves, sheep
+
+    def close(self):
+        """This method flushes the model's output and stops the workers of the tiles. Closing twice has no effect."""
+
+        super().close()
+        self.close_tiles()
+
+    def close_tiles(self):
+        """This method stops the workers of the tiles."""
+
+        for handle in self.handles:
+            handle.close()
+        self.handles = []
+
+    def get_state(self) -> dict:
+        """
+        This method returns a summary of the current state of the model.
+        :return: A dictionary with the time step and the sheep, wolf, and grass counts.
+        """
+
+        return {"time": self.time, "sheep": self.sheep_count, "wolves": self.wolf_count, "grass": self.grass_count}
+
+    def get_sheep_count(self) -> int:
+        """
+        This method returns the current population of sheep in the simulation.
+        :return: An integer representing the population of sheep.
+        """
+
+        return self.sheep_count
+
+    def get_wolf_count(self) -> int:
+        """
+        This method returns the current population of wolves in the simulation.
+        :return: An integer representing the population of wolves.
+        """
+
+        return self.wolf_count
+
+    def get_grass_count(self) -> float:
+        """
+        This method returns the current number of grass patches divided by 5 (to be closer to wolf/sheep populations).
+        :return: A floating-point number representing the approximate number of grass patches divided by 5.
+        """
+
+        return self.grass_count / 5
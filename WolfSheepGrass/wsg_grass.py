@@ -0,0 +1,146 @@
+import numpy as np  # Import to store and grow every patch of the world as arrays.
+
+# Define constants for patches of grass and dirt.
+GRASS_PATCH, DIRT_PATCH = True, False
+
+
+class GrassField:
+    """
+    Array-backed grass and dirt for every patch of the world. Dirt is kept on a timer wheel: every patch of dirt waits
+    in the bucket of the tick it grows back on, so a step only visits the patches coming due rather than the world.
+    """
+
+    def __init__(self, width: int, height: int, grass_regrowth_time: int, rng: np.random.Generator):
+        """
+        Initializes the GrassField class used for representing grass and dirt.
+        :param width: Width of the grid-world (i.e. horizontal length).
+        :param height: Height of the grid-world (i.e. vertical length).
+        :param grass_regrowth_time: An integer value between 0 and 100 used to determine when dirt grows to grass.
+        :param rng: The NumPy random generator used to lay out the initial grass and dirt.
+        """
+
+        # Width and height define the x- and y-dimensions of the world, respectively.
+        self.width, self.height = width, height
+
+        # Patches are indexed as [x, y]. The arrays are allocated once and refilled in place by reset(); the flat view
+        # indexes the same patches by x * height + y.
+        self.patch_color = np.empty((width, height), dtype=bool)
+        self.flat_color = self.patch_color.reshape(-1)
+
+        # The tick on which every patch of dirt grows back. Grass patches keep the tick they last grew back on.
+        self.due = np.empty(width * height, dtype=np.int64)
+        self.reset(grass_regrowth_time, rng)
+
+    def reset(self, grass_regrowth_time: int, rng: np.random.Generator):
+        """
+        This method lays out a new random arrangement of grass and dirt, reusing the existing arrays.
+        :param grass_regrowth_time: An integer value between 0 and 100 used to determine when dirt grows to grass.
+        :param rng: The NumPy random generator used to lay out the grass and dirt.
+        :return:
+        """
+
+        # Grass regrowth time defines how many steps a patch of dirt will take before growing grass.
+        self.grass_regrowth_time = grass_regrowth_time
+
+        # There is a 50% chance upon generation that a patch is grass.
+        shape = self.patch_color.shape
+        np.greater_equal(rng.uniform(0, 1, shape), 0.5, out=self.patch_color)
+
+        # Countdown is used to determine when grass grows back. If the patch is grass, it is set to maximum growth time.
+        # If the patch is dirt, then it is set between 0 and the grass regrowth time.
+        countdown = rng.integers(0, grass_regrowth_time + 1, shape)
+        countdown[self.patch_color] = grass_regrowth_time
+        self.set_countdown(countdown)
+
+    def set_countdown(self, countdown: np.ndarray):
+        """
+        This method sets the countdown of every patch of dirt, as NetLogo keeps it, and fills the timer wheel from it.
+        :param countdown: An array of the same shape as the world; the entries of grass patches are ignored.
+        :return:
+        """
+
+        # The ticks are counted from this point on. Dirt with a countdown of c grows back on the (c + 1)-th call to
+        # grow(), as NetLogo only turns dirt green once its countdown has run down to zero.
+        self.tick = 0
+        self.due[...] = countdown.reshape(-1) + 1
+
+        # The grass is counted once here, then kept up to date as patches are eaten and grow back.
+        self.grass_count = int(np.count_nonzero(self.flat_color))
+
+        # No patch is ever due more than grass_regrowth_time + 1 ticks ahead, so that many buckets cover every tick.
+        self.wheel = [[] for _ in range(self.grass_regrowth_time + 1)]
+        dirt = np.flatnonzero(~self.flat_color)
+        for bucket, cells in zip(*self.split_by_bucket(dirt)):
+            self.wheel[bucket].extend(cells.tolist())
+
+    def split_by_bucket(self, cells: np.ndarray) -> tuple:
+        """
+        This method groups patches of dirt by the bucket of the tick they are due on.
+        :param cells: The flat indices of the patches.
+        :return: The buckets, and a list with the flat indices of the patches in each of them.
+        """
+
+        buckets = self.due[cells] % len(self.wheel)
+        order = np.argsort(buckets, kind="stable")
+        buckets, cells = buckets[order], cells[order]
+        starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+        return buckets[starts].tolist(), np.split(cells, starts[1:])
+
+    @property
+    def countdown(self) -> np.ndarray:
+        """
+        This property computes the countdown of every patch as NetLogo keeps it, e.g. to store it in a checkpoint.
+        :return: A new array of the same shape as the world.
+        """
+
+        countdown = self.due - self.tick - 1
+        countdown[self.flat_color] = self.grass_regrowth_time
+        return countdown.reshape(self.patch_color.shape)
+
+    def eat(self, x: int, y: int):
+        """
+        This method turns one patch of grass into dirt, which grows back grass_regrowth_time ticks from the next one.
+        :param x: The x-coordinate of the patch.
+        :param y: The y-coordinate of the patch.
+        :return:
+        """
+
+        self.patch_color[x, y] = DIRT_PATCH
+        self.grass_count -= 1
+        due = self.tick + self.grass_regrowth_time + 1
+        cell = x * self.height + y
+        self.due[cell] = due
+        self.wheel[due % len(self.wheel)].append(cell)
+
+    def eat_cells(self, cells: np.ndarray):
+        """
+        This method turns many patches of grass into dirt at once.
+        :param cells: The flat indices of the patches, none of them dirt already.
+        :return:
+        """
+
+        # Every patch eaten on the same tick is due on the same tick, so they all go into the same bucket.
+        due = self.tick + self.grass_regrowth_time + 1
+        self.flat_color[cells] = DIRT_PATCH
+        self.grass_count -= len(cells)
+        self.due[cells] = due
+        self.wheel[due % len(self.wheel)].extend(cells.tolist())
+
+    def grow(self):
+        """This method provides the logic for growing patches of dirt into patches of grass."""
+
+        # Brown patches whose countdown has run out turn green, emptying their bucket for the ticks to come.
+        self.tick += 1
+        bucket = self.wheel[self.tick % len(self.wheel)]
+        if bucket:
+            self.flat_color[bucket] = GRASS_PATCH
+            self.grass_count += len(bucket)
+            bucket.clear()
+
+    def get_grass_count(self) -> int:
+        """
+        This method returns the current number of grass patches.
+        :return: An integer representing the number of grass patches.
+        """
+
+        return self.grass_count
@@ -0,0 +1,63 @@
+class SpeciesIndex:
+    """Per-cell lists of the animals of one species, kept in sync as they move, are born, and die."""
+
+    def __init__(self, width: int, height: int):
+        """
+        Initializes the SpeciesIndex class with an empty list for every cell of the world.
+        :param width: Width of the grid-world (i.e. horizontal length).
+        :param height: Height of the grid-world (i.e. vertical length).
+        """
+
+        # Cells are indexed as [x][y], the same as the Mesa grid.
+        self.cells = [[[] for _ in range(height)] for _ in range(width)]
+
+    def add(self, agent, pos: tuple):
+        """
+        This method adds an animal to the list of the cell it occupies.
+        :param agent: The animal to add.
+        :param pos: The integer xy-coordinate of the animal's cell.
+        :return:
+        """
+
+        # Remember where in the cell's list the animal is, so it can be removed without a search.
+        cell = self.cells[pos[0]][pos[1]]
+        agent.cell_slot = len(cell)
+        cell.append(agent)
+
+    def remove(self, agent, pos: tuple):
+        """
+        This method removes an animal from the list of the cell it occupies in constant time.
+        :param agent: The animal to remove.
+        :param pos: The integer xy-coordinate of the animal's cell.
+        :return:
+        """
+
+        # Fill the animal's slot with the last animal in the cell, then shorten the list by one.
+        cell = self.cells[pos[0]][pos[1]]
+        last = cell.pop()
+        if last is not agent:
+            cell[agent.cell_slot] = last
+            last.cell_slot = agent.cell_slot
+
+    def move(self, agent, old_pos: tuple, new_pos: tuple):
+        """
+        This method moves an animal from the list of one cell to another.
+        :param agent: The animal to move.
+        :param old_pos: The integer xy-coordinate of the cell the animal is leaving.
+        :param new_pos: The integer xy-coordinate of the cell the animal is entering.
+        :return:
+        """
+
+        # Animals often stay within the same cell, in which case there is nothing to update.
+        if old_pos != new_pos:
+            self.remove(agent, old_pos)
+            self.add(agent, new_pos)
+
+    def get_cell(self, pos: tuple) -> list:
+        """
+        This method returns the animals in a cell. The list is the index's own, so it must not be modified.
+        :param pos: The integer xy-coordinate of the cell.
+        :return: The list of animals of this species in the cell.
+        """
+
+        return self.cells[pos[0]][pos[1]]
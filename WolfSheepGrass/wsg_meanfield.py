@@ -0,0 +1,340 @@
+import numpy as np                              # Import to track the energy distribution of each species as arrays.
+import pandas as pd                             # Import to tabulate the screening of a sweep.
+from mesa import Model                          # Import the Model base class.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_collector import make_collector         # Import to build the DataCollector of a run.
+    from .wsg_model import RunLoop, RUNNING, ANNIHILATED, SHEEP_INHERIT  # Import the run loop of WolfSheepGrass.
+    from .wsg_output import Outputs, world_sinks      # Import the output sinks of a run.
+    from .wsg_census import Census, census_reporters  # Import the expected counts of births, deaths, and energy.
+    from .wsg_batch import parameter_grid             # Import to expand a sweep into its parameter combinations.
+except ImportError:
+    from wsg_collector import make_collector
+    from wsg_model import RunLoop, RUNNING, ANNIHILATED, SHEEP_INHERIT
+    from wsg_output import Outputs, world_sinks
+    from wsg_census import Census, census_reporters
+    from wsg_batch import parameter_grid
+
+# Expected populations below this are rounded down to none, so that an extinct species cannot grow back from a
+# fraction of an animal.
+EXTINCT = 0.5
+
+
+class EnergyClasses:
+    """The expected number of animals of one species at every integer energy level from -1 up to a maximum."""
+
+    def __init__(self, food_gain: int, reproduction_rate: float, initial: float, max_energy: int):
+        """
+        Initializes the EnergyClasses class, spreading the initial animals as WolfSheepGrass does.
+        :param food_gain: An integer value which determines how much energy the animal gains from eating.
+        :param reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
+        :param initial: The initial number of animals.
+        :param max_energy: The highest energy level tracked; animals with more energy are counted at this level.
+        """
+
+        self.food_gain, self.reproduction_rate = food_gain, reproduction_rate
+
+        # Level i holds the animals with energy i - 1. Animals with energy of at most 0 only appear as the newborns of
+        # animals which starved, which live until their next step as in the agent model.
+        self.energy = np.arange(-1, max_energy + 1, dtype=float)
+        self.count = np.zeros(len(self.energy))
+
+        # Initial energy is twice a random integer between 0 and the food gain.
+        levels = 2 * np.arange(max(food_gain, 1))
+        self.place(levels, np.full(len(levels), initial / len(levels)))
+
+    def place(self, energy: np.ndarray, count: np.ndarray):
+        """
+        This method adds animals to the levels, splitting those with a fractional energy between the two nearest levels.
+        :param energy: The energy of each group of animals.
+        :param count: The number of animals in each group.
+        :return:
+        """
+
+        position = np.clip(energy, self.energy[0], self.energy[-1]) - self.energy[0]
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, len(self.energy) - 1)
+        weight = position - lower
+        levels = len(self.energy)
+        self.count += np.bincount(lower, count * (1 - weight), levels) + np.bincount(upper, count * weight, levels)
+
+    def total(self) -> float:
+        """
+        This method returns the expected number of animals.
+        :return: The sum over every energy level.
+        """
+
+        return float(self.count.sum())
+
+    def step(self, eat_probability: float) -> tuple:
+        """
+        This method runs one step of Animal.step for the expected animals: moving costs one unit of energy, a fraction
+        of the animals eats, those out of energy starve, and every animal, starved or not, may reproduce.
+        :param eat_probability: The chance of an animal finding food this step.
+        :return: The expected numbers of births and of animals which starved.
+        """
+
+        count, rate = self.count, self.reproduction_rate
+        hungry, fed = self.energy - 1, self.energy - 1 + self.food_gain
+        energy = np.concatenate([hungry, fed])
+        group = np.concatenate([count * (1 - eat_probability), count * eat_probability])
+        alive = energy > 0
+
+        # Survivors which do not reproduce keep their energy, and those which do share half of it with their child.
+        # Animals which starved are gone, but their children are born with half their energy.
+        self.count = np.zeros(len(self.energy))
+        self.place(np.concatenate([energy[alive], energy / 2]),
+                   np.concatenate([group[alive] * (1 - rate), group * np.where(alive, 2 * rate, rate)]))
+        return float(group.sum() * rate), float(group[~alive].sum())
+
+    def remove(self, fraction: float):
+        """
+        This method removes the same fraction of the animals at every energy level, e.g. the sheep eaten by wolves.
+        :param fraction: The fraction of the animals removed.
+        :return:
+        """
+
+        self.count *= 1 - fraction
+
+    def check_extinction(self):
+        """This method rounds a population which has dropped below EXTINCT down to none."""
+
+        if self.total() < EXTINCT:
+            self.count[...] = 0
+
+
+class MeanFieldWolfSheepGrass(RunLoop, Model):
+    """
+    Deterministic mean-field approximation of WolfSheepGrass, stepping the expected populations rather than animals.
+    Each species is tracked as the expected number of animals at every energy level and the dirt as the expected
+    number of patches growing back on each of the next ticks; animals meet food as if they were spread uniformly at
+    random over the world. A run takes milliseconds, which makes it suitable for screening parameter sweeps.
+    """
+
+    def __init__(self, width: int, height: int,
+                 grass_regrowth_rate: int, initial_wolves: int, initial_sheep: int,
+                 wolf_food_gain: int, sheep_food_gain: int,
+                 wolf_reproduction_rate: float, sheep_reproduction_rate: float,
+                 max_sheep: int, max_energy: int = 500, output_dir: str = None, outputs: tuple = ("plot",),
+                 collector_window: int = None, seed: int = None) -> None:
+        """
+        Initializes the MeanFieldWolfSheepGrass model. The parameters are the same as for WolfSheepGrass, plus:
+        :param max_energy: The highest energy level tracked; animals with more energy are counted at this level.
+        :param output_dir: The directory to write the outputs of the run to; if None, nothing is written.
+        :param outputs: The output sinks of the run. Only sinks which need no positions, such as "plot", can be used;
+                        the others raise a ValueError.
+        :param collector_window: If given, the DataCollector holds only this many recent ticks in memory and spills
+                                 older ones to output_dir/collector, for very long runs; if None, it holds every tick.
+        :param seed: Ignored, as the model is deterministic; accepted so that the model can stand in for the others.
+        """
+
+        # Initialize the Model base class.
+        super().__init__()
+        self.outputs = None
+
+        # Set up the world for the first run.
+        self.parameters = {}
+        self.reset(dict(width=width, height=height, grass_regrowth_rate=grass_regrowth_rate,
+                        initial_wolves=initial_wolves, initial_sheep=initial_sheep,
+                        wolf_food_gain=wolf_food_gain, sheep_food_gain=sheep_food_gain,
+                        wolf_reproduction_rate=wolf_reproduction_rate, sheep_reproduction_rate=sheep_reproduction_rate,
+                        max_sheep=max_sheep, max_energy=max_energy, output_dir=output_dir, outputs=outputs,
+                        collector_window=collector_window), seed)
+
+    def reset(self, parameters: dict = None, seed: int = None):
+        """
+        This method sets the model up for a new run.
+        :param parameters: Constructor parameters to change for the new run; parameters left out keep their values.
+        :param seed: Ignored, as the model is deterministic.
+        :return:
+        """
+
+        # Merge the new parameters into those of the previous run. The model has no positions, so sinks which need
+        # them are refused before anything is changed.
+        settings = dict(self.parameters, **(parameters or {}))
+        unsupported = world_sinks(settings["outputs"])
+        if unsupported:
+            raise ValueError(f"The mean-field model has no animal positions to write the {', '.join(unsupported)} "
+                             f"output; use sinks such as \"plot\" only.")
+        self.parameters = settings
+        self._seed = seed
+
+        # Keep track of the current time step, and of why the run ended.
+        self.time = 0
+        self.running, self.termination = True, RUNNING
+
+        # Width and height define the x- and y-dimensions of the world, respectively.
+        self.width, self.height = settings["width"], settings["height"]
+        self.area = self.width * self.height
+
+        # Don't let the number of sheep grow too large.
+        self.max_sheep = settings["max_sheep"]
+
+        # Spread the initial animals over their energy levels.
+        self.sheep = EnergyClasses(settings["sheep_food_gain"], settings["sheep_reproduction_rate"],
+                                   settings["initial_sheep"], settings["max_energy"])
+        self.wolves = EnergyClasses(settings["wolf_food_gain"], settings["wolf_reproduction_rate"],
+                                    settings["initial_wolves"], settings["max_energy"])
+
+        # Half of the world starts as grass. The dirt grows back on one of the next grass_regrowth_rate + 1 ticks, as
+        # its initial countdown is uniform; regrowing[k] is the dirt growing back k ticks from now.
+        regrowth_time = settings["grass_regrowth_rate"]
+        self.grass = self.area / 2
+        self.regrowing = np.full(regrowth_time + 1, self.area / 2 / (regrowth_time + 1))
+
+        # The smallest expected population of each species so far, from which the extinction risk is estimated.
+        self.min_sheep, self.min_wolves = self.get_sheep_count(), self.get_wolf_count()
+
+        # Expected births, deaths, predation, and the energy of each species are counted every step.
+        self.census = Census()
+        self.count_energy()
+
+        # Clear output files for new test run, opening the output sinks of the new run.
+        if self.outputs is not None:
+            self.outputs.close()
+        self.output_dir = settings["output_dir"]
+        self.outputs = Outputs(self, self.output_dir, settings["outputs"])
+
+        # Define DataCollector instance, which tracks the population of wolves and sheep as well as the number of grass,
+        # and the expected counts and energy of the census.
+        self.dc = make_collector({"Sheep Count": self.get_sheep_count,
+                                  "Wolf Count": self.get_wolf_count,
+                                  "Grass / 5 Count": self.get_grass_count,
+                                  **census_reporters()},
+                                 settings.get("collector_window"), self.output_dir)
+
+    def step(self):
+        """This method provides the logic loop for each step of the model."""
+
+        # Collect sheep, wolf, and grass populations.
+        self.dc.collect(self)
+
+        # Output the current tick to every output sink due on it.
+        self.outputs.write(self)
+
+        # Increment the time step.
+        self.time += 1
+
+        # First, move the sheep. A sheep eats if its cell has grass and no other sheep ate it first; with the sheep
+        # spread at random, the grass eaten is the grass in the cells occupied by at least one sheep.
+        sheep = self.sheep.total()
+        eaten = self.grass * -np.expm1(-sheep / self.area)
+        self.count_births(self.sheep, "Sheep", eaten / sheep if sheep else 0.0)
+        self.grass -= eaten
+        self.regrowing[-1] += eaten
+
+        # Then move the wolves. A wolf eats if its cell has a sheep; for sparse populations, about one sheep is eaten
+        # in every cell holding both at least one wolf and at least one sheep.
+        wolves, sheep = self.wolves.total(), self.sheep.total()
+        kills = min(self.area * -np.expm1(-wolves / self.area) * -np.expm1(-sheep / self.area), sheep)
+        self.count_births(self.wolves, "Wolf", kills / wolves if wolves else 0.0)
+        if sheep:
+            self.sheep.remove(kills / sheep)
+            self.census.eaten += float(kills)
+
+        # Finally, grow the grass due on this tick.
+        self.grass += self.regrowing[0]
+        self.regrowing[:-1] = self.regrowing[1:]
+        self.regrowing[-1] = 0
+
+        # Round populations of less than one animal down to extinction.
+        self.sheep.check_extinction()
+        self.wolves.check_extinction()
+        self.count_energy()
+        wolf_count, sheep_count = self.get_wolf_count(), self.get_sheep_count()
+        self.min_sheep, self.min_wolves = min(self.min_sheep, sheep_count), min(self.min_wolves, wolf_count)
+
+        # Are the wolves and sheep annihilated?
+        are_annihilated = wolf_count <= 0 and sheep_count <= 0
+
+        # Do the sheep rule the world?
+        sheep_inherit = wolf_count <= 0 and sheep_count > self.max_sheep
+
+        if are_annihilated:
+            self.stop(ANNIHILATED)
+        elif sheep_inherit:
+            self.stop(SHEEP_INHERIT)
+
+    def count_births(self, animals: EnergyClasses, label: str, eat_probability: float):
+        """
+        This method steps the expected animals of a species, counting their expected births and starvations.
+        :param animals: The energy classes of the species.
+        :param label: The species, either "Sheep" or "Wolf".
+        :param eat_probability: The chance of an animal finding food this step.
+        :return:
+        """
+
+        births, starved = animals.step(eat_probability)
+        self.census.births[label] += births
+        self.census.starved[label] += starved
+
+    def count_energy(self):
+        """This method totals the expected energy of every species for the census, from its energy levels."""
+
+        for label, animals in (("Sheep", self.sheep), ("Wolf", self.wolves)):
+            self.census.set_distribution(label, animals.energy, animals.count)
+
+    def extinction_risk(self) -> dict:
+        """
+        This method estimates the chance of each species dying out in the agent model over the run so far. A population
+        with an expected size of n is taken to be Poisson-distributed, which is empty with a chance of exp(-n).
+        :return: A dictionary mapping "Sheep" and "Wolf" to a chance between 0 and 1.
+        """
+
+        return {"Sheep": float(np.exp(-self.min_sheep)), "Wolf": float(np.exp(-self.min_wolves))}
+
+    def get_sheep_count(self) -> float:
+        """
+        This method returns the expected population of sheep.
+        :return: A floating-point number representing the expected population of sheep.
+        """
+
+        return self.sheep.total()
+
+    def get_wolf_count(self) -> float:
+        """
+        This method returns the expected population of wolves.
+        :return: A floating-point number representing the expected population of wolves.
+        """
+
+        return self.wolves.total()
+
+    def get_grass_count(self) -> float:
+        """
+        This method returns the expected number of grass patches divided by 5 (to be closer to wolf/sheep populations).
+        :return: A floating-point number representing the expected number of grass patches divided by 5.
+        """
+
+        return self.grass / 5
+
+    def get_state(self) -> dict:
+        """
+        This method returns a summary of the current state of the model.
+        :return: A dictionary with the time step and the expected sheep, wolf, and grass counts.
+        """
+
+        return {"time": self.time, "sheep": self.get_sheep_count(), "wolves": self.get_wolf_count(),
+                "grass": float(self.grass)}
+
+
+def screen(sweep: dict, base_parameters: dict = None, max_steps: int = 500) -> pd.DataFrame:
+    """
+    This method runs the mean-field model for every combination of a sweep, to find the regions worth simulating.
+    :param sweep: Maps parameter names to the list of values to try, as for BatchRunner.
+    :param base_parameters: The values of the parameters which are not swept; defaults to DEFAULT_PARAMETERS.
+    :param max_steps: The number of steps after which a run is stopped.
+    :return: A table with one row per combination, holding its parameters, termination reason, number of steps,
+             final and smallest expected populations, and the extinction risk of each species.
+    """
+
+    rows = []
+    for parameters in parameter_grid(sweep, base_parameters):
+        model = MeanFieldWolfSheepGrass(**parameters)
+        termination, state = model.run(max_steps)
+        risk = model.extinction_risk()
+        rows.append(dict(parameters, termination=termination, steps=model.time, sheep=state["sheep"],
+                         wolves=state["wolves"], grass=state["grass"], min_sheep=model.min_sheep,
+                         min_wolves=model.min_wolves, sheep_extinction_risk=risk["Sheep"],
+                         wolf_extinction_risk=risk["Wolf"]))
+    return pd.DataFrame(rows)
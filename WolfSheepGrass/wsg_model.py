@@ -1,20 +1,108 @@
-from wsg_agent import *                         # Import the agents used in the model.
+import numpy as np                              # Import to seed the grass layout and find grass patches.
 from mesa import Model                          # Import the Model base class.
 from mesa.time import RandomActivation          # Import the scheduler for each agent.
 from mesa.space import MultiGrid                # Import the grid to position and move agents for the model.
-from mesa.datacollection import DataCollector   # Import the datacollector to track population count over each step.
+import random                                   # Import to give each model its own random number generator.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_agent import *                          # Import the agents used in the model.
+    from .wsg_grass import GrassField                 # Import the array-backed grass and dirt patches.
+    from .wsg_index import SpeciesIndex               # Import the per-cell index of each species.
+    from .wsg_output import Outputs                   # Import the output sinks of a run.
+    from .wsg_census import Census, census_reporters  # Import the running counts of births, deaths, and energy.
+    from .wsg_collector import *                      # Import the DataCollector whose memory is bounded for long runs.
+    from .wsg_random import *                         # Import the seeding and per-species random number streams.
+    from .wsg_profile import PhaseProfiler            # Import the optional timers and counters of the step.
+except ImportError:
+    from wsg_agent import *
+    from wsg_grass import GrassField
+    from wsg_index import SpeciesIndex
+    from wsg_output import Outputs
+    from wsg_census import Census, census_reporters
+    from wsg_collector import *
+    from wsg_random import *
+    from wsg_profile import PhaseProfiler
 
 # Define constants for patches of grass and dirt.
 GRASS_PATCH, DIRT_PATCH = True, False
 
+# Define the reasons a run ends with. A model which has not ended yet is still running.
+RUNNING, ANNIHILATED, SHEEP_INHERIT = "running", "annihilated", "sheep_inherit"
+MAX_STEPS, CONDITION_MET = "max_steps", "condition_met"
 
-class WolfSheepGrass(Model):
+
+class RunLoop:
+    """Run-loop methods shared by every engine of the Wolf-Sheep-Grass model."""
+
+    def run(self, max_steps: int) -> tuple:
+        """
+        This method steps the model until the run ends or the given number of steps has been taken.
+        :param max_steps: The maximum number of steps to take.
+        :return: The termination reason and the final state, as returned by run_until().
+        """
+
+        return self.run_until(lambda model: False, max_steps)
+
+    def run_until(self, condition, max_steps: int = None) -> tuple:
+        """
+        This method steps the model until the run ends, the condition holds, or the step budget is used up.
+        :param condition: A function which receives the model before each step and returns True to stop the run.
+        :param max_steps: The maximum number of steps to take; if None, there is no limit.
+        :return: The termination reason (ANNIHILATED, SHEEP_INHERIT, MAX_STEPS, or CONDITION_MET) and the final state.
+        """
+
+        steps = 0
+        while self.running:
+            # Stop when the condition holds or the step budget is used up.
+            if condition(self):
+                return CONDITION_MET, self.get_state()
+            if max_steps is not None and steps >= max_steps:
+                return MAX_STEPS, self.get_state()
+
+            self.step()
+            steps += 1
+
+        return self.termination, self.get_state()
+
+    def stop(self, reason: str):
+        """
+        This method ends the run, recording why, and flushes its output.
+        :param reason: The termination reason (ANNIHILATED or SHEEP_INHERIT).
+        :return:
+        """
+
+        self.termination, self.running = reason, False
+        if self.outputs is not None:
+            self.outputs.close()
+
+    def close(self):
+        """This method flushes the model's output and releases what the run holds on to. Closing twice has no effect."""
+
+        if self.outputs is not None:
+            self.outputs.close()
+        if isinstance(self.dc, BoundedDataCollector):
+            self.dc.close()
+
+    def get_state(self) -> dict:
+        """
+        This method returns a summary of the current state of the model.
+        :return: A dictionary with the time step and the sheep, wolf, and grass counts.
+        """
+
+        return {"time": self.time, "sheep": self.get_sheep_count(), "wolves": self.get_wolf_count(),
+                "grass": self.grass.get_grass_count()}
+
+
+class WolfSheepGrass(RunLoop, Model):
 
     def __init__(self, width: int, height: int,
                  grass_regrowth_rate: int, initial_wolves: int, initial_sheep: int,
                  wolf_food_gain: int, sheep_food_gain: int,
                  wolf_reproduction_rate: float, sheep_reproduction_rate: float,
-                 max_sheep: int) -> None:
+                 max_sheep: int, rng_mode: str = BULK_RNG, profile: bool = False,
+                 output_dir: str = "../Graphics", outputs: tuple = None, collector_window: int = None,
+                 seed: int = None) -> None:
         """
         Initializes the WolfSheepGrass model.
         :param width: Width of the grid-world (i.e. horizontal length).
@@ -27,120 +115,217 @@ class WolfSheepGrass(Model):
         :param wolf_reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
         :param sheep_reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
         :param max_sheep: The maximum number of sheep which can be alive at one time; if exceeded, the simulation stops.
+        :param rng_mode: Either "bulk" for animals to take their random numbers from pre-drawn blocks per species, or
+                         "stdlib" to draw every number from the model's random.Random, for validation.
+        :param profile: If True, every phase of the step is timed and births, deaths, kills, and cell lookups are
+                        counted, all reported through the DataCollector. If False, stepping pays nothing for it.
+        :param output_dir: The directory to write the outputs of the run to; if None, nothing is written.
+        :param outputs: The output sinks of the run, e.g. ("plot", {"sink": "density", "block": 10, "every": 5}), as
+                        accepted by wsg_output.make_sink(); if None, the trajectory and plot.csv are written every tick.
+        :param collector_window: If given, the DataCollector holds only this many recent ticks in memory and spills
+                                 older ones to output_dir/collector, for very long runs; if None, it holds every tick.
+        :param seed: The seed of the run, from which every random number stream is derived; if None, a fresh seed is
+                     drawn, which can be read back from model._seed to reproduce the run.
         """
 
         # Initialize the Model base class.
         super().__init__()
 
-        # Clear output files for new test run.
-        with open("../Graphics/wsg.csv", "w") as wsg_file:
-            wsg_file.writelines("Time,Agent,x,y,Energy\n")
-        with open("../Graphics/plot.csv", "w") as plot_file:
-            plot_file.writelines("Time,Sheep,Wolves,Grass,Dirt\n")
+        # The grid, grass, and output are allocated by reset(), and reused by later calls to it.
+        self.width = self.height = None
+        self.grid = self.occupancy = self.grass = self.outputs = self.profiler = None
 
-        # Keep track of the current time step.
-        self.time = 0
+        # Initialize the scheduler, which activates agents in a random order per step/tick.
+        self.sheep_schedule = RandomActivation(self)
+        self.wolf_schedule = RandomActivation(self)
 
-        # Width and height define the x- and y-dimensions of the world, respectively.
-        self.width, self.height = width, height
+        # The species classes of this model hold the constants shared by every animal of a species, set by reset().
+        self.species = {"Sheep": make_species(Sheep, 0, 0.0), "Wolf": make_species(Wolf, 0, 0.0)}
 
-        # Don't let the number of sheep grow too large.
-        self.max_sheep = max_sheep
+        # Dead animals are kept on a free list per species, and their objects reused for newborns.
+        self.free_animals = {"Sheep": [], "Wolf": []}
+        self.dead_animals = []
 
-        # Instantiate discrete, toroidal grid to contain all wolves, sheep, and grass.
-        self.grid = MultiGrid(width, height, True)
+        # Births, deaths, predation, and the energy of each species are counted as they happen.
+        self.census = Census()
 
-        # Initialize the scheduler, which activates agents in a random order per step/tick.
-        self.sheep_schedule = RandomActivation(self)
-        self.wolf_schedule = RandomActivation(self)
-        self.patch_schedule = RandomActivation(self)
+        # Set up the world for the first run.
+        self.parameters = {}
+        self.reset(dict(width=width, height=height, grass_regrowth_rate=grass_regrowth_rate,
+                        initial_wolves=initial_wolves, initial_sheep=initial_sheep,
+                        wolf_food_gain=wolf_food_gain, sheep_food_gain=sheep_food_gain,
+                        wolf_reproduction_rate=wolf_reproduction_rate, sheep_reproduction_rate=sheep_reproduction_rate,
+                        max_sheep=max_sheep, rng_mode=rng_mode, profile=profile, output_dir=output_dir,
+                        outputs=outputs, collector_window=collector_window), seed)
 
-        # Add initial sheep (they move first in the NetLogo simulation).
-        for _ in range(initial_sheep):
-            # On startup, position is a random floating-point coordinate between 0 and the max dimension of the world.
-            x_pos = self.random.uniform(0, width)
-            y_pos = self.random.uniform(0, height)
+    def reset(self, parameters: dict = None, seed: int = None):
+        """
+        This method sets the model up for a new run, reusing the grid, grass arrays, and animal objects of the last one.
+        :param parameters: Constructor parameters to change for the new run; parameters left out keep their values.
+        :param seed: The seed of the run, from which every random number stream is derived; if None, a fresh seed is
+                     drawn.
+        :return:
+        """
 
-            # Instantiate the new Sheep object with the given coordinates and parameters.
-            sheep = Sheep(self, x_pos, y_pos, sheep_food_gain, sheep_reproduction_rate)
+        # Merge the new parameters into those of the previous run.
+        self.parameters = dict(self.parameters, **(parameters or {}))
+        width, height = self.parameters["width"], self.parameters["height"]
 
-            # Add the new sheep to its respective scheduler.
-            self.sheep_schedule.add(sheep)
+        # Stop profiling the previous run, so that setting up the new one is not counted.
+        if self.profiler is not None:
+            self.profiler.detach()
+            self.profiler = None
 
-            # Place the sheep on the agent grid using integer coordinates.
-            self.grid.place_agent(sheep, self.integer_position(x_pos, y_pos))
+        # Seed the model's random number streams, remembering the seed so that the run can be reproduced.
+        self.reset_randomizer(new_seed() if seed is None else seed)
 
-        # Add initial wolves.
-        for _ in range(initial_wolves):
-            # On startup, position is a random floating-point coordinate between 0 and the max dimension of the world.
-            x_pos = self.random.uniform(0, width)
-            y_pos = self.random.uniform(0, height)
+        # Keep track of the current time step, and of why the run ended.
+        self.time, self.current_id = 0, 0
+        self.running, self.termination = True, RUNNING
 
-            # Instantiate the new Wolf object with the given coordinates and parameters.
-            wolf = Wolf(self, x_pos, y_pos, wolf_food_gain, wolf_reproduction_rate)
+        # Clear output files for new test run, opening the output sinks of the new run.
+        if self.outputs is not None:
+            self.outputs.close()
+        self.output_dir = self.parameters["output_dir"]
+        self.outputs = Outputs(self, self.output_dir, self.parameters["outputs"])
 
-            # Add the new wolf to its respective scheduler.
-            self.wolf_schedule.add(wolf)
+        # Don't let the number of sheep grow too large.
+        self.max_sheep = self.parameters["max_sheep"]
 
-            # Place the wolf on the agent grid using integer coordinates.
-            self.grid.place_agent(wolf, self.integer_position(x_pos, y_pos))
+        # Take the animals of the previous run out of the world, so that their objects can be reused below.
+        for animal in self.sheep_schedule.agents + self.wolf_schedule.agents:
+            self.remove(animal)
+        self.recycle()
+        self.census.reset()
 
-        # Initialize environment by filling terrain with grass and dirt patches.
-        for x in range(width):
-            for y in range(height):
-                # Instantiate the new Patch object with the given grass regrowth rate.
-                patch = Patch(self, grass_regrowth_rate, (x, y))
+        # Width and height define the x- and y-dimensions of the world, respectively.
+        if (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+
+            # Instantiate discrete, toroidal grid to contain all wolves and sheep.
+            self.grid = MultiGrid(width, height, True)
+
+            # Index every animal by species and cell, so that finding prey in a cell does not scan the grid.
+            self.occupancy = {"Sheep": SpeciesIndex(width, height), "Wolf": SpeciesIndex(width, height)}
+
+        # Every animal of a species gains the same energy from eating, and has the same chance of reproduction.
+        settings = self.parameters
+        self.species["Sheep"].food_gain = settings["sheep_food_gain"]
+        self.species["Sheep"].reproduction_rate = settings["sheep_reproduction_rate"]
+        self.species["Wolf"].food_gain = settings["wolf_food_gain"]
+        self.species["Wolf"].reproduction_rate = settings["wolf_reproduction_rate"]
+
+        # Add initial sheep (they move first in the NetLogo simulation), then the initial wolves.
+        for label, schedule, count in (("Sheep", self.sheep_schedule, settings["initial_sheep"]),
+                                       ("Wolf", self.wolf_schedule, settings["initial_wolves"])):
+            stream = self.streams[label]
+            for _ in range(count):
+                # On startup, position is a random floating-point coordinate between 0 and the max dimension.
+                x_pos = stream.uniform(0, width)
+                y_pos = stream.uniform(0, height)
+
+                # Reuse an animal object of the previous run if there is one; otherwise, instantiate a new one.
+                animal = self.new_animal(label, x_pos, y_pos)
+
+                # Add the new animal to its respective scheduler.
+                schedule.add(animal)
+
+                # Place the animal on the agent grid and in the species index using integer coordinates.
+                self.occupancy[animal.label].add(animal, self.integer_position(x_pos, y_pos))
+                self.grid.place_agent(animal, self.integer_position(x_pos, y_pos))
+                self.census.add(label, animal.energy)
+
+        # Initialize environment by filling terrain with grass and dirt patches, laid out from the grass substream.
+        grass_rng = np.random.default_rng(substream(self._seed, GRASS_STREAM))
+        if self.grass is not None and self.grass.patch_color.shape == (width, height):
+            self.grass.reset(self.parameters["grass_regrowth_rate"], grass_rng)
+        else:
+            self.grass = GrassField(width, height, self.parameters["grass_regrowth_rate"], grass_rng)
+
+        # Define DataCollector instance, which tracks the population of wolves and sheep as well as the number of grass,
+        # and the running counts and energy of the census.
+        model_reporters = {"Sheep Count": self.get_sheep_count,
+                           "Wolf Count": self.get_wolf_count,
+                           "Grass / 5 Count": self.get_grass_count,
+                           **census_reporters()}
+
+        # If profiling, instrument the step and report the timings and counts of every step as well.
+        if self.parameters["profile"]:
+            self.profiler = PhaseProfiler(self)
+            model_reporters.update(self.profiler.reporters())
+        self.dc = make_collector(model_reporters, self.parameters.get("collector_window"), self.output_dir)
+
+    def reset_randomizer(self, seed: int = None):
+        """
+        This method reseeds every random number stream of the model from one seed, leaving the rest of its state.
+        :param seed: The seed of the run; if None, the current seed is used again.
+        :return:
+        """
 
-                # Add the new patch of grass or dirt to its respective scheduler.
-                self.patch_schedule.add(patch)
+        if seed is not None:
+            self._seed = seed
 
-                # Place the patch of grass or dirt at the given coordinate.
-                self.grid.place_agent(patch, (x, y))
+        # Give the model its own random number generator (Mesa stores it on the class, shared by every instance).
+        self.random = random.Random(derive_seed(self._seed, MODEL_STREAM))
 
-        # Define DataCollector instance, which tracks the population of wolves and sheep as well as the number of grass.
-        self.dc = DataCollector(model_reporters={"Sheep Count": self.get_sheep_count,
-                                                 "Wolf Count": self.get_wolf_count,
-                                                 "Grass / 5 Count": self.get_grass_count},
-                                agent_reporters={})
+        # Animals draw their random numbers from one stream per species, and hold on to their species' stream.
+        self.streams = make_streams(self.parameters["rng_mode"], self.random, self._seed, ("Sheep", "Wolf"))
+        for animal in self.sheep_schedule.agents + self.wolf_schedule.agents:
+            animal.stream = self.streams[animal.label]
 
     def step(self):
         """This method provides the logic loop for each step of the model."""
 
         # Collect sheep, wolf, and grass populations.
-        self.dc.collect(self)
+        self.collect_data()
 
-        # Output sheep, wolf, and grass locations and energy to .csv file.
-        output_string = "{},{},{},{},{}\n"
-        with open("../Graphics/wsg.csv", "a") as wsg_file:
-            # Output grass locations
-            for grass in [agent for agent in self.patch_schedule.agents if agent.patch_color is GRASS_PATCH]:
-                wsg_file.writelines(output_string.format(self.time, "grass", grass.x, grass.y, ""))
-            # Output wolf locations and energy.
-            for wolf in self.wolf_schedule.agents:
-                x, y = wolf.x_pos % self.width, wolf.y_pos % self.height
-                wsg_file.writelines(output_string.format(self.time, "wolf", x, y, wolf.energy))
-            # Output sheep locations and energy.
-            for sheep in self.sheep_schedule.agents:
-                x, y = sheep.x_pos % self.width, sheep.y_pos % self.height
-                wsg_file.writelines(output_string.format(self.time, "sheep", x, y, sheep.energy))
-
-        # Output sheep, wolf, grass, and dirt populations to .csv file.
-        with open("../Graphics/plot.csv", "a") as plot_file:
-            wolf_count, sheep_count, grass_count = self.get_wolf_count(), self.get_sheep_count(), self.get_grass_count()
-            dirt_count = self.width * self.height - grass_count * 5
-            plot_file.writelines(output_string.format(self.time, sheep_count, wolf_count, grass_count * 5, dirt_count))
+        # Output sheep, wolf, and grass locations, energy, and populations.
+        self.write_output()
 
         # Increment the time step.
         self.time += 1
 
         # First, move the sheep.
-        self.sheep_schedule.step()
+        self.step_sheep()
 
         # Finally, move the wolves.
-        self.wolf_schedule.step()
+        self.step_wolves()
 
         # Finally, grow the grass. (Note: sheep have a chance to be standing on grass)
-        self.patch_schedule.step()
+        self.grow_grass()
+
+        # Stop the run if the animals are annihilated or the sheep rule the world.
+        self.check_termination()
+
+    def collect_data(self):
+        """This phase of the step collects the sheep, wolf, and grass populations."""
+
+        self.dc.collect(self)
+
+    def write_output(self):
+        """This phase of the step writes the current tick to every output sink due on it."""
+
+        self.outputs.write(self)
+
+    def step_sheep(self):
+        """This phase of the step moves every sheep, in random order."""
+
+        self.sheep_schedule.step()
+        self.recycle()
+
+    def step_wolves(self):
+        """This phase of the step moves every wolf, in random order."""
+
+        self.wolf_schedule.step()
+        self.recycle()
+
+    def grow_grass(self):
+        """This phase of the step grows the grass."""
+
+        self.grass.grow()
+
+    def check_termination(self):
+        """This phase of the step stops the run if the animals are annihilated or the sheep rule the world."""
 
         # Get wolf and sheep counts.
         wolf_count, sheep_count = self.get_wolf_count(), self.get_sheep_count()
@@ -152,10 +337,9 @@ class WolfSheepGrass(Model):
         sheep_inherit = wolf_count <= 0 and sheep_count > self.max_sheep
 
         if are_annihilated:
-            exit(1)
+            self.stop(ANNIHILATED)
         elif sheep_inherit:
-            print("The sheep have inherited the world.")
-            exit(2)
+            self.stop(SHEEP_INHERIT)
 
     def remove(self, agent):
         """
@@ -166,17 +350,48 @@ class WolfSheepGrass(Model):
 
         # Is the agent a wolf?
         if agent.label == "Wolf":
-            # Remove the wolf from the scheduler and from the agent grid.
+            # Remove the wolf from the scheduler, the species index, and the agent grid.
+            self.occupancy["Wolf"].remove(agent, agent.pos)
             self.grid.remove_agent(agent)
             self.wolf_schedule.remove(agent)
-            del agent
 
         # Is the agent a sheep?
         elif agent.label == "Sheep":
-            # Remove the sheep from the scheduler and from the agent grid.
+            # Remove the sheep from the scheduler, the species index, and the agent grid.
+            self.occupancy["Sheep"].remove(agent, agent.pos)
             self.grid.remove_agent(agent)
             self.sheep_schedule.remove(agent)
-            del agent
+
+        # Stop counting the animal, and keep its object, to reuse it once the current phase is over.
+        self.census.remove(agent.label, agent.energy)
+        self.dead_animals.append(agent)
+
+    def new_animal(self, label: str, x_pos: float, y_pos: float):
+        """
+        This method makes a new animal, reusing the object of a dead one of the same species if there is one.
+        :param label: The species of the animal, either "Sheep" or "Wolf".
+        :param x_pos: A floating-point coordinate between 0 and the width of the world.
+        :param y_pos: A floating-point coordinate between 0 and the length of the world.
+        :return: The new animal, which is not yet scheduled or placed on the grid.
+        """
+
+        free_animals = self.free_animals[label]
+        if free_animals:
+            animal = free_animals.pop()
+            animal.spawn(x_pos, y_pos)
+            return animal
+        return self.species[label](self, x_pos, y_pos)
+
+    def recycle(self):
+        """
+        This method moves the animals which died during the last phase onto the free lists. Dead animals are only
+        reused after their phase, since an animal which starves still reproduces within its own step.
+        :return:
+        """
+
+        for animal in self.dead_animals:
+            self.free_animals[animal.label].append(animal)
+        self.dead_animals.clear()
 
     def integer_position(self, x_pos: float, y_pos: float) -> tuple:
         """
@@ -188,6 +403,29 @@ class WolfSheepGrass(Model):
 
         return int(x_pos) % self.width, int(y_pos) % self.height
 
+    def get_world(self) -> tuple:
+        """
+        This method gathers what the output sinks write about the world.
+        :return: The grass array, and the positions and energy of the wolves and of the sheep, as returned by
+                 get_positions_and_energy().
+        """
+
+        return (self.grass.patch_color, self.get_positions_and_energy(self.wolf_schedule),
+                self.get_positions_and_energy(self.sheep_schedule))
+
+    def get_positions_and_energy(self, schedule: RandomActivation) -> tuple:
+        """
+        This method gathers the positions and energy of every animal in a scheduler into arrays.
+        :param schedule: The scheduler of the species (either the sheep or the wolf scheduler).
+        :return: The x-coordinates, y-coordinates, and energy of the animals, as arrays.
+        """
+
+        animals = schedule.agents
+        x = np.fromiter((animal.x_pos for animal in animals), float, len(animals)) % self.width
+        y = np.fromiter((animal.y_pos for animal in animals), float, len(animals)) % self.height
+        energy = np.fromiter((animal.energy for animal in animals), float, len(animals))
+        return x, y, energy
+
     def get_sheep_count(self) -> int:
         """
         This method returns the current population of sheep in the simulation.
@@ -209,4 +447,4 @@ class WolfSheepGrass(Model):
         :return: A floating-point number representing the approximate number of grass patches divided by 5.
         """
 
-        return len([patch for patch in self.patch_schedule.agents if patch.patch_color is GRASS_PATCH]) / 5
+        return self.grass.get_grass_count() / 5
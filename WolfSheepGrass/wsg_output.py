@@ -0,0 +1,302 @@
+import json                                     # Import to describe the binary density layout next to it.
+import os                                       # Import to create the output directory and build the file paths.
+import numpy as np                              # Import to bin the animals and grass in-process.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_trajectory import TrajectoryWriter    # Import the binary trajectory output.
+except ImportError:
+    from wsg_trajectory import TrajectoryWriter
+
+# Outputs written when a run does not say which: every animal and patch, and the populations, on every tick.
+DEFAULT_OUTPUTS = ("trajectory", "plot")
+
+# Layers of every frame of a density heatmap, in the order they are stored.
+DENSITY_LAYERS = ("sheep", "wolves", "grass")
+
+
+class OutputSink:
+    """
+    Base class of the outputs of a run. A sink writes on every tick which is a multiple of its interval, and only what
+    it needs; sinks which need the positions of the animals ask for the world, which is gathered once per tick.
+    """
+
+    # The name of the sink in output specifications, and the file or directory it writes to by default.
+    name, default_path = "", ""
+
+    # Whether the sink needs the positions and energy of the animals, rather than only the populations.
+    needs_world = False
+
+    def __init__(self, every: int = 1, path: str = None):
+        """
+        Initializes the OutputSink class.
+        :param every: The sink writes on every tick which is a multiple of this interval.
+        :param path: The file or directory to write to, relative to the output directory of the run.
+        """
+
+        self.every = every
+        self.path = self.default_path if path is None else path
+
+    def open(self, model, output_dir: str):
+        """
+        This method starts the output of a new run, truncating any output of a previous one.
+        :param model: The model being run.
+        :param output_dir: The output directory of the run.
+        :return:
+        """
+
+        self.path = os.path.join(output_dir, self.path)
+
+    def write(self, model, world: tuple):
+        """
+        This method writes the output of one tick.
+        :param model: The model being run.
+        :param world: The grass array and the positions and energy of the wolves and sheep, as returned by
+                      model.get_world(), or None if no sink due on this tick needs it.
+        :return:
+        """
+
+    def close(self):
+        """This method flushes the output. Closing twice has no effect."""
+
+
+class TrajectorySink(OutputSink):
+    """Writes every grass patch and animal to a binary columnar trajectory."""
+
+    name, default_path = "trajectory", "wsg_trajectory"
+    needs_world = True
+
+    def open(self, model, output_dir: str):
+        """This method truncates the trajectory and writes its format description."""
+
+        super().open(model, output_dir)
+        self.trajectory = TrajectoryWriter(self.path, model.parameters["width"], model.parameters["height"])
+
+    def write(self, model, world: tuple):
+        """This method appends every grass patch and animal of the tick to the trajectory."""
+
+        self.trajectory.append_world(model.time, *world)
+
+    def close(self):
+        """This method flushes the buffered rows of the trajectory."""
+
+        self.trajectory.close()
+
+
+class PlotSink(OutputSink):
+    """Writes the sheep, wolf, grass, and dirt populations to a CSV file, one row per tick."""
+
+    name, default_path = "plot", "plot.csv"
+
+    def open(self, model, output_dir: str):
+        """This method truncates the CSV file, writes its header, and keeps the file open for the rows of the run."""
+
+        super().open(model, output_dir)
+        self.plot_file = open(self.path, "w")
+        self.plot_file.write("Time,Sheep,Wolves,Grass,Dirt\n")
+
+    def write(self, model, world: tuple):
+        """This method appends the populations of the tick to the CSV file, through its buffer."""
+
+        wolf_count, sheep_count = model.get_wolf_count(), model.get_sheep_count()
+        grass_count = model.get_grass_count()
+        dirt_count = model.width * model.height - grass_count * 5
+        self.plot_file.write(f"{model.time},{sheep_count},{wolf_count},{grass_count * 5},{dirt_count}\n")
+
+    def close(self):
+        """This method flushes the buffered rows and closes the CSV file."""
+
+        self.plot_file.close()
+
+
+class DensitySink(OutputSink):
+    """
+    Writes coarse heatmaps of the sheep, wolves, and grass, counted in blocks of block x block patches. Frames are
+    appended to a binary file described by meta.json, and can be read back with read_density().
+    """
+
+    name, default_path = "density", "density"
+    needs_world = True
+
+    def __init__(self, every: int = 1, path: str = None, block: int = 10):
+        """
+        Initializes the DensitySink class.
+        :param every: The sink writes on every tick which is a multiple of this interval.
+        :param path: The directory to write to, relative to the output directory of the run.
+        :param block: The width and height of the blocks, in patches. Blocks at the far edges may be smaller.
+        """
+
+        super().__init__(every, path)
+        self.block = block
+
+    def open(self, model, output_dir: str):
+        """This method lays out the blocks, and truncates the frames and writes their format description."""
+
+        super().open(model, output_dir)
+        width, height = model.parameters["width"], model.parameters["height"]
+
+        # The first patch of every block along x and along y.
+        self.x_starts, self.y_starts = np.arange(0, width, self.block), np.arange(0, height, self.block)
+        self.shape = (len(DENSITY_LAYERS), len(self.x_starts), len(self.y_starts))
+
+        # Describe the format so that readers do not have to guess the layout.
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "meta.json"), "w") as meta_file:
+            json.dump({"version": 1, "width": width, "height": height, "block": self.block,
+                       "layers": DENSITY_LAYERS, "shape": self.shape, "dtype": "<u4"}, meta_file)
+        self.times_file = open(os.path.join(self.path, "times.bin"), "wb")
+        self.counts_file = open(os.path.join(self.path, "counts.bin"), "wb")
+
+    def write(self, model, world: tuple):
+        """This method counts the animals and grass of the tick in every block and appends the frame."""
+
+        patch_color, wolves, sheep = world
+        counts = np.empty(self.shape, np.dtype("<u4"))
+
+        # Count the animals of each species in every block.
+        n_x, n_y = self.shape[1:]
+        for layer, (x, y, _) in ((counts[0], sheep), (counts[1], wolves)):
+            block_x = np.minimum((np.asarray(x) // self.block).astype(np.int64), n_x - 1)
+            block_y = np.minimum((np.asarray(y) // self.block).astype(np.int64), n_y - 1)
+            layer[...] = np.bincount(block_x * n_y + block_y, minlength=n_x * n_y).reshape(n_x, n_y)
+
+        # Count the grass patches in every block.
+        counts[2] = np.add.reduceat(np.add.reduceat(patch_color, self.x_starts, axis=0, dtype=np.int64),
+                                    self.y_starts, axis=1)
+
+        self.times_file.write(np.array([model.time], np.dtype("<i4")).tobytes())
+        self.counts_file.write(counts.tobytes())
+
+    def close(self):
+        """This method closes the frame files."""
+
+        self.times_file.close()
+        self.counts_file.close()
+
+
+class EnergySink(OutputSink):
+    """Writes a histogram of the energy of each species to a CSV file, one row per species and tick."""
+
+    name, default_path = "energy", "energy.csv"
+    needs_world = True
+
+    def __init__(self, every: int = 1, path: str = None, bin_width: float = 5, bins: int = 20):
+        """
+        Initializes the EnergySink class.
+        :param every: The sink writes on every tick which is a multiple of this interval.
+        :param path: The file to write to, relative to the output directory of the run.
+        :param bin_width: The width of every bin, in units of energy. The first bin starts at 0.
+        :param bins: The number of bins; the last one also counts every animal with more energy.
+        """
+
+        super().__init__(every, path)
+        self.bin_width, self.bins = bin_width, bins
+
+    def open(self, model, output_dir: str):
+        """This method truncates the CSV file and writes a header with the lower edge of every bin."""
+
+        super().open(model, output_dir)
+        edges = [f"{index * self.bin_width:g}" for index in range(self.bins)]
+        self.energy_file = open(self.path, "w")
+        self.energy_file.write(",".join(["Time", "Species"] + edges) + "\n")
+
+    def write(self, model, world: tuple):
+        """This method appends the energy histogram of each species on the tick to the CSV file, through its buffer."""
+
+        _, wolves, sheep = world
+        for label, (_, _, energy) in (("Sheep", sheep), ("Wolf", wolves)):
+            bins = np.clip(np.asarray(energy) // self.bin_width, 0, self.bins - 1).astype(np.int64)
+            histogram = np.bincount(bins, minlength=self.bins)
+            self.energy_file.write(",".join([str(model.time), label] + [str(count) for count in histogram]) + "\n")
+
+    def close(self):
+        """This method flushes the buffered rows and closes the CSV file."""
+
+        self.energy_file.close()
+
+
+# Every kind of sink, by the name used in output specifications.
+SINKS = {sink.name: sink for sink in (TrajectorySink, PlotSink, DensitySink, EnergySink)}
+
+
+def make_sink(spec) -> OutputSink:
+    """
+    This method builds a sink from its specification.
+    :param spec: Either the name of a sink, e.g. "plot", or a dictionary with the name under "sink" and the arguments
+                 of the sink, e.g. {"sink": "density", "block": 10, "every": 5}.
+    :return: The sink.
+    """
+
+    if isinstance(spec, str):
+        spec = {"sink": spec}
+    arguments = dict(spec)
+    name = arguments.pop("sink")
+    if name not in SINKS:
+        raise ValueError(f"Unknown output sink: {name}")
+    return SINKS[name](**arguments)
+
+
+def world_sinks(specs) -> list:
+    """
+    This method finds the sinks of a specification which need the positions and energy of the animals, e.g. to refuse
+    them for a model which has none.
+    :param specs: The specifications of the sinks, as accepted by make_sink(); if None, DEFAULT_OUTPUTS.
+    :return: The names of the sinks which need the world.
+    """
+
+    names = [spec if isinstance(spec, str) else spec["sink"] for spec in (DEFAULT_OUTPUTS if specs is None else specs)]
+    return [name for name in names if name in SINKS and SINKS[name].needs_world]
+
+
+class Outputs:
+    """The output sinks of one run."""
+
+    def __init__(self, model, output_dir: str, specs):
+        """
+        Initializes the Outputs class and opens every sink.
+        :param model: The model being run.
+        :param output_dir: The directory to write to; if None, nothing is written.
+        :param specs: The specifications of the sinks, as accepted by make_sink(); if None, DEFAULT_OUTPUTS.
+        """
+
+        self.sinks = []
+        if output_dir is None:
+            return
+        os.makedirs(output_dir, exist_ok=True)
+        self.sinks = [make_sink(spec) for spec in (DEFAULT_OUTPUTS if specs is None else specs)]
+        for sink in self.sinks:
+            sink.open(model, output_dir)
+
+    def write(self, model):
+        """
+        This method writes the current tick to every sink due on it, gathering the world at most once.
+        :param model: The model being run.
+        :return:
+        """
+
+        due = [sink for sink in self.sinks if model.time % sink.every == 0]
+        world = model.get_world() if any(sink.needs_world for sink in due) else None
+        for sink in due:
+            sink.write(model, world)
+
+    def close(self):
+        """This method flushes every sink. Closing twice has no effect."""
+
+        for sink in self.sinks:
+            sink.close()
+
+
+def read_density(path: str) -> tuple:
+    """
+    This method reads the heatmaps written by a DensitySink.
+    :param path: The directory written by the sink.
+    :return: The time step of every frame, and the counts as an array indexed as [frame, layer, block x, block y],
+             with the layers in the order of DENSITY_LAYERS.
+    """
+
+    with open(os.path.join(path, "meta.json")) as meta_file:
+        meta = json.load(meta_file)
+    times = np.fromfile(os.path.join(path, "times.bin"), np.dtype("<i4"))
+    counts = np.fromfile(os.path.join(path, "counts.bin"), np.dtype(meta["dtype"]))
+    frames = len(counts) // int(np.prod(meta["shape"]))
+    return times[:frames], counts[:frames * int(np.prod(meta["shape"]))].reshape(frames, *meta["shape"])
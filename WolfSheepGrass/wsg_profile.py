@@ -0,0 +1,150 @@
+import time  # Import to time every phase of the step.
+
+# Phases of WolfSheepGrass.step, in the order they run.
+PHASES = ("collect_data", "write_output", "step_sheep", "step_wolves", "grow_grass", "check_termination")
+
+# Events counted while stepping.
+COUNTERS = ("Sheep Births", "Wolf Births", "Sheep Starved", "Wolves Starved", "Sheep Eaten", "Cell Lookups")
+
+# Counters read from the census of the model, as the name of the count and the species it is kept for, if any.
+CENSUS_COUNTERS = {"Sheep Births": ("births", "Sheep"), "Wolf Births": ("births", "Wolf"),
+                   "Sheep Starved": ("starved", "Sheep"), "Wolves Starved": ("starved", "Wolf"),
+                   "Sheep Eaten": ("eaten", None)}
+
+
+class PhaseProfiler:
+    """
+    Times every phase of the step of a WolfSheepGrass model and reports the births, deaths, and kills of every step,
+    read from the census of the model, and the cell lookups. The profiler works by shadowing the model's methods with
+    timed ones on the instance, so a model which is not being profiled runs its plain methods and pays nothing.
+    """
+
+    def __init__(self, model):
+        """
+        Initializes the PhaseProfiler class and instruments the model.
+        :param model: The WolfSheepGrass model to profile.
+        """
+
+        self.model = model
+
+        # Timings and counts of the step in progress, and of the last completed step, which the reporters read.
+        self.current = dict.fromkeys(self.reporter_names(), 0)
+        self.last = dict(self.current)
+
+        # The running counts of the census when the step in progress started.
+        self.start = self.census_totals()
+
+        # The objects and attribute names shadowed on them, so that detach() can restore them.
+        self.shadowed = []
+
+        # Time every phase of the step.
+        for phase in PHASES:
+            self.shadow(model, phase, self.timed(phase, getattr(model, phase)))
+
+        # Count the lookups of prey in the species index.
+        for index in model.occupancy.values():
+            self.shadow(index, "get_cell", self.counted_lookup(index.get_cell))
+
+    @staticmethod
+    def reporter_names() -> list:
+        """
+        This method returns the names of the DataCollector reporters added by the profiler.
+        :return: One name per phase (in milliseconds) and one per counter.
+        """
+
+        return [f"{phase} ms" for phase in PHASES] + list(COUNTERS)
+
+    def reporters(self) -> dict:
+        """
+        This method returns the DataCollector model reporters of the profiler, reporting the last completed step.
+        :return: A dictionary mapping each reporter name to a function of the model.
+        """
+
+        return {name: (lambda model, name=name: self.last[name]) for name in self.reporter_names()}
+
+    def census_totals(self) -> dict:
+        """
+        This method reads the running counts of the census which the profiler reports per step.
+        :return: A dictionary mapping each census counter to its count since the start of the run.
+        """
+
+        census = self.model.census
+        return {key: census.eaten if label is None else getattr(census, count)[label]
+                for key, (count, label) in CENSUS_COUNTERS.items()}
+
+    def get_counters(self) -> dict:
+        """
+        This method returns the timings and counts of the profiler as plain data, e.g. to store them in a checkpoint.
+        :return: A JSON-serializable dictionary.
+        """
+
+        return {"current": dict(self.current), "last": dict(self.last), "start": dict(self.start)}
+
+    def set_counters(self, counters: dict = None):
+        """
+        This method restores the timings and counts of the profiler, after the census of the model has been restored.
+        :param counters: The dictionary returned by get_counters(); if None, e.g. for a checkpoint taken without
+                         profiling, the counts restart from the census as it is.
+        :return:
+        """
+
+        if counters is None:
+            self.start = self.census_totals()
+        else:
+            self.current, self.last, self.start = (dict(counters[part]) for part in ("current", "last", "start"))
+
+    def shadow(self, owner, name: str, replacement):
+        """
+        This method shadows a method of an object with an instrumented one, on the instance only.
+        :param owner: The object whose method is shadowed.
+        :param name: The name of the method.
+        :param replacement: The instrumented method.
+        :return:
+        """
+
+        setattr(owner, name, replacement)
+        self.shadowed.append((owner, name))
+
+    def detach(self):
+        """This method removes the instrumentation, so that the model runs its plain methods again."""
+
+        for owner, name in self.shadowed:
+            delattr(owner, name)
+        self.shadowed = []
+
+    def timed(self, phase: str, method):
+        """
+        This method wraps one phase of the step with a timer.
+        :param phase: The name of the phase.
+        :param method: The bound method of the phase.
+        :return: The timed method.
+        """
+
+        key = f"{phase} ms"
+        first = phase == PHASES[0]
+
+        def timed_phase():
+            # The first phase starts a new step, so the step just completed becomes the one reported, with the events
+            # the census counted during it.
+            if first:
+                totals = self.census_totals()
+                self.current.update({name: totals[name] - self.start[name] for name in totals})
+                self.last, self.current, self.start = self.current, dict.fromkeys(self.current, 0), totals
+            start = time.perf_counter()
+            method()
+            self.current[key] += (time.perf_counter() - start) * 1000
+
+        return timed_phase
+
+    def counted_lookup(self, method):
+        """
+        This method wraps the get_cell method of a species index with a lookup counter.
+        :param method: The bound get_cell method.
+        :return: The counting method.
+        """
+
+        def counted(pos):
+            self.current["Cell Lookups"] += 1
+            return method(pos)
+
+        return counted
@@ -0,0 +1,268 @@
+import itertools    # Import to chain the pre-drawn blocks into one stream.
+import operator     # Import to find how much of a block is left.
+import numpy as np  # Import to draw random numbers in vectorized blocks.
+
+# Random number modes of the agent model: one call per draw on the model's RNG, or pre-drawn blocks per species.
+STDLIB_RNG, BULK_RNG = "stdlib", "bulk"
+
+# Animals turn left and right by up to 50 degrees (or 5pi/18 radians) every step.
+MAX_TURN = 5 * np.pi / 18
+
+# Spawn keys of the substreams derived from the seed of a run: the model's random.Random (which also shuffles the
+# schedulers), the grass layout, and one stream per species.
+MODEL_STREAM, GRASS_STREAM = 0, 1
+SPECIES_STREAMS = {"Sheep": 2, "Wolf": 3}
+
+
+def new_seed() -> int:
+    """
+    This method draws a fresh seed from the operating system, for runs which were not given one.
+    :return: A 128-bit integer seed.
+    """
+
+    return np.random.SeedSequence().entropy
+
+
+def substream(seed: int, *keys: int) -> np.random.SeedSequence:
+    """
+    This method derives an independent substream of a seed. Different keys give non-overlapping streams.
+    :param seed: The root seed, e.g. the seed of a run or of a whole sweep.
+    :param keys: The path of the substream below the root, e.g. (SPECIES_STREAMS["Sheep"],) or (run_id,).
+    :return: The SeedSequence of the substream, which can seed a numpy.random.Generator.
+    """
+
+    return np.random.SeedSequence(seed, spawn_key=keys)
+
+
+def derive_seed(seed: int, *keys: int) -> int:
+    """
+    This method derives the integer seed of a substream, e.g. for a random.Random or for run k of a sweep.
+    :param seed: The root seed.
+    :param keys: The path of the substream below the root.
+    :return: A 128-bit integer seed.
+    """
+
+    low, high = substream(seed, *keys).generate_state(2, np.uint64).tolist()
+    return low | high << 64
+
+
+class StdlibStream:
+    """Random number stream which draws every number from a standard library random.Random, one call at a time."""
+
+    def __init__(self, rng):
+        """
+        Initializes the StdlibStream class.
+        :param rng: The random.Random instance to draw from, usually the model's own.
+        """
+
+        self.rng = rng
+
+    def random(self) -> float:
+        """
+        This method draws a floating-point number between 0 and 1.
+        :return: The random number.
+        """
+
+        return self.rng.random()
+
+    def uniform(self, a: float, b: float) -> float:
+        """
+        This method draws a floating-point number between a and b.
+        :param a: The lower end of the range.
+        :param b: The upper end of the range.
+        :return: The random number.
+        """
+
+        return self.rng.uniform(a, b)
+
+    def randrange(self, start: int, stop: int) -> int:
+        """
+        This method draws an integer from start up to, but not including, stop.
+        :param start: The smallest integer which can be drawn.
+        :param stop: One more than the largest integer which can be drawn.
+        :return: The random integer.
+        """
+
+        return self.rng.randrange(start, stop)
+
+    def choice(self, seq):
+        """
+        This method picks one element of a non-empty sequence.
+        :param seq: The sequence to pick from.
+        :return: The picked element.
+        """
+
+        return self.rng.choice(seq)
+
+    def turn(self) -> float:
+        """
+        This method draws the change of direction of one step: a left turn minus a right turn, each up to MAX_TURN.
+        :return: The change of direction in radians.
+        """
+
+        return self.rng.uniform(0, MAX_TURN) - self.rng.uniform(0, MAX_TURN)
+
+    def getstate(self):
+        """
+        This method returns the state of the stream. The state lives in the wrapped random.Random, so there is none.
+        :return: None.
+        """
+
+        return None
+
+    def setstate(self, state):
+        """
+        This method restores the state of the stream, which lives in the wrapped random.Random.
+        :param state: The state returned by getstate().
+        :return:
+        """
+
+
+class BulkStream:
+    """Random number stream which pre-draws its numbers with NumPy in blocks and hands them out one at a time."""
+
+    def __init__(self, seed, block_size: int = 4096):
+        """
+        Initializes the BulkStream class.
+        :param seed: The seed of the stream, either an integer or a numpy.random.SeedSequence.
+        :param block_size: The number of values drawn at once whenever a block runs out.
+        """
+
+        # Unit draws and turns are kept in separate blocks, each with its own generator, so that a block can be
+        # redrawn from the generator state it was drawn from when restoring a checkpoint.
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        unit_seed, turn_seed = seed_sequence.spawn(2)
+        self.unit_rng, self.turn_rng = np.random.default_rng(unit_seed), np.random.default_rng(turn_seed)
+        self.block_size = block_size
+
+        # The generator state each current block was drawn from, and an iterator over what is left of the block.
+        self.blocks = {"units": [None, iter(())], "turns": [None, iter(())]}
+
+        # Set up random() and turn(), which hand out the values.
+        self.restart()
+
+    def restart(self):
+        """
+        This method chains what is left of the current blocks and every block after them into one endless iterator per
+        kind of value, so that a draw is a single call into C code rather than a Python method.
+        :return:
+        """
+
+        units = itertools.chain([self.blocks["units"][1]], self.draw_blocks("units", self.draw_units))
+        turns = itertools.chain([self.blocks["turns"][1]], self.draw_blocks("turns", self.draw_turns))
+        self.random = itertools.chain.from_iterable(units).__next__
+        self.turn = itertools.chain.from_iterable(turns).__next__
+
+    def draw_units(self) -> list:
+        """
+        This method draws a new block of floating-point numbers between 0 and 1.
+        :return: The block, as a list.
+        """
+
+        return self.unit_rng.random(self.block_size).tolist()
+
+    def draw_turns(self) -> list:
+        """
+        This method draws a new block of turns, subtracting a block of right turns from a block of left turns.
+        :return: The block, as a list.
+        """
+
+        left, right = self.turn_rng.uniform(0, MAX_TURN, (2, self.block_size))
+        return (left - right).tolist()
+
+    def draw_blocks(self, name: str, draw):
+        """
+        This method yields one new block after another, remembering the generator state each one was drawn from.
+        :param name: Either "units" or "turns".
+        :param draw: The method which draws one block.
+        :return: An endless iterator over iterators of the blocks.
+        """
+
+        rng = self.unit_rng if name == "units" else self.turn_rng
+        while True:
+            block = self.blocks[name]
+            block[0] = rng.bit_generator.state
+            block[1] = iter(draw())
+            yield block[1]
+
+    def uniform(self, a: float, b: float) -> float:
+        """
+        This method hands out a floating-point number between a and b.
+        :param a: The lower end of the range.
+        :param b: The upper end of the range.
+        :return: The random number.
+        """
+
+        return a + (b - a) * self.random()
+
+    def randrange(self, start: int, stop: int) -> int:
+        """
+        This method hands out an integer from start up to, but not including, stop.
+        :param start: The smallest integer which can be drawn.
+        :param stop: One more than the largest integer which can be drawn.
+        :return: The random integer.
+        """
+
+        return start + int((stop - start) * self.random())
+
+    def choice(self, seq):
+        """
+        This method picks one element of a non-empty sequence.
+        :param seq: The sequence to pick from.
+        :return: The picked element.
+        """
+
+        return seq[int(len(seq) * self.random())]
+
+    def getstate(self) -> dict:
+        """
+        This method returns the state of the stream as plain data: the generator state each block was drawn from, and
+        how many of its values are left.
+        :return: A JSON-serializable dictionary.
+        """
+
+        return {"block_size": self.block_size,
+                "units": [self.blocks["units"][0], operator.length_hint(self.blocks["units"][1])],
+                "turns": [self.blocks["turns"][0], operator.length_hint(self.blocks["turns"][1])]}
+
+    def setstate(self, state: dict):
+        """
+        This method restores the state of the stream by redrawing the current blocks.
+        :param state: The state returned by getstate().
+        :return:
+        """
+
+        self.block_size = state["block_size"]
+        for name, rng, draw in (("units", self.unit_rng, self.draw_units), ("turns", self.turn_rng, self.draw_turns)):
+            block_state, left = state[name]
+            block = self.blocks[name]
+            if block_state is None:
+                # Nothing has been drawn yet, so the stream starts from the seed.
+                block[1] = iter(())
+                continue
+
+            # Redraw the block from the generator state it was first drawn from, then skip what was already handed out.
+            rng.bit_generator.state = block_state
+            values = draw()
+            block[0], block[1] = block_state, iter(values[len(values) - left:])
+
+        # Continue with what is left of the restored blocks.
+        self.restart()
+
+
+def make_streams(mode: str, rng, seed: int, labels: tuple) -> dict:
+    """
+    This method builds one random number stream per species.
+    :param mode: Either STDLIB_RNG, to draw from the model's random.Random, or BULK_RNG, to pre-draw blocks with NumPy.
+    :param rng: The model's random.Random, which stdlib streams draw from.
+    :param seed: The seed of the run; bulk streams are seeded from its per-species substreams.
+    :param labels: The labels of the species, e.g. ("Sheep", "Wolf").
+    :return: A dictionary mapping each label to its stream.
+    """
+
+    if mode == STDLIB_RNG:
+        stream = StdlibStream(rng)
+        return {label: stream for label in labels}
+    elif mode == BULK_RNG:
+        return {label: BulkStream(substream(seed, SPECIES_STREAMS[label])) for label in labels}
+    raise ValueError(f"Unknown random number mode: {mode}")
@@ -0,0 +1,87 @@
+/*
+Raster grid for the Wolf-Sheep-Grass live visualization.
+
+The grass layer arrives as one raster instead of a portrayal per patch:
+    {"grass": {"runs": [...]}, "animals": {layer: [portrayals]}}
+on key frames, where "runs" are the alternating run lengths of dirt and grass
+over the patches in [x][y] order (starting with dirt), and
+    {"grass": {"changed": [...]}, "animals": {layer: [portrayals]}}
+on the other ticks, where "changed" lists the flat indices of the patches which
+flipped since the previous tick. Animals are drawn with Mesa's GridVisualization.
+*/
+
+var RasterGridModule = function(canvas_width, canvas_height, grid_width, grid_height) {
+	// Create the visible canvas, the same way as Mesa's CanvasModule.
+	var canvas_tag = `<canvas width="${canvas_width}" height="${canvas_height}" class="world-grid"/>`;
+	var parent_div_tag = '<div style="height:' + canvas_height + 'px;" class="world-grid-parent"></div>';
+	var canvas = $(canvas_tag)[0];
+	var interaction_canvas = $(canvas_tag)[0];
+	var parent = $(parent_div_tag)[0];
+	$("#elements").append(parent);
+	parent.append(canvas);
+	parent.append(interaction_canvas);
+
+	var context = canvas.getContext("2d");
+	var interactionHandler = new InteractionHandler(canvas_width, canvas_height, grid_width, grid_height, interaction_canvas.getContext("2d"));
+	var canvasDraw = new GridVisualization(canvas_width, canvas_height, grid_width, grid_height, context, interactionHandler);
+
+	// The grass is kept as one pixel per patch on an off-screen canvas, then scaled up onto the visible one.
+	var raster = document.createElement("canvas");
+	raster.width = grid_width;
+	raster.height = grid_height;
+	var rasterContext = raster.getContext("2d");
+	var image = rasterContext.createImageData(grid_width, grid_height);
+	var grass = new Uint8Array(grid_width * grid_height);
+	var haveKeyFrame = false;
+	var GRASS = [0, 128, 0], DIRT = [160, 82, 45];
+
+	// Patch i of the server's [x][y] array is at x = i / height, y = i % height; the y-axis points up on screen.
+	var paint = function(i) {
+		var x = Math.floor(i / grid_height), y = grid_height - 1 - (i % grid_height);
+		var offset = 4 * (y * grid_width + x);
+		var color = grass[i] ? GRASS : DIRT;
+		image.data[offset] = color[0];
+		image.data[offset + 1] = color[1];
+		image.data[offset + 2] = color[2];
+		image.data[offset + 3] = 255;
+	};
+
+	var updateGrass = function(state) {
+		if (state.runs !== undefined) {
+			var i = 0, value = 0;
+			for (var r = 0; r < state.runs.length; r++) {
+				grass.fill(value, i, i + state.runs[r]);
+				i += state.runs[r];
+				value = 1 - value;
+			}
+			for (i = 0; i < grass.length; i++)
+				paint(i);
+			haveKeyFrame = true;
+		}
+		else if (haveKeyFrame) {
+			for (var c = 0; c < state.changed.length; c++) {
+				grass[state.changed[c]] ^= 1;
+				paint(state.changed[c]);
+			}
+		}
+		rasterContext.putImageData(image, 0, 0);
+	};
+
+	this.render = function(data) {
+		canvasDraw.resetCanvas();
+		updateGrass(data.grass);
+		if (haveKeyFrame) {
+			context.imageSmoothingEnabled = false;
+			context.drawImage(raster, 0, 0, Math.floor(canvas_width / grid_width) * grid_width,
+			                  Math.floor(canvas_height / grid_height) * grid_height);
+		}
+		for (var layer in data.animals)
+			canvasDraw.drawLayer(data.animals[layer]);
+		canvasDraw.drawGridLines("#eee");
+	};
+
+	this.reset = function() {
+		canvasDraw.resetCanvas();
+		haveKeyFrame = false;
+	};
+};
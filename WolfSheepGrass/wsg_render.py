@@ -0,0 +1,292 @@
+import argparse                                 # Import to render a trajectory from the command line.
+import os                                       # Import to find the sprites and write the frames.
+import struct                                   # Import to write the chunks of a PNG file without PIL.
+import zlib                                     # Import to compress the pixels of a PNG file without PIL.
+import numpy as np                              # Import to compose every layer of a frame as arrays.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_trajectory import TrajectoryReader, GRASS_AGENT, WOLF_AGENT, SHEEP_AGENT  # Import to render trajectories.
+except ImportError:
+    from wsg_trajectory import TrajectoryReader, GRASS_AGENT, WOLF_AGENT, SHEEP_AGENT
+
+try:
+    from PIL import Image                       # Import to read the sprites; without it, animals are drawn as discs.
+except ImportError:
+    Image = None
+
+# The directory of the sprites drawn by the arcade replay, Graphics/wsg.py.
+SPRITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Graphics")
+
+# Colors of the grass and dirt, as in the arcade replay, and of the sheep and wolves drawn as discs.
+GRASS_COLOR, DIRT_COLOR = (0, 255, 0), (165, 42, 42)
+SHEEP_COLOR, WOLF_COLOR = (255, 255, 255), (40, 40, 40)
+
+# Sizes of the sheep and wolf sprites, in patches, as scaled by the arcade replay.
+SHEEP_SIZE, WOLF_SIZE = 1.4, 2.7
+
+
+def make_stamp(size: int, sprite: str = None, color: tuple = (255, 255, 255)) -> tuple:
+    """
+    This method scales a sprite, once, into a stamp which can be placed at many positions at once.
+    :param size: The width and height of the stamp, in pixels.
+    :param sprite: The PNG file of the sprite; if None, or if PIL is not installed, the stamp is a disc of the color.
+    :param color: The color of the disc.
+    :return: The row and column offsets of the stamp's visible pixels from its center, their colors as an array of
+             shape (pixels, 3), and their opacity, from 1 to 255.
+    """
+
+    size = max(int(round(size)), 1)
+    if sprite is not None and Image is not None and os.path.exists(sprite):
+        resampling = getattr(Image, "Resampling", Image).LANCZOS
+        rgba = np.asarray(Image.open(sprite).convert("RGBA").resize((size, size), resampling))
+    else:
+        # Draw a disc, with an opacity falling off over its last pixel so that its edge is smooth.
+        offsets = np.arange(size) - (size - 1) / 2
+        distance = np.hypot(*np.meshgrid(offsets, offsets, indexing="ij"))
+        rgba = np.empty((size, size, 4), np.uint8)
+        rgba[..., :3] = color
+        rgba[..., 3] = np.round(255 * np.clip(size / 2 - distance, 0, 1))
+
+    # Keep only the visible pixels, as offsets from the center.
+    rows, columns = np.nonzero(rgba[..., 3] > 0)
+    return rows - size // 2, columns - size // 2, rgba[rows, columns, :3], rgba[rows, columns, 3]
+
+
+class RasterRenderer:
+    """
+    Renders the world into RGB images in memory, without a window or GPU. Grass and dirt are drawn as blocks of cell x
+    cell pixels, and the animals as stamps pre-scaled once, placed all at once per species. The y-axis points up, as in
+    the arcade replay, and stamps wrap around the edges of the torus.
+    """
+
+    def __init__(self, width: int, height: int, cell: int = 4, sprites: bool = True, sprite_dir: str = SPRITE_DIR):
+        """
+        Initializes the RasterRenderer class.
+        :param width: Width of the grid-world (i.e. horizontal length).
+        :param height: Height of the grid-world (i.e. vertical length).
+        :param cell: The width and height of every patch, in pixels.
+        :param sprites: If True, the animals are drawn with the sheep and wolf sprites of the arcade replay; if False,
+                        or if the sprites cannot be read, as discs.
+        :param sprite_dir: The directory of sheep.png and Wolf.png.
+        """
+
+        self.width, self.height, self.cell = width, height, cell
+        self.shape = (height * cell, width * cell, 3)
+
+        # Pre-scale the stamp of each species.
+        self.stamps = {}
+        for label, size, file_name, color in (("sheep", SHEEP_SIZE, "sheep.png", SHEEP_COLOR),
+                                              ("wolves", WOLF_SIZE, "Wolf.png", WOLF_COLOR)):
+            sprite = os.path.join(sprite_dir, file_name) if sprites else None
+            self.stamps[label] = make_stamp(size * cell, sprite, color)
+
+        # The colors of dirt and grass, looked up by the grass array.
+        self.palette = np.array([DIRT_COLOR, GRASS_COLOR], np.uint8)
+
+        # The patches are kept drawn in their own image, and only the patches whose grass changed are redrawn, as in
+        # the arcade replay. The pixels of every patch are its first pixel plus the offsets of a block.
+        self.patches, self.grass = np.empty(self.shape, np.uint8), None
+        block_rows, block_columns = np.divmod(np.arange(cell * cell), cell)
+        self.block = block_rows * self.shape[1] + block_columns
+        patch_x, patch_y = np.divmod(np.arange(width * height), height)
+        self.corners = (height - 1 - patch_y) * cell * self.shape[1] + patch_x * cell
+
+    def draw_patches(self, patch_color: np.ndarray, image: np.ndarray):
+        """
+        This method draws the grass and dirt patches, covering the whole image.
+        :param patch_color: The boolean grass array of the world, indexed as [x, y].
+        :param image: The image to draw on.
+        :return:
+        """
+
+        # Redraw the patches which changed since the last frame, or every patch on the first one.
+        grass = np.asarray(patch_color, bool).ravel()
+        changed = np.arange(len(grass)) if self.grass is None else np.flatnonzero(grass != self.grass)
+        pixels = (self.corners[changed, np.newaxis] + self.block).ravel()
+        colors = self.palette[grass[changed].astype(np.intp)]
+        self.patches.reshape(-1, 3)[pixels] = np.repeat(colors, len(self.block), axis=0)
+        self.grass = grass.copy()
+        image[...] = self.patches
+
+    def draw_animals(self, label: str, x: np.ndarray, y: np.ndarray, image: np.ndarray):
+        """
+        This method stamps every animal of a species onto the image at once.
+        :param label: The species, either "sheep" or "wolves".
+        :param x: The x-coordinates of the animals, in patches.
+        :param y: The y-coordinates of the animals, in patches.
+        :param image: The image to draw on.
+        :return:
+        """
+
+        if not len(x):
+            return
+        row_offsets, column_offsets, colors, alpha = self.stamps[label]
+
+        # The pixel of every stamp pixel of every animal, wrapped around the torus.
+        center_rows = ((self.height - np.asarray(y, float)) * self.cell).astype(np.intp)
+        center_columns = (np.asarray(x, float) * self.cell).astype(np.intp)
+        rows = (center_rows[:, np.newaxis] + row_offsets) % self.shape[0]
+        columns = (center_columns[:, np.newaxis] + column_offsets) % self.shape[1]
+        pixels = rows * self.shape[1] + columns
+
+        # Blend the stamps over what is below them in integers. Where stamps overlap, the last one drawn wins.
+        flat = image.reshape(-1, 3)
+        below = flat[pixels].astype(np.uint16)
+        weight = alpha.astype(np.uint16)[:, np.newaxis]
+        flat[pixels] = ((below * (255 - weight) + colors * weight + 127) // 255).astype(np.uint8)
+
+    def render(self, patch_color: np.ndarray, wolves: tuple, sheep: tuple, out: np.ndarray = None) -> np.ndarray:
+        """
+        This method renders one frame of the world: the patches, then the sheep, then the wolves.
+        :param patch_color: The boolean grass array of the world, indexed as [x, y].
+        :param wolves: The x-coordinates and y-coordinates of every wolf, and optionally their energy, as arrays.
+        :param sheep: The x-coordinates and y-coordinates of every sheep, and optionally their energy, as arrays.
+        :param out: The image to render into, e.g. to reuse one buffer for many frames; if None, a new one.
+        :return: The image, as an array of shape (height * cell, width * cell, 3) of 8-bit RGB.
+        """
+
+        image = np.empty(self.shape, np.uint8) if out is None else out
+        self.draw_patches(patch_color, image)
+        self.draw_animals("sheep", sheep[0], sheep[1], image)
+        self.draw_animals("wolves", wolves[0], wolves[1], image)
+        return image
+
+    def render_model(self, model, out: np.ndarray = None) -> np.ndarray:
+        """
+        This method renders the current state of a running model of any engine which can gather its world.
+        :param model: The model, e.g. a WolfSheepGrass instance.
+        :param out: The image to render into; if None, a new one.
+        :return: The image.
+        """
+
+        return self.render(*model.get_world(), out=out)
+
+    def render_frame(self, frame: dict, out: np.ndarray = None) -> np.ndarray:
+        """
+        This method renders one frame of a trajectory.
+        :param frame: The frame, as returned by TrajectoryReader.frame().
+        :param out: The image to render into; if None, a new one.
+        :return: The image.
+        """
+
+        return self.render(*split_frame(frame, self.width, self.height), out=out)
+
+    def render_trajectory(self, trajectory: TrajectoryReader, every: int = 1):
+        """
+        This method renders the frames of a trajectory one after another, into one reused image.
+        :param trajectory: The trajectory to render.
+        :param every: Only every this many frames are rendered.
+        :return: An iterator over the time step of every frame rendered and its image, which is overwritten by the
+                 next frame; copy it to keep it.
+        """
+
+        image = np.empty(self.shape, np.uint8)
+        for index in range(0, len(trajectory), every):
+            yield int(trajectory.times[index]), self.render_frame(trajectory.frame(index), image)
+
+
+def split_frame(frame: dict, width: int, height: int) -> tuple:
+    """
+    This method splits a trajectory frame into the layers of the world.
+    :param frame: The frame, as returned by TrajectoryReader.frame().
+    :param width: Width of the grid-world.
+    :param height: Height of the grid-world.
+    :return: The boolean grass array, indexed as [x, y], and the x-coordinates and y-coordinates of the wolves and of
+             the sheep, as model.get_world() returns them.
+    """
+
+    agent, x, y = frame["agent"], frame["x"], frame["y"]
+    is_grass, is_wolf, is_sheep = agent == GRASS_AGENT, agent == WOLF_AGENT, agent == SHEEP_AGENT
+    patch_color = np.zeros((width, height), bool)
+    patch_color[x[is_grass].astype(np.intp), y[is_grass].astype(np.intp)] = True
+    return patch_color, (x[is_wolf], y[is_wolf]), (x[is_sheep], y[is_sheep])
+
+
+def accumulate_density(trajectory: TrajectoryReader, every: int = 1) -> dict:
+    """
+    This method averages the number of sheep and wolves on every patch, and how often it is grass, over a trajectory.
+    :param trajectory: The trajectory to average.
+    :param every: Only every this many frames are counted.
+    :return: A dictionary mapping "sheep", "wolves", and "grass" to arrays indexed as [x, y].
+    """
+
+    width, height = trajectory.width, trajectory.height
+    labels = {GRASS_AGENT: "grass", WOLF_AGENT: "wolves", SHEEP_AGENT: "sheep"}
+    totals = {label: np.zeros(width * height) for label in labels.values()}
+    frames = range(0, len(trajectory), every)
+
+    # Count the rows of every frame on their patch, by agent type, in one pass per frame.
+    for index in frames:
+        frame = trajectory.frame(index)
+        cells = (np.asarray(frame["x"], np.intp) % width) * height + np.asarray(frame["y"], np.intp) % height
+        counts = np.bincount(frame["agent"].astype(np.intp) * width * height + cells,
+                             minlength=len(labels) * width * height).reshape(len(labels), -1)
+        for agent, label in labels.items():
+            totals[label] += counts[agent]
+    return {label: (total / max(len(frames), 1)).reshape(width, height) for label, total in totals.items()}
+
+
+def render_heatmap(values: np.ndarray, cell: int = 4, vmax: float = None) -> np.ndarray:
+    """
+    This method renders a heatmap of values per patch, from black through red and yellow to white.
+    :param values: The values, indexed as [x, y], e.g. a layer of accumulate_density() or of wsg_output.read_density().
+    :param cell: The width and height of every value, in pixels.
+    :param vmax: The value drawn white; defaults to the largest value.
+    :return: The image, as an array of shape (height * cell, width * cell, 3) of 8-bit RGB, with the y-axis pointing up.
+    """
+
+    values = np.asarray(values, float).T[::-1]
+    vmax = float(values.max()) if vmax is None else vmax
+    level = np.clip(values / vmax, 0, 1) if vmax > 0 else np.zeros_like(values)
+
+    # Ramp red in, then green, then blue.
+    colors = np.clip(np.stack([3 * level, 3 * level - 1, 3 * level - 2], axis=-1), 0, 1)
+    image = (255 * colors).astype(np.uint8)
+    return np.repeat(np.repeat(image, cell, axis=0), cell, axis=1)
+
+
+def write_png(path: str, image: np.ndarray):
+    """
+    This method writes an 8-bit RGB image to a PNG file, with PIL if it is installed and zlib otherwise.
+    :param path: The file to write.
+    :param image: The image, as an array of shape (height, width, 3) of 8-bit RGB.
+    :return:
+    """
+
+    image = np.ascontiguousarray(image, np.uint8)
+    if Image is not None:
+        Image.fromarray(image, "RGB").save(path, compress_level=1)
+        return
+
+    # Every row starts with filter type 0, i.e. unfiltered.
+    height, width = image.shape[:2]
+    raw = np.concatenate([np.zeros((height, 1), np.uint8), image.reshape(height, -1)], axis=1).tobytes()
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as png_file:
+        png_file.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) +
+                       chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a trajectory to PNG images without a window or GPU.")
+    parser.add_argument("trajectory", nargs="?", default=os.path.join(SPRITE_DIR, "wsg_trajectory"))
+    parser.add_argument("--out", default="frames", help="The directory to write the images to.")
+    parser.add_argument("--cell", type=int, default=4, help="The width and height of every patch, in pixels.")
+    parser.add_argument("--every", type=int, default=1, help="Render only every this many frames.")
+    parser.add_argument("--discs", action="store_true", help="Draw the animals as discs instead of sprites.")
+    parser.add_argument("--heatmap", action="store_true", help="Render time-averaged density heatmaps instead.")
+    args = parser.parse_args()
+
+    reader = TrajectoryReader(args.trajectory)
+    os.makedirs(args.out, exist_ok=True)
+    if args.heatmap:
+        for label, density in accumulate_density(reader, args.every).items():
+            write_png(os.path.join(args.out, f"density_{label}.png"), render_heatmap(density, args.cell))
+    else:
+        renderer = RasterRenderer(reader.width, reader.height, args.cell, not args.discs)
+        for time, frame_image in renderer.render_trajectory(reader, args.every):
+            write_png(os.path.join(args.out, f"frame_{time:06d}.png"), frame_image)
@@ -0,0 +1,96 @@
+import numpy as np  # Import to compare the statistics of the population series.
+
+# Reasons a run is stopped early with, alongside those of the models (ANNIHILATED, SHEEP_INHERIT, MAX_STEPS).
+EXTINCTION, SATURATION, STATIONARY = "extinction", "saturation", "stationary"
+
+# The population series compared by the stationarity detector.
+SERIES = ("Sheep Count", "Wolf Count")
+
+
+def detect_extinction(series: dict, stopper) -> bool:
+    """
+    This method detects runs whose sheep have died out; the wolves are left without food and will starve.
+    :param series: The DataCollector series of the model, mapping reporter names to lists of values.
+    :param stopper: The EarlyStopping instance calling the detector.
+    :return: True if the run has reached this end state.
+    """
+
+    return series["Sheep Count"][-1] <= 0 < series["Wolf Count"][-1]
+
+
+def detect_saturation(series: dict, stopper) -> bool:
+    """
+    This method detects runs whose wolves have died out; the sheep are left to grow until the grass or max_sheep
+    limits them, which is the only end state left to the run.
+    :param series: The DataCollector series of the model, mapping reporter names to lists of values.
+    :param stopper: The EarlyStopping instance calling the detector.
+    :return: True if the run has reached this end state.
+    """
+
+    return series["Wolf Count"][-1] <= 0 < series["Sheep Count"][-1]
+
+
+def detect_stationary(series: dict, stopper) -> bool:
+    """
+    This method detects runs which have settled into a steady cycle: over the last two windows, the mean and standard
+    deviation of every population agree to within the stopper's tolerance.
+    :param series: The DataCollector series of the model, mapping reporter names to lists of values.
+    :param stopper: The EarlyStopping instance calling the detector.
+    :return: True if the statistics of the run have stopped changing.
+    """
+
+    window = stopper.window
+    if len(series[SERIES[0]]) < 2 * window:
+        return False
+
+    for name in SERIES:
+        earlier, later = np.asarray(series[name][-2 * window:], float).reshape(2, window)
+        for statistic in (np.mean, np.std):
+            before, after = statistic(earlier), statistic(later)
+            if abs(after - before) > stopper.tolerance * max(abs(before), abs(after), 1.0):
+                return False
+    return True
+
+
+# Every detector, by the reason it stops a run with.
+DETECTORS = {EXTINCTION: detect_extinction, SATURATION: detect_saturation, STATIONARY: detect_stationary}
+
+
+class EarlyStopping:
+    """
+    Stopping condition for RunLoop.run_until() which watches the DataCollector series of a model for end states. The
+    detectors only read the series, so that a model restored from a checkpoint is watched exactly as before.
+    """
+
+    def __init__(self, detectors: tuple = (EXTINCTION, SATURATION, STATIONARY), window: int = 200,
+                 tolerance: float = 0.1, check_every: int = 10):
+        """
+        Initializes the EarlyStopping class.
+        :param detectors: The names of the detectors to run, from DETECTORS.
+        :param window: The number of ticks in each of the two windows compared by the stationarity detector. It should
+                       span several cycles of the populations.
+        :param tolerance: The relative change of the mean and standard deviation below which a run is stationary.
+        :param check_every: The detectors run every this many ticks, as the stationarity test is not free.
+        """
+
+        self.detectors = {name: DETECTORS[name] for name in detectors}
+        self.window, self.tolerance, self.check_every = window, tolerance, check_every
+
+        # The detector which stopped the run, if any.
+        self.reason = None
+
+    def __call__(self, model) -> bool:
+        """
+        This method runs the detectors on the series collected so far.
+        :param model: The model, before its next step.
+        :return: True to stop the run, recording the detector in reason.
+        """
+
+        series = model.dc.model_vars
+        if not series or not series[SERIES[0]] or model.time % self.check_every:
+            return False
+        for name, detector in self.detectors.items():
+            if detector(series, self):
+                self.reason = name
+                return True
+        return False
@@ -0,0 +1,204 @@
+import atexit       # Import to flush buffered rows when the interpreter exits.
+import json         # Import to store the format description next to the columns.
+import os           # Import to create the trajectory directory and build the column file paths.
+import numpy as np  # Import to buffer, write, and memory-map the typed columns.
+
+# Agent type codes stored in the "agent" column, and the names they stand for.
+GRASS_AGENT, WOLF_AGENT, SHEEP_AGENT = 0, 1, 2
+AGENT_NAMES = ("grass", "wolf", "sheep")
+
+# Typed columns of the trajectory. Grass patches have no energy and store NaN instead.
+COLUMNS = {"time": np.dtype("<i4"), "agent": np.dtype("u1"),
+           "x": np.dtype("<f4"), "y": np.dtype("<f4"), "energy": np.dtype("<f4")}
+
+# Every frame of the index is stored as (time, first row, number of rows).
+FRAME_DTYPE = np.dtype("<i8")
+
+
+class TrajectoryWriter:
+    """Writes agent positions and energy to a directory of binary columns, one chunk at a time."""
+
+    def __init__(self, path: str, width: int, height: int, chunk_rows: int = 1 << 16):
+        """
+        Initializes the TrajectoryWriter class and truncates any trajectory already stored at the path.
+        :param path: The directory to hold the column files, the frame index, and the format description.
+        :param width: Width of the grid-world (i.e. horizontal length).
+        :param height: Height of the grid-world (i.e. vertical length).
+        :param chunk_rows: The number of rows buffered in memory before they are written to disk.
+        """
+
+        # Describe the format so that readers do not have to guess the column types or the world size.
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "w") as meta_file:
+            json.dump({"version": 1, "width": width, "height": height, "agent_types": AGENT_NAMES,
+                       "columns": {name: dtype.str for name, dtype in COLUMNS.items()}}, meta_file)
+
+        # Keep one file open per column, plus the frame index.
+        self.files = {name: open(os.path.join(path, name + ".bin"), "wb") for name in COLUMNS}
+        self.frame_file = open(os.path.join(path, "frames.bin"), "wb")
+
+        # Rows are copied into fixed-size buffers and written out whenever the buffers fill up.
+        self.chunk_rows = chunk_rows
+        self.buffers = {name: np.empty(chunk_rows, dtype) for name, dtype in COLUMNS.items()}
+        self.buffered_rows = 0
+        self.frames = []
+
+        # Rows written so far, used to locate the start of every frame.
+        self.total_rows = 0
+
+        # Make sure buffered rows reach the disk even if the simulation is stopped without closing the writer.
+        atexit.register(self.close)
+
+    def append_frame(self, time: int, agent: np.ndarray, x: np.ndarray, y: np.ndarray, energy: np.ndarray):
+        """
+        This method appends every row of one time step to the trajectory.
+        :param time: The time step of the frame.
+        :param agent: The agent type code of every row (GRASS_AGENT, WOLF_AGENT, or SHEEP_AGENT).
+        :param x: The x-coordinate of every row.
+        :param y: The y-coordinate of every row.
+        :param energy: The energy of every row (NaN for grass).
+        :return:
+        """
+
+        # Frames which do not fit in what is left of the buffers flush them first.
+        n = len(agent)
+        if self.buffered_rows + n > self.chunk_rows:
+            self.flush()
+
+        # Frames larger than a whole chunk go straight to disk; anything else is copied into the buffers.
+        columns = {"agent": agent, "x": x, "y": y, "energy": energy}
+        if n > self.chunk_rows:
+            self.files["time"].write(np.full(n, time, COLUMNS["time"]).tobytes())
+            for name, values in columns.items():
+                self.files[name].write(np.asarray(values, COLUMNS[name]).tobytes())
+        else:
+            start, stop = self.buffered_rows, self.buffered_rows + n
+            self.buffers["time"][start:stop] = time
+            for name, values in columns.items():
+                self.buffers[name][start:stop] = values
+            self.buffered_rows = stop
+
+        # Record where the frame starts in the index.
+        self.frames.append((time, self.total_rows, n))
+        self.total_rows += n
+
+    def append_world(self, time: int, patch_color: np.ndarray, wolves: tuple, sheep: tuple):
+        """
+        This method appends one time step made of the grass patches, the wolves, and the sheep to the trajectory.
+        :param time: The time step of the frame.
+        :param patch_color: The boolean grass array of the world, indexed as [x, y].
+        :param wolves: The x-coordinates, y-coordinates, and energy of every wolf, as arrays.
+        :param sheep: The x-coordinates, y-coordinates, and energy of every sheep, as arrays.
+        :return:
+        """
+
+        # Grass patches are written first, then the wolves, then the sheep.
+        grass_x, grass_y = np.nonzero(patch_color)
+        groups = ((GRASS_AGENT, grass_x, grass_y, np.full(len(grass_x), np.nan)),
+                  (WOLF_AGENT,) + tuple(wolves), (SHEEP_AGENT,) + tuple(sheep))
+        agent = np.concatenate([np.full(len(group[1]), group[0], COLUMNS["agent"]) for group in groups])
+        x, y, energy = (np.concatenate([group[column] for group in groups]) for column in (1, 2, 3))
+        self.append_frame(time, agent, x, y, energy)
+
+    def flush(self):
+        """This method writes the buffered rows and frame index entries to disk."""
+
+        # Write the buffered part of every column.
+        for name, column_file in self.files.items():
+            column_file.write(self.buffers[name][:self.buffered_rows].tobytes())
+            column_file.flush()
+        self.buffered_rows = 0
+
+        # Write the index last, so that readers never see a frame whose rows are not on disk yet.
+        self.frame_file.write(np.array(self.frames, FRAME_DTYPE).reshape(-1, 3).tobytes())
+        self.frame_file.flush()
+        self.frames = []
+
+    def close(self):
+        """This method flushes any buffered rows and closes the files. Closing twice has no effect."""
+
+        if self.frame_file.closed:
+            return
+        self.flush()
+        for column_file in self.files.values():
+            column_file.close()
+        self.frame_file.close()
+        atexit.unregister(self.close)
+
+
+class TrajectoryReader:
+    """Reads a trajectory written by TrajectoryWriter, memory-mapping the columns instead of parsing them."""
+
+    def __init__(self, path: str):
+        """
+        Initializes the TrajectoryReader class.
+        :param path: The directory written by a TrajectoryWriter.
+        """
+
+        # Read the format description.
+        with open(os.path.join(path, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+        self.width, self.height = meta["width"], meta["height"]
+
+        # Only frames which made it into the index are readable; their rows are guaranteed to be on disk.
+        self.frames = np.fromfile(os.path.join(path, "frames.bin"), FRAME_DTYPE).reshape(-1, 3)
+        rows = int(self.frames[-1, 1] + self.frames[-1, 2]) if len(self.frames) else 0
+
+        # Memory-map every column.
+        self.columns = {}
+        for name, dtype in meta["columns"].items():
+            if rows:
+                self.columns[name] = np.memmap(os.path.join(path, name + ".bin"), np.dtype(dtype), "r", shape=(rows,))
+            else:
+                self.columns[name] = np.empty(0, np.dtype(dtype))
+
+    def __len__(self) -> int:
+        """
+        This method returns the number of frames in the trajectory.
+        :return: The number of frames.
+        """
+
+        return len(self.frames)
+
+    def __iter__(self):
+        """
+        This method yields every frame of the trajectory in order.
+        :return: An iterator over the frames, as returned by frame().
+        """
+
+        for index in range(len(self)):
+            yield self.frame(index)
+
+    @property
+    def times(self) -> np.ndarray:
+        """
+        This property returns the time step of every frame.
+        :return: An integer array of time steps.
+        """
+
+        return self.frames[:, 0]
+
+    def frame(self, index: int) -> dict:
+        """
+        This method returns the rows of one frame without copying them.
+        :param index: The position of the frame in the trajectory.
+        :return: A dictionary mapping each column name to the frame's slice of that column.
+        """
+
+        # Negative indices count from the end, as with lists.
+        _, start, n = self.frames[index]
+        return {name: column[start:start + n] for name, column in self.columns.items()}
+
+    def frame_at_time(self, time: int) -> dict:
+        """
+        This method returns the rows of the frame recorded at a given time step.
+        :param time: The time step to look up.
+        :return: A dictionary mapping each column name to the frame's slice of that column.
+        """
+
+        # Frames are written in time order, so the index can be searched.
+        index = int(np.searchsorted(self.times, time))
+        if index >= len(self) or self.times[index] != time:
+            raise KeyError(f"No frame recorded at time {time}.")
+        return self.frame(index)
@@ -0,0 +1,352 @@
+import argparse                                     # Import to run the validation from the command line.
+import math                                         # Import for the tail of the Kolmogorov distribution.
+import os                                           # Import to find the reference curve next to the package.
+import sys                                          # Import to fail the command line when the engines differ.
+from statistics import NormalDist                   # Import the normal quantiles of the detectable differences.
+from concurrent.futures import ProcessPoolExecutor  # Import to run the seeds of every engine in parallel.
+import numpy as np                                  # Import to compute the statistics of the ensembles.
+import pandas as pd                                 # Import to read the reference curve and tabulate the tests.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_batch import DEFAULT_PARAMETERS, run_single  # Import the NetLogo defaults and the run of one seed.
+    from .wsg_random import derive_seed, new_seed   # Import to derive the seed of every replicate from one seed.
+except ImportError:
+    from wsg_batch import DEFAULT_PARAMETERS, run_single
+    from wsg_random import derive_seed, new_seed
+
+# The population curve of the reference Mesa run, written by the plot output with the NetLogo defaults.
+REFERENCE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Graphics", "plot.csv")
+
+# The species compared, with the DataCollector reporter and the column of plot.csv of each, and the factor turning the
+# reporter into the column's units.
+SPECIES = {"sheep": ("Sheep Count", "Sheep", 1), "wolves": ("Wolf Count", "Wolves", 1),
+           "grass": ("Grass / 5 Count", "Grass", 5)}
+
+# The features of every run which are compared between engines.
+FEATURES = ("sheep_mean", "wolves_mean", "grass_mean", "sheep_period", "wolves_period",
+            "sheep_amplitude", "wolves_amplitude", "sheep_extinct", "wolves_extinct")
+
+
+def run_ensemble(engine: str, seeds, parameters: dict = None, max_steps: int = 500, processes: int = None,
+                 root_seed: int = None) -> dict:
+    """
+    This method runs one engine headless over many seeds in a pool of worker processes.
+    :param engine: The engine, as accepted by wsg_batch.get_engine().
+    :param seeds: Either the list of seeds to run, or the number of replicates, in which case replicate k is seeded with
+                  the k-th substream of the root seed, so that every engine is run with the same seeds.
+    :param parameters: The parameters of the model; defaults to DEFAULT_PARAMETERS.
+    :param max_steps: The number of steps after which a run is stopped.
+    :param processes: The number of worker processes; defaults to the number of CPUs. If 0, runs are executed one
+                      after another in this process.
+    :param root_seed: The seed from which replicate seeds are derived; if None, a fresh seed is drawn.
+    :return: A dictionary mapping every species to an array indexed as [run, tick], with NaN after a run ended.
+    """
+
+    # Derive the seed of every replicate.
+    if isinstance(seeds, int):
+        root_seed = new_seed() if root_seed is None else root_seed
+        seeds = [derive_seed(root_seed, replicate) for replicate in range(seeds)]
+    parameters = dict(DEFAULT_PARAMETERS if parameters is None else parameters)
+    tasks = [(run_id, engine, parameters, seed, max_steps, None) for run_id, seed in enumerate(seeds)]
+
+    # Run every seed, in worker processes unless told otherwise.
+    if processes == 0:
+        results = [run_single(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            results = list(pool.map(run_single, *zip(*tasks)))
+
+    # Stack the series of the runs, padding runs which ended early.
+    ensemble = {}
+    for species, (reporter, _, scale) in SPECIES.items():
+        ensemble[species] = np.full((len(results), max_steps), np.nan)
+        for row, result in zip(ensemble[species], results):
+            values = np.asarray(result["series"][reporter], float)[:max_steps] * scale
+            row[:len(values)] = values
+    return ensemble
+
+
+def load_reference(path: str = REFERENCE_CSV) -> dict:
+    """
+    This method reads a reference population curve in the format of plot.csv, e.g. one exported from NetLogo.
+    :param path: The CSV file, with the columns Time, Sheep, Wolves, Grass, and Dirt.
+    :return: A dictionary mapping every species to an array indexed as [run, tick], holding the one run.
+    """
+
+    curve = pd.read_csv(path).sort_values("Time")
+    return {species: curve[column].to_numpy(float)[np.newaxis] for species, (_, column, _) in SPECIES.items()}
+
+
+def oscillation(values: np.ndarray, burn_in: int = 100) -> tuple:
+    """
+    This method measures the cycle of a population from its autocorrelation after the burn-in.
+    :param values: The population on every tick, NaN after the run ended.
+    :param burn_in: The number of first ticks left out, while the populations settle.
+    :return: The period in ticks, at the first peak of the autocorrelation after it first turns negative, and the
+             amplitude, as half the spread between the 5th and 95th percentiles; NaN if there is no cycle to measure.
+    """
+
+    values = values[burn_in:]
+    values = values[~np.isnan(values)]
+    if len(values) < 4 or np.ptp(values) == 0:
+        return math.nan, math.nan
+    amplitude = float(np.subtract(*np.percentile(values, [95, 5]))) / 2
+
+    # Autocorrelate the fluctuations through the FFT, padded so that the signal does not wrap around.
+    fluctuations = values - values.mean()
+    spectrum = np.fft.rfft(fluctuations, 2 * len(fluctuations))
+    correlation = np.fft.irfft(spectrum * np.conj(spectrum))[:len(fluctuations) // 2]
+
+    # The first peak is the highest point of the first positive lobe after the autocorrelation turns negative.
+    negative = np.flatnonzero(correlation < 0)
+    positive = np.flatnonzero(correlation[negative[0]:] > 0) + negative[0] if len(negative) else []
+    if not len(positive):
+        return math.nan, amplitude
+    rise = positive[0]
+    fall = np.flatnonzero(correlation[rise:] < 0)
+    lobe = correlation[rise:rise + fall[0]] if len(fall) else correlation[rise:]
+    return float(rise + np.argmax(lobe)), amplitude
+
+
+def run_features(ensemble: dict, burn_in: int = 100) -> pd.DataFrame:
+    """
+    This method summarizes every run of an ensemble by the features compared between engines.
+    :param ensemble: The ensemble, as returned by run_ensemble() or load_reference().
+    :param burn_in: The number of first ticks left out of the means and cycles, while the populations settle.
+    :return: A table with one row per run and one column per feature in FEATURES.
+    """
+
+    features = {}
+    for species in ("sheep", "wolves"):
+        cycles = np.array([oscillation(values, burn_in) for values in ensemble[species]]).reshape(-1, 2)
+        features[f"{species}_period"], features[f"{species}_amplitude"] = cycles.T
+        features[f"{species}_extinct"] = (np.nanmin(ensemble[species], axis=1) <= 0).astype(float)
+    for species in SPECIES:
+        with np.errstate(all="ignore"):
+            features[f"{species}_mean"] = np.nanmean(ensemble[species][:, burn_in:], axis=1)
+    return pd.DataFrame(features)[list(FEATURES)]
+
+
+def mean_trajectory(ensemble: dict) -> pd.DataFrame:
+    """
+    This method averages the population curves of an ensemble over its runs.
+    :param ensemble: The ensemble, as returned by run_ensemble().
+    :return: A table with one row per tick, and the mean and standard deviation of every species over the runs still
+             going, and the number of such runs.
+    """
+
+    table = {"runs": np.sum(~np.isnan(ensemble["sheep"]), axis=0)}
+    with np.errstate(all="ignore"):
+        for species, values in ensemble.items():
+            table[f"{species}_mean"] = np.nanmean(values, axis=0)
+            table[f"{species}_std"] = np.nanstd(values, axis=0)
+    return pd.DataFrame(table)
+
+
+def ks_test(a: np.ndarray, b: np.ndarray) -> tuple:
+    """
+    This method runs the two-sample Kolmogorov-Smirnov test, with the asymptotic p-value.
+    :param a: The first sample; NaNs are left out.
+    :param b: The second sample; NaNs are left out.
+    :return: The statistic, the largest distance between the empirical distributions, and its p-value.
+    """
+
+    a, b = np.sort(a[~np.isnan(a)]), np.sort(b[~np.isnan(b)])
+    if not len(a) or not len(b):
+        return math.nan, math.nan
+    points = np.concatenate([a, b])
+    distance = float(np.max(np.abs(np.searchsorted(a, points, "right") / len(a) -
+                                   np.searchsorted(b, points, "right") / len(b))))
+
+    # The tail of the Kolmogorov distribution, with the small-sample correction of Stephens.
+    effective = math.sqrt(len(a) * len(b) / (len(a) + len(b)))
+    scaled = (effective + 0.12 + 0.11 / effective) * distance
+    if scaled < 0.2:
+        return distance, 1.0
+    tail = 2 * sum((-1) ** (k - 1) * math.exp(-2 * k * k * scaled * scaled) for k in range(1, 101))
+    return distance, min(max(tail, 0.0), 1.0)
+
+
+def permutation_test(a: np.ndarray, b: np.ndarray, permutations: int = 2000, rng=None) -> tuple:
+    """
+    This method runs a two-sided permutation test of the difference between the means of two samples.
+    :param a: The first sample; NaNs are left out.
+    :param b: The second sample; NaNs are left out.
+    :param permutations: The number of random relabellings of the pooled sample.
+    :param rng: The NumPy generator to permute with; defaults to a fixed seed, so that the p-value is reproducible.
+    :return: The difference between the means, and its p-value.
+    """
+
+    a, b = a[~np.isnan(a)], b[~np.isnan(b)]
+    if not len(a) or not len(b):
+        return math.nan, math.nan
+    rng = np.random.default_rng(0) if rng is None else rng
+    pooled = np.concatenate([a, b])
+    observed = a.mean() - b.mean()
+
+    # Relabel the pooled sample at random, all permutations at once.
+    order = rng.permuted(np.tile(pooled, (permutations, 1)), axis=1)
+    differences = order[:, :len(a)].mean(axis=1) - order[:, len(a):].mean(axis=1)
+    exceed = np.sum(np.abs(differences) >= abs(observed) - 1e-12)
+    return float(observed), float((exceed + 1) / (permutations + 1))
+
+
+def standard_error(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    This method returns the standard error of the difference between the means of two samples, leaving out NaNs.
+    :param a: The first sample.
+    :param b: The second sample.
+    :return: The standard error, or NaN if either sample has fewer than two values.
+    """
+
+    a, b = a[~np.isnan(a)], b[~np.isnan(b)]
+    if len(a) < 2 or len(b) < 2:
+        return math.nan
+    return math.sqrt(np.var(a, ddof=1) / len(a) + np.var(b, ddof=1) / len(b))
+
+
+def compare_engines(reference: pd.DataFrame, candidate: pd.DataFrame, alpha: float = 0.05,
+                    power: float = 0.8) -> pd.DataFrame:
+    """
+    This method tests whether two engines produce different distributions of any feature. A test which does not reject
+    does not show that the engines agree, only that the ensembles were too small to detect their difference if there is
+    one; so every feature also reports the ensemble sizes, and the difference between the means which its tests would
+    detect with the given power.
+    :param reference: The features of the runs of the trusted engine, as returned by run_features().
+    :param candidate: The features of the runs of the engine under test.
+    :param alpha: The family-wise significance level; each test is held to alpha divided by the number of tests.
+    :param power: The chance of detecting a difference of the size reported as detectable.
+    :return: A table with one row per feature: the mean of each engine, the number of runs of each with a value, the
+             Kolmogorov-Smirnov statistic and p-value, the permutation p-value of the difference between the means,
+             the smallest difference between the means detectable with the given power, and whether neither test
+             detected a difference.
+    """
+
+    rows = []
+    for feature in FEATURES:
+        a, b = reference[feature].to_numpy(float), candidate[feature].to_numpy(float)
+        distance, ks_p = ks_test(a, b)
+        difference, permutation_p = permutation_test(a, b)
+        rows.append({"feature": feature, "reference": np.nanmean(a) if np.any(~np.isnan(a)) else math.nan,
+                     "candidate": np.nanmean(b) if np.any(~np.isnan(b)) else math.nan,
+                     "n_reference": int(np.sum(~np.isnan(a))), "n_candidate": int(np.sum(~np.isnan(b))),
+                     "ks": distance, "ks_p": ks_p, "permutation_p": permutation_p,
+                     "standard_error": standard_error(a, b)})
+    table = pd.DataFrame(rows)
+
+    # Correct for testing every feature twice; a feature whose samples are all NaN, e.g. constant, passes.
+    level = alpha / (2 * len(FEATURES))
+    table["no_detected_difference"] = ~((table["ks_p"] < level) | (table["permutation_p"] < level))
+
+    # The difference between the means which the normal approximation of the test of the means detects with the given
+    # power at the corrected level.
+    normal = NormalDist()
+    table["detectable"] = (normal.inv_cdf(1 - level / 2) + normal.inv_cdf(power)) * table.pop("standard_error")
+    return table
+
+
+def compare_reference(ensemble: dict, reference: dict, burn_in: int = 100, alpha: float = 0.05) -> pd.DataFrame:
+    """
+    This method checks a single reference curve against the spread of an ensemble, since one curve cannot be tested
+    like a sample: its features are ranked among those of the runs, and its curve is compared with the pointwise band.
+    :param ensemble: The ensemble, as returned by run_ensemble().
+    :param reference: The reference curve, as returned by load_reference().
+    :param burn_in: The number of first ticks left out of the means and cycles.
+    :param alpha: The two-sided level of the ranks and of the pointwise band.
+    :return: A table with one row per feature: the value of the reference, the median of the ensemble, the two-sided
+             rank p-value, and whether the reference was not detected outside the ensemble's spread; followed by one row
+             per species
+             with the fraction of ticks on which the reference curve lies within the band, against the median fraction
+             of the runs, and the one-sided rank p-value.
+    """
+
+    # Cut the reference to the length of the runs, since the cycles measured depend on the length of the curve.
+    reference = {species: values[:, :ensemble[species].shape[1]] for species, values in reference.items()}
+
+    rows = []
+    ensemble_features, reference_features = run_features(ensemble, burn_in), run_features(reference, burn_in)
+    for feature in FEATURES:
+        values = ensemble_features[feature].dropna().to_numpy()
+        value = float(reference_features[feature].iloc[0])
+        if not len(values) or math.isnan(value):
+            rows.append({"feature": feature, "reference": value, "candidate": math.nan, "rank_p": math.nan,
+                         "no_detected_difference": True})
+            continue
+        rank_p = min(1.0, 2 * min(np.mean(values <= value), np.mean(values >= value)))
+        rows.append({"feature": feature, "reference": value, "candidate": float(np.median(values)), "rank_p": rank_p,
+                     "no_detected_difference": rank_p >= alpha})
+
+    # The fraction of ticks on which a curve lies within the pointwise band of the ensemble, ranked against the same
+    # fraction for every run of the ensemble, as even runs of the same engine stray out of the band now and then.
+    for species in SPECIES:
+        ticks = reference[species].shape[1]
+        runs = ensemble[species][:, :ticks]
+        with np.errstate(all="ignore"):
+            low, high = np.nanpercentile(runs, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+            inside = (runs >= low) & (runs <= high)
+            covered = np.sum(inside, axis=1) / np.maximum(np.sum(~np.isnan(runs), axis=1), 1)
+            curve = reference[species][0]
+            value = float(np.mean((curve >= low) & (curve <= high)))
+        rank_p = float(np.mean(covered <= value))
+        rows.append({"feature": f"{species}_band", "reference": value, "candidate": float(np.median(covered)),
+                     "rank_p": rank_p, "no_detected_difference": rank_p >= alpha})
+    return pd.DataFrame(rows)
+
+
+def validate(candidate: str = "vectorized", reference: str = "agent", seeds=100, parameters: dict = None,
+             max_steps: int = 500, processes: int = None, root_seed: int = 595, reference_csv: str = REFERENCE_CSV,
+             burn_in: int = 100, alpha: float = 0.05, power: float = 0.8) -> dict:
+    """
+    This method tests an engine for differences from the Mesa agent model, and both for differences from a reference
+    curve.
+    :param candidate: The engine under test.
+    :param reference: The trusted engine.
+    :param seeds: Either the list of seeds, or the number of replicates of each engine.
+    :param parameters: The parameters of the model; defaults to DEFAULT_PARAMETERS, those of the reference curve.
+    :param max_steps: The number of steps of every run.
+    :param processes: The number of worker processes; defaults to the number of CPUs.
+    :param root_seed: The seed from which replicate seeds are derived.
+    :param reference_csv: A reference curve in the format of plot.csv; if None, no curve is checked.
+    :param burn_in: The number of first ticks left out of the means and cycles.
+    :param alpha: The family-wise significance level of the tests.
+    :param power: The chance of detecting a difference of the size reported as detectable.
+    :return: A dictionary with the "engines" table of compare_engines(), the mean trajectory of each engine, and the
+             table of compare_reference() of each engine under "<engine>_reference" if a curve was given.
+    """
+
+    ensembles = {engine: run_ensemble(engine, seeds, parameters, max_steps, processes, root_seed)
+                 for engine in (reference, candidate)}
+    features = {engine: run_features(ensemble, burn_in) for engine, ensemble in ensembles.items()}
+    report = {"engines": compare_engines(features[reference], features[candidate], alpha, power)}
+    for engine, ensemble in ensembles.items():
+        report[f"{engine}_trajectory"] = mean_trajectory(ensemble)
+        if reference_csv is not None:
+            report[f"{engine}_reference"] = compare_reference(ensemble, load_reference(reference_csv), burn_in, alpha)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test whether an engine differs detectably from the Mesa agent model.")
+    parser.add_argument("--candidate", default="vectorized")
+    parser.add_argument("--reference", default="agent")
+    parser.add_argument("--seeds", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--root-seed", type=int, default=595)
+    parser.add_argument("--reference-csv", default=REFERENCE_CSV, help="A curve in the format of plot.csv.")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--power", type=float, default=0.8, help="The power of the reported detectable differences.")
+    args = parser.parse_args()
+
+    report = validate(args.candidate, args.reference, args.seeds, max_steps=args.steps, processes=args.processes,
+                      root_seed=args.root_seed, reference_csv=args.reference_csv, alpha=args.alpha, power=args.power)
+    print(f"{args.seeds} runs per engine; 'detectable' is the difference of means found with power {args.power}. "
+          f"No detected difference is not proof of equivalence.")
+    for name, table in report.items():
+        if not name.endswith("_trajectory"):
+            print(f"\n{name}\n{table.to_string(index=False)}")
+
+    # Fail if a difference between the engines was detected; the reference curve is a single run, so it is reported
+    # but does not fail.
+    sys.exit(0 if report["engines"]["no_detected_difference"].all() else 1)
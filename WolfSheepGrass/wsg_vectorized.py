@@ -0,0 +1,484 @@
+import numpy as np                              # Import to store and update whole species as arrays.
+from mesa import Model                          # Import the Model base class.
+import random                                   # Import to give each model its own random number generator.
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_collector import make_collector         # Import to build the DataCollector of a run.
+    from .wsg_grass import GrassField                 # Import the array-backed grass and dirt patches.
+    from .wsg_output import Outputs                   # Import the output sinks of a run.
+    from .wsg_census import Census, census_reporters  # Import the running counts of births, deaths, and energy.
+    from .wsg_model import RunLoop, RUNNING, ANNIHILATED, SHEEP_INHERIT  # Import the run loop of WolfSheepGrass.
+    from .wsg_random import *                         # Import the seeding of the substreams, and the turn of a step.
+except ImportError:
+    from wsg_collector import make_collector
+    from wsg_grass import GrassField
+    from wsg_output import Outputs
+    from wsg_census import Census, census_reporters
+    from wsg_model import RunLoop, RUNNING, ANNIHILATED, SHEEP_INHERIT
+    from wsg_random import *
+
+# Define constants for patches of grass and dirt.
+GRASS_PATCH, DIRT_PATCH = True, False
+
+
+class AnimalArrays:
+    """Struct-of-arrays storage for every animal of one species."""
+
+    def __init__(self, label: str, food_gain: int, reproduction_rate: float, capacity: int = 1024):
+        """
+        Initializes the storage for one species.
+        :param label: The species, either "Sheep" or "Wolf".
+        :param food_gain: An integer value which determines how much energy the animal gains from eating.
+        :param reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
+        :param capacity: The number of animals which can be stored before the arrays have to grow.
+        """
+
+        # Every animal of the species shares the same food gain and chance of reproduction.
+        self.label, self.food_gain, self.reproduction_rate = label, food_gain, reproduction_rate
+
+        # The species draws every batch of random numbers from its own generator, seeded by the model.
+        self.rng = None
+
+        # Only the first "count" entries of each array hold living animals.
+        self.count = 0
+
+        # Allocate the per-animal columns.
+        capacity = max(capacity, 1)
+        self.x_pos, self.y_pos = np.empty(capacity), np.empty(capacity)
+        self.direction, self.energy = np.empty(capacity), np.empty(capacity)
+        self.alive = np.ones(capacity, dtype=bool)
+
+    def reset(self, food_gain: int, reproduction_rate: float):
+        """
+        This method empties the storage for a new run, keeping the allocated arrays.
+        :param food_gain: An integer value which determines how much energy the animal gains from eating.
+        :param reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
+        :return:
+        """
+
+        self.food_gain, self.reproduction_rate = food_gain, reproduction_rate
+        self.count = 0
+
+    def reserve(self, extra: int):
+        """
+        This method makes sure there is room for a number of additional animals.
+        :param extra: The number of animals which are about to be appended.
+        :return:
+        """
+
+        # Nothing to do if the arrays are already large enough.
+        needed = self.count + extra
+        if needed <= len(self.x_pos):
+            return
+
+        # Otherwise, at least double the capacity so that appends stay amortized constant time.
+        capacity = max(needed, 2 * len(self.x_pos))
+        for name in ("x_pos", "y_pos", "direction", "energy"):
+            column = np.empty(capacity)
+            column[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, column)
+        alive = np.ones(capacity, dtype=bool)
+        alive[:self.count] = self.alive[:self.count]
+        self.alive = alive
+
+    def append(self, x_pos: np.ndarray, y_pos: np.ndarray, direction: np.ndarray, energy: np.ndarray):
+        """
+        This method adds a batch of animals to the end of the arrays.
+        :param x_pos: The floating-point x-coordinates of the new animals.
+        :param y_pos: The floating-point y-coordinates of the new animals.
+        :param direction: The headings of the new animals in radians.
+        :param energy: The starting energy of the new animals.
+        :return:
+        """
+
+        # Make room for the new animals, then copy them in after the existing ones.
+        n = len(x_pos)
+        self.reserve(n)
+        start, stop = self.count, self.count + n
+        self.x_pos[start:stop], self.y_pos[start:stop] = x_pos, y_pos
+        self.direction[start:stop], self.energy[start:stop] = direction, energy
+        self.alive[start:stop] = True
+        self.count = stop
+
+    def compact(self):
+        """
+        This method removes every animal whose alive flag has been cleared, keeping the survivors in order.
+        :return:
+        """
+
+        # Find the survivors; if nobody died, there is nothing to move.
+        alive = self.alive[:self.count]
+        survivors = np.flatnonzero(alive)
+        if len(survivors) == self.count:
+            return
+
+        # Shift the survivors to the front of each column.
+        for column in (self.x_pos, self.y_pos, self.direction, self.energy):
+            column[:len(survivors)] = column[survivors]
+        self.alive[:self.count] = True
+        self.count = len(survivors)
+
+
+class VectorizedWolfSheepGrass(RunLoop, Model):
+    """Drop-in alternative to WolfSheepGrass which updates each species in batch with NumPy."""
+
+    def __init__(self, width: int, height: int,
+                 grass_regrowth_rate: int, initial_wolves: int, initial_sheep: int,
+                 wolf_food_gain: int, sheep_food_gain: int,
+                 wolf_reproduction_rate: float, sheep_reproduction_rate: float,
+                 max_sheep: int, output_dir: str = "../Graphics", outputs: tuple = None, collector_window: int = None,
+                 seed: int = None) -> None:
+        """
+        Initializes the VectorizedWolfSheepGrass model. The parameters are the same as for WolfSheepGrass.
+        :param width: Width of the grid-world (i.e. horizontal length).
+        :param height: Height of the grid-world (i.e. vertical length).
+        :param grass_regrowth_rate: An integer value between 0 and 100 used to determine when dirt grows to grass.
+        :param initial_wolves: An integer value between 0 and 250 which determines the initial number of wolves.
+        :param initial_sheep: An integer value between 0 and 250 which determines the initial number of sheep.
+        :param wolf_food_gain: An integer value which determines how much energy the wolf gains from eating.
+        :param sheep_food_gain: An integer value which determines how much energy the sheep gains from eating.
+        :param wolf_reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
+        :param sheep_reproduction_rate: A floating-point value between 0 and 0.2; determines probability to reproduce.
+        :param max_sheep: The maximum number of sheep which can be alive at one time; if exceeded, the simulation stops.
+        :param output_dir: The directory to write the outputs of the run to; if None, nothing is written.
+        :param outputs: The output sinks of the run, e.g. ("plot", {"sink": "density", "block": 10, "every": 5}), as
+                        accepted by wsg_output.make_sink(); if None, the trajectory and plot.csv are written every tick.
+        :param collector_window: If given, the DataCollector holds only this many recent ticks in memory and spills
+                                 older ones to output_dir/collector, for very long runs; if None, it holds every tick.
+        :param seed: The seed of the run, from which every random number stream is derived; if None, a fresh seed is
+                     drawn, which can be read back from model._seed to reproduce the run.
+        """
+
+        # Initialize the Model base class.
+        super().__init__()
+
+        # The species arrays, grass, and output are allocated by reset(), and reused by later calls to it.
+        self.sheep = self.wolves = self.grass = self.outputs = None
+
+        # Set up the world for the first run.
+        self.parameters = {}
+        self.reset(dict(width=width, height=height, grass_regrowth_rate=grass_regrowth_rate,
+                        initial_wolves=initial_wolves, initial_sheep=initial_sheep,
+                        wolf_food_gain=wolf_food_gain, sheep_food_gain=sheep_food_gain,
+                        wolf_reproduction_rate=wolf_reproduction_rate, sheep_reproduction_rate=sheep_reproduction_rate,
+                        max_sheep=max_sheep, output_dir=output_dir, outputs=outputs,
+                        collector_window=collector_window), seed)
+
+    def reset(self, parameters: dict = None, seed: int = None):
+        """
+        This method sets the model up for a new run, reusing the species and grass arrays of the last one.
+        :param parameters: Constructor parameters to change for the new run; parameters left out keep their values.
+        :param seed: The seed of the run, from which every random number stream is derived; if None, a fresh seed is
+                     drawn.
+        :return:
+        """
+
+        # Merge the new parameters into those of the previous run.
+        self.parameters = dict(self.parameters, **(parameters or {}))
+        settings = self.parameters
+
+        # Keep track of the current time step, and of why the run ended.
+        self.time = 0
+        self.running, self.termination = True, RUNNING
+
+        # Clear output files for new test run, opening the output sinks of the new run.
+        if self.outputs is not None:
+            self.outputs.close()
+        self.output_dir = settings["output_dir"]
+        self.outputs = Outputs(self, self.output_dir, settings["outputs"])
+
+        # Width and height define the x- and y-dimensions of the world, respectively.
+        self.width, self.height = settings["width"], settings["height"]
+
+        # Don't let the number of sheep grow too large.
+        self.max_sheep = settings["max_sheep"]
+
+        # Empty the species arrays of the previous run, or allocate them on the first run.
+        if self.sheep is None:
+            self.sheep = AnimalArrays("Sheep", 0, 0, capacity=2 * settings["initial_sheep"])
+            self.wolves = AnimalArrays("Wolf", 0, 0, capacity=2 * settings["initial_wolves"])
+        self.sheep.reset(settings["sheep_food_gain"], settings["sheep_reproduction_rate"])
+        self.wolves.reset(settings["wolf_food_gain"], settings["wolf_reproduction_rate"])
+
+        # Seed the model's random number streams, remembering the seed so that the run can be reproduced.
+        self.reset_randomizer(new_seed() if seed is None else seed)
+
+        # Births, deaths, predation, and the energy of each species are counted as they happen.
+        self.census = Census()
+
+        # Add initial sheep (they move first in the NetLogo simulation), then the initial wolves.
+        for animals, count in ((self.sheep, settings["initial_sheep"]), (self.wolves, settings["initial_wolves"])):
+            # Position is random in the world, direction is random, and energy is between 0 and twice the food gain.
+            rng = animals.rng
+            animals.append(rng.uniform(0, self.width, count), rng.uniform(0, self.height, count),
+                           rng.uniform(0, 2 * np.pi, count),
+                           2 * rng.integers(0, max(animals.food_gain, 1), count).astype(float))
+            self.census.set_energy(animals.label, animals.energy[:animals.count])
+
+        # Initialize environment by filling terrain with grass and dirt patches, laid out from the grass substream.
+        grass_rng = np.random.default_rng(substream(self._seed, GRASS_STREAM))
+        if self.grass is not None and self.grass.patch_color.shape == (self.width, self.height):
+            self.grass.reset(settings["grass_regrowth_rate"], grass_rng)
+        else:
+            self.grass = GrassField(self.width, self.height, settings["grass_regrowth_rate"], grass_rng)
+
+        # Define DataCollector instance, which tracks the population of wolves and sheep as well as the number of grass,
+        # and the running counts and energy of the census.
+        self.dc = make_collector({"Sheep Count": self.get_sheep_count,
+                                  "Wolf Count": self.get_wolf_count,
+                                  "Grass / 5 Count": self.get_grass_count,
+                                  **census_reporters()},
+                                 settings.get("collector_window"), self.output_dir)
+
+    def reset_randomizer(self, seed: int = None):
+        """
+        This method reseeds every random number stream of the model from one seed, leaving the rest of its state.
+        :param seed: The seed of the run; if None, the current seed is used again.
+        :return:
+        """
+
+        if seed is not None:
+            self._seed = seed
+
+        # Give the model its own random number generator (Mesa stores it on the class, shared by every instance).
+        self.random = random.Random(derive_seed(self._seed, MODEL_STREAM))
+
+        # Each species draws its batches of random numbers from its own substream.
+        self.sheep.rng = np.random.default_rng(substream(self._seed, SPECIES_STREAMS["Sheep"]))
+        self.wolves.rng = np.random.default_rng(substream(self._seed, SPECIES_STREAMS["Wolf"]))
+
+    def step(self):
+        """This method provides the logic loop for each step of the model."""
+
+        # Collect sheep, wolf, and grass populations.
+        self.dc.collect(self)
+
+        # Output the current tick to every output sink due on it.
+        self.outputs.write(self)
+
+        # Increment the time step.
+        self.time += 1
+
+        # First, move the sheep.
+        self.step_species(self.sheep, self.sheep_eat)
+
+        # Finally, move the wolves.
+        self.step_species(self.wolves, self.wolf_eat)
+
+        # Finally, grow the grass. (Note: sheep have a chance to be standing on grass)
+        self.grass.grow()
+
+        # Total the energy of each species once per step, after every change to it.
+        self.count_energy()
+
+        # Get wolf and sheep counts.
+        wolf_count, sheep_count = self.get_wolf_count(), self.get_sheep_count()
+
+        # Are the wolves and sheep annihilated?
+        are_annihilated = wolf_count <= 0 and sheep_count <= 0
+
+        # Do the sheep rule the world?
+        sheep_inherit = wolf_count <= 0 and sheep_count > self.max_sheep
+
+        if are_annihilated:
+            self.stop(ANNIHILATED)
+        elif sheep_inherit:
+            self.stop(SHEEP_INHERIT)
+
+    def step_species(self, animals: AnimalArrays, eat):
+        """
+        This method runs one step of Animal.step for every animal of a species at once.
+        :param animals: The arrays of the species to step.
+        :param eat: The method which lets the species eat; it receives the species' arrays.
+        :return:
+        """
+
+        # Only animals alive at the start of the step take part; newborns wait until the next step.
+        n = animals.count
+        if n == 0:
+            return
+
+        # Move every animal.
+        self.move(animals)
+
+        # Deplete energy by 1 unit.
+        animals.energy[:n] -= 1
+
+        # Have the animals eat sheep (if they are wolves) or eat grass (if they are sheep).
+        eat(animals)
+
+        # Check for death from starvation.
+        animals.alive[:n] &= animals.energy[:n] > 0
+        self.census.starved[animals.label] += n - int(np.count_nonzero(animals.alive[:n]))
+
+        # Reproduce. As in Animal.step, an animal which starved this step still gets its chance to reproduce.
+        self.reproduce(animals)
+
+        # Drop the dead animals from the arrays.
+        animals.compact()
+
+    def move(self, animals: AnimalArrays):
+        """
+        This method moves every animal of a species forward by one step.
+        :param animals: The arrays of the species to move.
+        :return:
+        """
+
+        # Turn left between 0 and MAX_TURN, then right between 0 and MAX_TURN, as the agent model does.
+        n = animals.count
+        turns = animals.rng.uniform(0, MAX_TURN, (2, n))
+        animals.direction[:n] += turns[0] - turns[1]
+
+        # Move forward by one step, looping around the edges of the world.
+        self.advance(animals.x_pos[:n], animals.y_pos[:n], animals.direction[:n])
+
+    def advance(self, x_pos: np.ndarray, y_pos: np.ndarray, direction: np.ndarray):
+        """
+        This method moves positions forward by one step along their directions, in place.
+        :param x_pos: The x-coordinates to update.
+        :param y_pos: The y-coordinates to update.
+        :param direction: The headings to move along in radians.
+        :return:
+        """
+
+        x_pos += np.cos(direction)
+        y_pos += np.sin(direction)
+        np.mod(x_pos, self.width, out=x_pos)
+        np.mod(y_pos, self.height, out=y_pos)
+
+    def reproduce(self, animals: AnimalArrays):
+        """
+        This method gives every animal of a species its chance to reproduce.
+        :param animals: The arrays of the species to reproduce.
+        :return:
+        """
+
+        # If a number between 0 and 1 is less than the reproduction rate, reproduce.
+        n = animals.count
+        parents = np.flatnonzero(animals.rng.uniform(0, 1, n) < animals.reproduction_rate)
+        if len(parents) == 0:
+            return
+        self.census.births[animals.label] += len(parents)
+
+        # Divide the parents' energy by half; the children start with the same energy.
+        animals.energy[parents] /= 2
+        energy = animals.energy[parents]
+
+        # Each child gets a random direction and moves forward by one step from its parent.
+        direction = animals.rng.uniform(0, 2 * np.pi, len(parents))
+        x_pos, y_pos = animals.x_pos[parents], animals.y_pos[parents]
+        self.advance(x_pos, y_pos, direction)
+
+        # Children are appended after the existing animals; the dead are compacted away afterwards.
+        animals.append(x_pos, y_pos, direction, energy)
+
+    def sheep_eat(self, sheep: AnimalArrays):
+        """
+        This method lets sheep eat the grass in their cells; when several share a cell, a random one eats.
+        :param sheep: The arrays of the sheep.
+        :return:
+        """
+
+        # Find a random sheep in every occupied cell.
+        cells = self.cell_index(sheep)
+        order = sheep.rng.permutation(sheep.count)
+        _, first = np.unique(cells[order], return_index=True)
+        candidates = order[first]
+
+        # If the candidate's patch has grass, eat it. Otherwise, end action.
+        eaters = candidates[self.grass.flat_color[cells[candidates]]]
+        self.grass.eat_cells(cells[eaters])
+        sheep.energy[eaters] += sheep.food_gain
+
+    def wolf_eat(self, wolves: AnimalArrays):
+        """
+        This method lets wolves eat sheep in their cells; each wolf eats at most one sheep and no sheep is eaten twice.
+        :param wolves: The arrays of the wolves.
+        :return:
+        """
+
+        # Nothing to eat if there are no sheep.
+        sheep = self.sheep
+        if sheep.count == 0:
+            return
+
+        # Sort sheep and wolves by cell, in random order within each cell.
+        sheep_cells, wolf_cells = self.cell_index(sheep), self.cell_index(wolves)
+        sheep_order = np.lexsort((wolves.rng.uniform(0, 1, sheep.count), sheep_cells))
+        wolf_order = np.lexsort((wolves.rng.uniform(0, 1, wolves.count), wolf_cells))
+        sheep_cells, wolf_cells = sheep_cells[sheep_order], wolf_cells[wolf_order]
+
+        # The k-th wolf in a cell eats the k-th sheep in that cell, if there is one.
+        rank = np.arange(wolves.count) - np.searchsorted(wolf_cells, wolf_cells, side="left")
+        target = np.searchsorted(sheep_cells, wolf_cells, side="left") + rank
+        fed = target < sheep.count
+        fed[fed] = sheep_cells[target[fed]] == wolf_cells[fed]
+
+        # "Kill" the sheep and add energy from eating them.
+        self.census.eaten += int(np.count_nonzero(fed))
+        sheep.alive[sheep_order[target[fed]]] = False
+        sheep.compact()
+        wolves.energy[wolf_order[fed]] += wolves.food_gain
+
+    def count_energy(self):
+        """This method totals the energy of every species for the census, whose running totals the arrays replace."""
+
+        for animals in (self.sheep, self.wolves):
+            self.census.set_energy(animals.label, animals.energy[:animals.count])
+
+    def cell_index(self, animals: AnimalArrays) -> np.ndarray:
+        """
+        This method returns the flattened integer cell index of every animal of a species.
+        :param animals: The arrays of the species.
+        :return: An integer array indexing into the flattened (width, height) grass arrays.
+        """
+
+        n = animals.count
+        x = animals.x_pos[:n].astype(np.int64) % self.width
+        y = animals.y_pos[:n].astype(np.int64) % self.height
+        return x * self.height + y
+
+    def get_world(self) -> tuple:
+        """
+        This method gathers what the output sinks write about the world.
+        :return: The grass array, and the positions and energy of the wolves and of the sheep, as returned by
+                 get_positions_and_energy().
+        """
+
+        return (self.grass.patch_color, self.get_positions_and_energy(self.wolves),
+                self.get_positions_and_energy(self.sheep))
+
+    def get_positions_and_energy(self, animals: AnimalArrays) -> tuple:
+        """
+        This method returns the positions and energy of every animal of a species.
+        :param animals: The arrays of the species.
+        :return: The x-coordinates, y-coordinates, and energy of the animals, as arrays.
+        """
+
+        n = animals.count
+        return animals.x_pos[:n], animals.y_pos[:n], animals.energy[:n]
+
+    def get_sheep_count(self) -> int:
+        """
+        This method returns the current population of sheep in the simulation.
+        :return: An integer representing the population of sheep.
+        """
+
+        return self.sheep.count
+
+    def get_wolf_count(self) -> int:
+        """
+        This method returns the current population of wolves in the simulation.
+        :return: An integer representing the population of wolves.
+        """
+
+        return self.wolves.count
+
+    def get_grass_count(self) -> float:
+        """
+        This method returns the current number of grass patches divided by 5 (to be closer to wolf/sheep populations).
+        :return: A floating-point number representing the approximate number of grass patches divided by 5.
+        """
+
+        return self.grass.get_grass_count() / 5
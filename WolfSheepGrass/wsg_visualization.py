@@ -1,35 +1,145 @@
-from wsg_model import WolfSheepGrass                               # The WolfSheepGrass model
 from mesa.visualization.modules import CanvasGrid, ChartModule     # Type of grid to visualize agents
 from mesa.visualization.ModularVisualization import ModularServer  # Creates the new server to host the model
+from mesa.visualization.ModularVisualization import SocketHandler  # Sends every browser the state of the model
 from mesa.visualization.UserParam import UserSettableParameter     # Allows UI elements like sliders
+import numpy as np                                                 # Finds the grass patches which changed
+import os                                                          # Finds the local scripts next to this file
+import tornado.web                                                 # Serves the local scripts
+import weakref                                                     # Forgets the rasters of closed connections
+
+# Import the other modules of the package, or by their own names when run as a script from this directory.
+try:
+    from .wsg_model import WolfSheepGrass                          # The WolfSheepGrass model
+    from .wsg_profile import PHASES                                # Phases of the step which can be charted
+except ImportError:
+    from wsg_model import WolfSheepGrass
+    from wsg_profile import PHASES
 
 # Define constants for patches of grass and dirt.
 GRASS_PATCH, DIRT_PATCH = True, False
 
 
+class GrassRasterGrid(CanvasGrid):
+    """CanvasGrid which sends the grass as a raster, then only the patches which changed, below the animals."""
+
+    # The grass raster is decoded and drawn by a local script; animals are still drawn by Mesa's GridDraw.js.
+    package_includes = ["GridDraw.js", "InteractionHandler.js"]
+    local_includes = ["wsg_raster_grid.js"]
+
+    def __init__(self, portrayal_method, grid_width: int, grid_height: int, canvas_width: int = 500,
+                 canvas_height: int = 500, key_frame_interval: int = 50):
+        """
+        Initializes the GrassRasterGrid class.
+        :param portrayal_method: The method which portrays each animal.
+        :param grid_width: Width of the grid-world (i.e. horizontal length).
+        :param grid_height: Height of the grid-world (i.e. vertical length).
+        :param canvas_width: Width of the canvas in the browser, in pixels.
+        :param canvas_height: Height of the canvas in the browser, in pixels.
+        :param key_frame_interval: The number of steps after which the whole raster is sent again.
+        """
+
+        # Initialize the CanvasGrid base class, then replace its browser-side module with the raster one.
+        super().__init__(portrayal_method, grid_width, grid_height, canvas_width, canvas_height)
+        self.js_code = "elements.push(new RasterGridModule({}, {}, {}, {}));".format(
+            canvas_width, canvas_height, grid_width, grid_height)
+
+        # Remember the model, tick, and raster last sent to every browser connection, so that the next tick only sends
+        # each browser what changed since it last drew.
+        self.key_frame_interval = key_frame_interval
+        self.baselines = weakref.WeakKeyDictionary()
+
+    def render(self, model, connection=None):
+        """
+        This method portrays the animals, and encodes the grass as a raster or as the changes since the last tick.
+        :param model: The WolfSheepGrass model being visualized.
+        :param connection: The browser connection the state is sent to; if None, the whole raster is always sent, since
+                           what the browser last drew is unknown.
+        :return: A dictionary with the encoded grass and the animal portrayals keyed on layer.
+        """
+
+        # Portray the animals placed on the grid.
+        animals = super().render(model)
+
+        # Send the whole raster to a new connection, for a new model, after a skipped or repeated tick (e.g. when
+        # another browser stepped the shared model), and every key frame interval.
+        patch_color = model.grass.patch_color
+        baseline = self.baselines.get(connection) if connection is not None else None
+        last_model, last_time, last_grass = baseline or (None, None, None)
+        key_frame = model is not last_model or model.time != last_time + 1 or model.time % self.key_frame_interval == 0
+        if key_frame:
+            grass = {"runs": run_length_encode(patch_color)}
+        else:
+            grass = {"changed": np.flatnonzero(patch_color != last_grass).tolist()}
+
+        if connection is not None:
+            self.baselines[connection] = (model, model.time, patch_color.copy())
+        return {"grass": grass, "animals": animals}
+
+
+class RasterSocketHandler(SocketHandler):
+    """SocketHandler which renders the state of the model for its own connection, so that deltas follow each browser."""
+
+    @property
+    def viz_state_message(self) -> dict:
+        """
+        This property renders the current state of the model for the browser of this connection.
+        :return: The message sent to the browser.
+        """
+
+        return {"type": "viz_state", "data": self.application.render_model(self)}
+
+
+class WolfSheepGrassServer(ModularServer):
+    """
+    ModularServer which serves the local scripts of the elements from this directory, whatever the working one, and
+    renders the grass raster for every browser connection separately.
+    """
+
+    # Mesa serves local includes from the working directory, so the server only worked when started from this one.
+    local_handler = (r"/local/(.*)", tornado.web.StaticFileHandler,
+                     {"path": os.path.dirname(os.path.abspath(__file__))})
+    socket_handler = (r"/ws", RasterSocketHandler)
+    handlers = [ModularServer.page_handler, socket_handler, ModularServer.static_handler, local_handler]
+
+    def render_model(self, connection=None) -> list:
+        """
+        This method turns the current state of the model into the state of every visualization element.
+        :param connection: The browser connection the state is sent to, which the grass raster encodes its changes for.
+        :return: The state of every element, in order.
+        """
+
+        return [element.render(self.model, connection) if isinstance(element, GrassRasterGrid)
+                else element.render(self.model) for element in self.visualization_elements]
+
+
+def run_length_encode(patch_color: np.ndarray) -> list:
+    """
+    This method encodes the grass array as the alternating lengths of its runs of dirt and grass.
+    :param patch_color: The boolean grass array of the world, indexed as [x, y].
+    :return: The run lengths in [x][y] order, starting with a (possibly empty) run of dirt.
+    """
+
+    # Find where the patches switch between dirt and grass.
+    flat = patch_color.ravel()
+    edges = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1, [flat.size]))
+    runs = np.diff(edges).tolist()
+
+    # The first run is always dirt.
+    return [0] + runs if flat.size and flat[0] else runs
+
+
 def agent_portrayal(agent):
     """
     This method defines how to portray the agent on the live server visualization.
-    :param agent: The agent to portray (could be a wolf, sheep, or a patch of grass or dirt).
+    :param agent: The agent to portray (either a wolf or a sheep).
     :return:
     """
 
     # Set up portrayal dictionary which stores attributes of the agent.
     portrayal = {"Filled": "true"}
 
-    # Is the agent a patch?
-    if agent.label == "Patch":
-        # Fill the entire cell. Patches are displayed on the bottom layer.
-        portrayal["Shape"], portrayal["w"], portrayal["h"], portrayal["Layer"] = "rect", 1, 1, 0
-
-        # Is the patch grass or dirt?
-        if agent.patch_color is GRASS_PATCH:
-            portrayal["Color"] = "green"
-        else:
-            portrayal["Color"] = "#A0522D"  # Color code for brown
-
     # Is the agent a sheep?
-    elif agent.label == "Sheep":
+    if agent.label == "Sheep":
         # Sheep are displayed above patches and below wolves as white circles.
         portrayal["Shape"], portrayal["r"], portrayal["Color"], portrayal["Layer"] = "circle", 0.5, "white", 1
         if agent.just_spawned:
@@ -53,22 +163,32 @@ def agent_portrayal(agent):
     return portrayal
 
 
-def run_server(world_width, world_height):
+def run_server(world_width, world_height, seed=None, profile=False):
     """
     This method runs the server to provide a live visualization of the model over the course of the simulation.
     :param world_width: Width of the grid-world (i.e. horizontal length).
     :param world_height: Height of the grid-world (i.e. vertical length).
+    :param seed: The seed of every run; if given, resetting the visualization replays the same run. If None, every
+                 reset draws a fresh seed.
+    :param profile: If True, the model times every phase of its step, and a second chart shows the timings.
     :return:
     """
 
     # Instantiate a CanvasGrid to represent the sheep, wolves, and patches of grass and dirt.
-    grid = CanvasGrid(agent_portrayal, world_width, world_height, 700, 700)
+    grid = GrassRasterGrid(agent_portrayal, world_width, world_height, 700, 700)
 
     # Instantiate a ChartModule to show the population of wolves, sheep, and grass over the course of simulation.
     population_dicts = [dict(Label="Sheep Count", Color="blue"),
                         dict(Label="Wolf Count", Color="red"),
                         dict(Label="Grass / 5 Count", Color="green")]
     population_chart = ChartModule(population_dicts, data_collector_name="dc")
+    elements = [grid, population_chart]
+
+    # If profiling, instantiate a ChartModule to show how long every phase of the step takes, in milliseconds.
+    if profile:
+        phase_colors = ["gray", "purple", "blue", "red", "green", "orange"]
+        phase_dicts = [dict(Label=f"{phase} ms", Color=color) for phase, color in zip(PHASES, phase_colors)]
+        elements.append(ChartModule(phase_dicts, data_collector_name="dc"))
 
     # Instantiate UI sliders with NetLogo default, min, and maximum values.
     number_of_wolves_slider = UserSettableParameter(
@@ -87,14 +207,14 @@ def run_server(world_width, world_height):
         "slider", "wolf-reproduce", 0.05, 0.00, 0.20, 0.01)
 
     # Finally, instantiate the ModularServer and launch it.
-    server = ModularServer(WolfSheepGrass,
-                           [grid, population_chart],
-                           "Wolf-Sheep-Grass Model",
-                           {"width": world_width, "height": world_height,
-                            "grass_regrowth_rate": grass_regrowth_time,
-                            "initial_wolves": number_of_wolves_slider, "initial_sheep": number_of_sheep_slider,
-                            "wolf_food_gain": wolf_food_gain, "sheep_food_gain": sheep_food_gain,
-                            "wolf_reproduction_rate": wolf_reproduce, "sheep_reproduction_rate": sheep_reproduce,
-                            "max_sheep": 10_000})
+    server = WolfSheepGrassServer(WolfSheepGrass,
+                                  elements,
+                                  "Wolf-Sheep-Grass Model",
+                                  {"width": world_width, "height": world_height,
+                                   "grass_regrowth_rate": grass_regrowth_time,
+                                   "initial_wolves": number_of_wolves_slider, "initial_sheep": number_of_sheep_slider,
+                                   "wolf_food_gain": wolf_food_gain, "sheep_food_gain": sheep_food_gain,
+                                   "wolf_reproduction_rate": wolf_reproduce, "sheep_reproduction_rate": sheep_reproduce,
+                                   "max_sheep": 10_000, "profile": profile, "seed": seed})
     server.port = 8521
     server.launch()